@@ -1,16 +1,39 @@
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 from fastapi import FastAPI, Query
-from fastapi.responses import StreamingResponse
+from fastapi import Request as HTTPRequest
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from .utils.prompt import ClientMessage
 from .orchestrator import stream_text
 from .patient_orchestrator import stream_patient_text
+from .utils.history import history_metrics
+from .utils.metrics import registry
+from .utils.openai_clients import pool_stats, prewarm
+from .utils.rag_cache import rag_cache
+from .utils.record_store import get_record_store
+from .utils.retrieval import rag_index_stats
+from .utils.response_cache import response_cache
+from .utils.stream_writer import StreamWriter
+from .utils.tool_memo import tool_memo_stats
 
 app = FastAPI()
 
+registry.add_collector("response_cache", response_cache.stats)
+registry.add_collector("history", history_metrics.stats)
+registry.add_collector("record_store", lambda: get_record_store().stats())
+registry.add_collector("openai_pool", pool_stats)
+registry.add_collector("tool_memo", tool_memo_stats.stats)
+registry.add_collector("rag_cache", rag_cache.stats)
+registry.add_collector("rag_index", rag_index_stats)
+
+# Import the OpenAI SDK off the import path; the first request would otherwise wait for it
+prewarm()
+
 class Request(BaseModel):
     messages: List[ClientMessage]
+    # Chat id sent by useChat; scopes the tool memo to one conversation
+    id: Optional[str] = None
 
 
 def sanitize_for_responses(messages: List[ClientMessage]) -> List[dict]:
@@ -28,18 +51,26 @@ def sanitize_for_responses(messages: List[ClientMessage]) -> List[dict]:
     return out
 
 @app.post("/api/chat")
-async def handle_chat_data(request: Request, protocol: str = Query("data")):
+async def handle_chat_data(request: Request, http_request: HTTPRequest, protocol: str = Query("data")):
     openai_messages = sanitize_for_responses(request.messages)
 
-    response = StreamingResponse(stream_text(openai_messages, protocol))
+    # The writer watches for disconnect and cancels the model stream and pending tools
+    frames = stream_text(openai_messages, protocol, session_id=request.id)
+    response = StreamingResponse(StreamWriter(frames, "chat", receive=http_request.receive))
     response.headers["x-vercel-ai-data-stream"] = "v1"
     return response
 
 @app.post("/api/patient-chat")
-async def handle_patient_chat_data(request: Request, protocol: str = Query("data")):
+async def handle_patient_chat_data(request: Request, http_request: HTTPRequest, protocol: str = Query("data")):
     """Handle patient-side chat requests with patient-specific orchestration"""
     openai_messages = sanitize_for_responses(request.messages)
 
-    response = StreamingResponse(stream_patient_text(openai_messages, protocol))
+    frames = stream_patient_text(openai_messages, protocol)
+    response = StreamingResponse(StreamWriter(frames, "patient_chat", receive=http_request.receive))
     response.headers["x-vercel-ai-data-stream"] = "v1"
     return response
+
+@app.get("/api/metrics")
+async def handle_metrics():
+    """Latency histograms and cache/store counters in Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,38 +1,81 @@
-import os
+import asyncio
 import json
-from re import search
-from typing import List, Dict
-from openai import OpenAI
+import time
+from typing import List, Optional
 from dotenv import load_dotenv
 
-from .utils.get_patient_info import get_patient_info, get_patient_names, search_records_RAG
+from .utils.get_patient_info import (
+    get_patient_info_json,
+    get_patient_names,
+    query_patients,
+    resolve_patient,
+    search_records_RAG,
+    search_transcript,
+)
+from .utils.storage import get_storage
+from .utils.response_cache import cache_key, canonical_tools, prompt_cache_key, response_cache
+from .utils.history import compact_history
+from .utils.metrics import RequestTrace
+from .utils.openai_clients import get_async_client
+from .utils.prefetch import prefetch_context
+from .utils.serialization import dumps, finish_frame, text_frame
+from .utils.tool_memo import memoized
+from .utils.tool_runner import run_function_calls
 
 load_dotenv()
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+MODEL_NAME = "gpt-4.1-mini"
 
 # Define tools for OpenAI Responses API
 tools = [
     {
         "type": "function",
         "name": "get_patient_names",
-        "description": "Retrieve all patient names and their patient IDs. Use this first to find the patient_id for a specific patient name before calling get_patient_info.",
+        "description": "List patient names and their patient IDs one page at a time. Use it only to browse the roster; to find a specific patient call resolve_patient, or pass the name straight to get_patient_info.",
         "parameters": {
             "type": "object",
-            "properties": {},
+            "properties": {
+                "offset": {
+                    "type": "integer",
+                    "description": "Index of the first patient to return (default 0). Use next_offset from the previous page.",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Patients per page (default 50, at most 200)",
+                },
+            },
             "required": [],
         },
     },
+    {
+        "type": "function",
+        "name": "resolve_patient",
+        "description": "Find a patient by name (typos and partial names allowed), MRN, or date of birth, or a name plus date of birth (e.g. 'Jordan Carter 1967-03-11'). Returns the best matches with their patient_id and a 0-1 score.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name_or_mrn": {
+                    "type": "string",
+                    "description": "Patient name, MRN (e.g. 'JC-045872') or date of birth (YYYY-MM-DD)",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of matches to return (default 5)",
+                },
+            },
+            "required": ["name_or_mrn"],
+        },
+    },
     {
         "type": "function",
         "name": "get_patient_info",
-        "description": "Retrieve a specific patient record by patient_id. Use get_patient_names first to find the patient_id from a patient name.",
+        "description": "Retrieve a specific patient record by patient_id, MRN or patient name. A name that matches more than one patient returns an error with the candidates to choose from. The full record is large (it includes the whole transcript), so request only what you need: view='summary' for an overview, view='meds' for medications, view='transcript_window' with transcript_start/transcript_end to read part of the conversation, or fields/exclude for anything else.",
         "parameters": {
             "type": "object",
             "properties": {
                 "patient_id": {
                     "type": "string",
-                    "description": "Required patient ID (e.g., 'jordan_carter', 'emily_chen'). Get this from get_patient_names function first.",
+                    "description": "Required patient ID, MRN or name (e.g., 'jordan_carter', 'JC-045872', 'Jordan Carter').",
                 },
                 "age": {
                     "type": "array",
@@ -45,10 +88,104 @@ tools = [
                     "type": "string",
                     "description": "Optional gender to filter by (M, F, or variations like Male, Female)",
                 },
+                "view": {
+                    "type": "string",
+                    "enum": ["summary", "meds", "transcript_window", "full"],
+                    "description": "Named subset of the record. summary: demographics, vitals, HPI, PMH, assessment, medication changes, follow-up. meds: prior meds, allergies, medication changes and concerns. transcript_window: the transcript between transcript_start and transcript_end. full: everything (default).",
+                },
+                "fields": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional dot paths to include, added to the view (e.g. ['vitals', 'plan.orders_today', 'exam'])",
+                },
+                "exclude": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional dot paths to leave out (e.g. ['transcript'])",
+                },
+                "transcript_start": {
+                    "type": "string",
+                    "description": "Optional start time mark (MM:SS) when the transcript is included",
+                },
+                "transcript_end": {
+                    "type": "string",
+                    "description": "Optional end time mark (MM:SS) when the transcript is included",
+                },
             },
             "required": ["patient_id"],
         },
     },
+    {
+        "type": "function",
+        "name": "query_patients",
+        "description": "Find all patients matching structured filters (age range, sex, ICD-10 codes, medication changes, provider specialty) in one call. Returns compact summaries, not full records. Prefer this over search_records_RAG for filters like 'female patients 60-70 with E11.9'.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "age": {
+                    "type": "array",
+                    "items": {"type": "integer"},
+                    "minItems": 2,
+                    "maxItems": 2,
+                    "description": "Optional [start_age, end_age] range, inclusive (upper limit capped at 100)",
+                },
+                "sex": {
+                    "type": "string",
+                    "description": "Optional sex to filter by (M, F, or variations like Male, Female)",
+                },
+                "icd10": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Optional ICD-10 codes the patient must all have (e.g. ['E11.9']). A category like 'E11' matches 'E11.9'.",
+                },
+                "medication": {
+                    "type": "string",
+                    "description": "Optional drug name from the plan's medication changes (e.g. 'losartan')",
+                },
+                "medication_action": {
+                    "type": "string",
+                    "enum": ["start", "stop", "any"],
+                    "description": "Whether the medication was started, stopped, or either (default any)",
+                },
+                "specialty": {
+                    "type": "string",
+                    "description": "Optional provider specialty (e.g. 'Family Medicine')",
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Maximum number of patients to return (default 50)",
+                },
+            },
+            "required": [],
+        },
+    },
+    {
+        "type": "function",
+        "name": "search_transcript",
+        "description": "Search one patient's encounter transcript for a topic and return only the matching turns with a few turns of context and their time marks (MM:SS). Use this to find and cite what was said instead of fetching the whole transcript.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "patient_id": {
+                    "type": "string",
+                    "description": "Patient ID whose transcript to search (e.g., 'jordan_carter')",
+                },
+                "query": {
+                    "type": "string",
+                    "description": "Words to look for in the transcript (e.g., 'heartburn at night')",
+                },
+                "window": {
+                    "type": "integer",
+                    "description": "Turns of context before and after each match (default 2)",
+                },
+                "max_matches": {
+                    "type": "integer",
+                    "description": "Maximum number of matching turns (default 10)",
+                },
+            },
+            "required": ["patient_id", "query"],
+        },
+    },
     {
         "type": "function",
         "name": "search_records_RAG",
@@ -71,7 +208,7 @@ You are DeepScribe Assistant, an AI medical scribe designed to help healthcare p
 capture, organize, and summarize clinical encounters accurately and empathetically.
 
 By default if the user asks a vague prompt like "what do you" or something along those lines or "help me get started", 
-then use the get_patient_names() tool to list the patients and ask them which patient they would like to go over. 
+then use the get_patient_names() tool to list the first page of patients and ask them which patient they would like to go over. 
 
 Core directives:
 1. Listen carefully to the patient's description of their symptoms.
@@ -89,13 +226,16 @@ Core directives:
 
 Your goal: Produce a note that a physician could easily review and use for official documentation.
 
-You have access to patient data through two functions and automatic file search:
+You have access to patient data through these functions:
 
-1. **get_patient_names()**: Returns all patient names and their IDs. Use this FIRST when a user asks about a specific patient by name.
-2. **get_patient_info(patient_id)**: Returns detailed patient record. Use the patient_id from get_patient_names() result.
-3. **search_records_RAG(query)**: searches through patient database using RAG. use this when the patient does not give you a particular patient to look into but wants you to find patient in the doc "Find patient that is roughly 60-70 years old" or "Find patient with depression and tell me about their symptoms" etc. Notice the search here is vague. 
+1. **get_patient_names(offset, limit)**: Returns one page of patient names and their IDs. Only for browsing the roster; never page through it to find one patient.
+2. **resolve_patient(name_or_mrn)**: Returns the best matching patients for a name (typos allowed), MRN or date of birth, with scores. Use it when a name may be ambiguous or misspelled.
+3. **get_patient_info(patient_id, view, fields, exclude, transcript_start, transcript_end)**: Returns detailed patient record. patient_id may be the ID, the MRN or the patient's name, so call it directly when the user names a patient; if it returns candidates, ask the user which one they mean. Ask for view="summary" or view="meds" unless you need more, and read the transcript with view="transcript_window" and a time range instead of fetching the full record.
+4. **query_patients(age, sex, icd10, medication, medication_action, specialty)**: Returns every patient matching structured filters in one call, e.g. "all female patients 60-70 with E11.9" or "patients started on losartan". Use this instead of looping over get_patient_info.
+5. **search_transcript(patient_id, query, window)**: Returns only the transcript turns about a topic, with surrounding context and time marks. Use it to find and cite what was said (e.g. "when did Jordan mention heartburn?").
+6. **search_records_RAG(query)**: searches through patient database using RAG. use this when the patient does not give you a particular patient to look into but wants you to find patient in the doc "Find patient with depression and tell me about their symptoms" etc. Notice the search here is vague. For exact filters (age range, sex, ICD-10 code, medication) use query_patients instead. 
 
-If they ask which tools you have describe only these 3. 
+If they ask which tools you have describe only these 6. 
 
 
 If they ask about material not related to patient records or anything medical related, tell them that you are an assistant designed specifically for patient medical data, and steer them back to the main topics.
@@ -109,6 +249,10 @@ When going over a patient, cite where in the transcript (which second mark) or w
 If the user asks a question that is not in the data source given to you, simply say you do not have the information. 
 """.strip()
 
+# Send byte-identical instructions + tools on every call so the provider's prompt-prefix cache applies
+tools = canonical_tools(tools)
+PROMPT_CACHE_KEY = prompt_cache_key("deepscribe-chat", SYSTEM_PROMPT, tools)
+
 
 def execute_function_call(function_name: str, arguments: str) -> str:
     """
@@ -122,41 +266,112 @@ def execute_function_call(function_name: str, arguments: str) -> str:
         JSON string of the function result
     """
     if function_name == "get_patient_names":
-        result = get_patient_names()
-        return json.dumps(result)
+        args = json.loads(arguments or "{}")
+        result = get_patient_names(**args)
+        return dumps(result)
+
+    elif function_name == "resolve_patient":
+        args = json.loads(arguments)
+        result = resolve_patient(**args)
+        return dumps(result)
     
     elif function_name == "get_patient_info":
         args = json.loads(arguments)
-        # Convert age array to tuple if present
-        if "age" in args and args["age"]:
-            args["age"] = tuple(args["age"])
-        result = get_patient_info(**args)
-        return json.dumps(result)
+        # get_patient_info validates age itself (a JSON array arrives as a list)
+        return get_patient_info_json(**args)
+    
+    elif function_name == "query_patients":
+        args = json.loads(arguments)
+        # query_patients validates age itself (a JSON array arrives as a list)
+        result = query_patients(**args)
+        return dumps(result)
+    
+    elif function_name == "search_transcript":
+        args = json.loads(arguments)
+        result = search_transcript(**args)
+        return dumps(result)
     
     elif function_name == "search_records_RAG":
         args = json.loads(arguments)
         results = search_records_RAG(**args)
-        return json.dumps(results)
+        return dumps(results)
     
     
-    return json.dumps({"error": f"Unknown function: {function_name}"})
+    return dumps({"error": f"Unknown function: {function_name}"})
 
 
-def stream_text(messages: List[dict], protocol: str = "data"):
+async def stream_text(messages: List[dict], protocol: str = "data", session_id: Optional[str] = None):
     """
     Stream text responses from OpenAI with function calling support.
     
     Args:
         messages: List of conversation messages
         protocol: Protocol type (default "data")
+        session_id: Conversation id from the client; tool results are memoized per session
         
     Yields:
         Formatted response chunks for streaming
+
+    Identical conversations (same normalized messages, same patient data version)
+    are answered from the response cache by replaying the recorded frames.
+    Latency, tool and token metrics are recorded on a RequestTrace.
+    """
+    trace = RequestTrace("chat")
+    async for frame in trace.stream(_cached_stream(messages, trace, session_id)):
+        yield frame
+
+
+def _response_cache_key(messages: List[dict]) -> str:
+    # data_version() may re-parse the record file or query the database: call from a worker thread
+    return cache_key(MODEL_NAME, SYSTEM_PROMPT, tools, messages, get_storage().data_version())
+
+
+async def _cached_stream(messages: List[dict], trace: RequestTrace, session_id: Optional[str] = None):
+    key = None
+    if response_cache.enabled:
+        key = await asyncio.to_thread(_response_cache_key, messages)
+        cached = response_cache.get(key)
+        if cached is not None:
+            trace.status = "cached"
+            for frame in cached.frames:
+                yield frame
+            return
+
+    start = time.perf_counter()
+    ttft_s = None
+    frames = []
+    async for frame in _stream_model_turns(messages, trace, session_id):
+        if ttft_s is None and frame.startswith("0:"):
+            ttft_s = time.perf_counter() - start
+        if key is not None:
+            frames.append(frame)
+        yield frame
+
+    # Only complete, successful answers are cached
+    if key is not None and frames and frames[-1].startswith('e:{"finishReason": "stop"'):
+        response_cache.put(key, frames, ttft_s)
+
+
+async def _stream_model_turns(messages: List[dict], trace: RequestTrace, session_id: Optional[str] = None):
+    """
+    Run the model/tool loop and yield protocol frames.
+
+    Runs as an async generator on the AsyncOpenAI client so a single worker can
+    serve many concurrent streams; blocking tool functions run concurrently in a
+    bounded thread pool.
+
+    When the newest user message names one patient, that patient's summary is
+    added as an already answered get_patient_info call before the first model
+    round (see prefetch.py), which usually saves the round that would ask for it.
+    Repeated read-only tool calls in a session are answered from its tool memo
+    until a write touches the patient they read (see tool_memo.py).
     """
 
     
-    model_name = "gpt-4.1-mini"
     input_list = messages.copy()
+    execute = memoized(execute_function_call, session_id)
+    trace.stage = "prefetch"
+    input_list += await prefetch_context(messages)
     
     max_iterations = 5  # Prevent infinite loops
     iteration = 0
@@ -164,47 +379,47 @@ def stream_text(messages: List[dict], protocol: str = "data"):
     
     while iteration < max_iterations:
         iteration += 1
-        has_function_calls = False
-        
+        # Keep the prompt within the token budget; input_list itself stays complete
+        request_input, _ = compact_history(input_list)
+
         # Make streaming request with tools
-        with client.responses.stream(
-            model=model_name,
+        call_start = time.perf_counter()
+        trace.stage = "model"
+        async with get_async_client().responses.stream(
+            model=MODEL_NAME,
             instructions=SYSTEM_PROMPT,
-            input=input_list,
+            input=request_input,
             tools=tools,
+            prompt_cache_key=PROMPT_CACHE_KEY,
         ) as stream:
-            for event in stream:
+            async for event in stream:
                 et = getattr(event, "type", None)
                 
                 if et == "response.output_text.delta":
-                    # Stream text tokens immediately as they arrive
-                    yield f'0:{json.dumps(event.delta)}\n'
+                    # StreamWriter coalesces these into fewer frames on the way out
+                    yield text_frame(event.delta)
                     
                 elif et == "response.error":
                     err = getattr(event, "error", {}) or {}
                     msg = err.get("message", "unknown error")
                     payload = {"finishReason": "error", "message": msg}
-                    yield f'e:{json.dumps(payload)}\n'
+                    yield finish_frame(payload)
                     return
 
             # Get final response to check for function calls
-            final_response = stream.get_final_response()
+            final_response = await stream.get_final_response()
+            trace.model_call(time.perf_counter() - call_start)
+            trace.add_usage(getattr(final_response, "usage", None))
             
             # Add output to input list
             input_list += final_response.output
             
-            # Check if there are function calls to handle
-            for item in final_response.output:
-                if item.type == "function_call":
-                    has_function_calls = True
-                    
-                    # Execute the function and add result to input
-                    result_output = execute_function_call(item.name, item.arguments)
-                    input_list.append({
-                        "type": "function_call_output",
-                        "call_id": item.call_id,
-                        "output": result_output
-                    })
+            # Run every function call from this turn concurrently; outputs keep call order
+            function_calls = [item for item in final_response.output if item.type == "function_call"]
+            has_function_calls = bool(function_calls)
+            if has_function_calls:
+                trace.stage = "tools"
+                input_list += await run_function_calls(function_calls, execute)
             
             # If no function calls, we're done
             if not has_function_calls:
@@ -221,5 +436,5 @@ def stream_text(messages: List[dict], protocol: str = "data"):
             "usage": {"promptTokens": prompt_tokens, "completionTokens": completion_tokens},
             "isContinued": False,
         }
-        yield f'e:{json.dumps(tail)}\n'
+        yield finish_frame(tail)
 
@@ -1,15 +1,18 @@
-import os
 import json
-from typing import List, Dict
-from openai import OpenAI
+import time
+from typing import List
 from dotenv import load_dotenv
 
 from .utils.write_patient_record import write_patient_intake
+from .utils.response_cache import canonical_tools, prompt_cache_key
+from .utils.history import compact_history
+from .utils.metrics import RequestTrace
+from .utils.openai_clients import get_async_client
+from .utils.serialization import dumps, finish_frame, text_frame
+from .utils.tool_runner import run_function_calls
 
 load_dotenv()
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
 # Define tools for patient chat
 patient_tools = [
     {
@@ -143,6 +146,11 @@ Example flow:
 Remember: You're gathering information and providing compassionate support, not diagnosing or treating.
 """.strip()
 
+# Send byte-identical instructions + tools on every call so the provider's prompt-prefix cache applies.
+# Patient chats are never response-cached: answers are personal and the tool writes records.
+patient_tools = canonical_tools(patient_tools)
+PATIENT_PROMPT_CACHE_KEY = prompt_cache_key("deepscribe-patient-chat", PATIENT_SYSTEM_PROMPT, patient_tools)
+
 
 def execute_patient_function_call(function_name: str, arguments: str) -> str:
     """
@@ -158,12 +166,19 @@ def execute_patient_function_call(function_name: str, arguments: str) -> str:
     if function_name == "write_patient_intake":
         args = json.loads(arguments)
         result = write_patient_intake(**args)
-        return json.dumps(result)
+        return dumps(result)
     
-    return json.dumps({"error": f"Unknown function: {function_name}"})
+    return dumps({"error": f"Unknown function: {function_name}"})
+
+
+async def stream_patient_text(messages: List[dict], protocol: str = "data"):
+    """Stream a patient chat answer, recording latency, tool and token metrics on a RequestTrace."""
+    trace = RequestTrace("patient_chat")
+    async for frame in trace.stream(_stream_patient_turns(messages, trace)):
+        yield frame
 
 
-def stream_patient_text(messages: List[dict], protocol: str = "data"):
+async def _stream_patient_turns(messages: List[dict], trace: RequestTrace):
     """
     Stream text responses for patient chat with function calling support.
     
@@ -173,6 +188,10 @@ def stream_patient_text(messages: List[dict], protocol: str = "data"):
         
     Yields:
         Formatted response chunks for streaming
+
+    Runs as an async generator on the AsyncOpenAI client so a single worker can
+    serve many concurrent streams; blocking tool functions run concurrently in a
+    bounded thread pool.
     """
     
     model_name = "gpt-4.1-mini"
@@ -184,47 +203,47 @@ def stream_patient_text(messages: List[dict], protocol: str = "data"):
     
     while iteration < max_iterations:
         iteration += 1
-        has_function_calls = False
-        
+        # Keep the prompt within the token budget; input_list itself stays complete
+        request_input, _ = compact_history(input_list)
+
         # Make streaming request with tools
-        with client.responses.stream(
+        call_start = time.perf_counter()
+        trace.stage = "model"
+        async with get_async_client().responses.stream(
             model=model_name,
             instructions=PATIENT_SYSTEM_PROMPT,
-            input=input_list,
+            input=request_input,
             tools=patient_tools,
+            prompt_cache_key=PATIENT_PROMPT_CACHE_KEY,
         ) as stream:
-            for event in stream:
+            async for event in stream:
                 et = getattr(event, "type", None)
                 
                 if et == "response.output_text.delta":
-                    # Stream text tokens immediately as they arrive
-                    yield f'0:{json.dumps(event.delta)}\n'
+                    # StreamWriter coalesces these into fewer frames on the way out
+                    yield text_frame(event.delta)
                     
                 elif et == "response.error":
                     err = getattr(event, "error", {}) or {}
                     msg = err.get("message", "unknown error")
                     payload = {"finishReason": "error", "message": msg}
-                    yield f'e:{json.dumps(payload)}\n'
+                    yield finish_frame(payload)
                     return
 
             # Get final response to check for function calls
-            final_response = stream.get_final_response()
+            final_response = await stream.get_final_response()
+            trace.model_call(time.perf_counter() - call_start)
+            trace.add_usage(getattr(final_response, "usage", None))
             
             # Add output to input list
             input_list += final_response.output
             
-            # Check if there are function calls to handle
-            for item in final_response.output:
-                if item.type == "function_call":
-                    has_function_calls = True
-                    
-                    # Execute the function and add result to input
-                    result_output = execute_patient_function_call(item.name, item.arguments)
-                    input_list.append({
-                        "type": "function_call_output",
-                        "call_id": item.call_id,
-                        "output": result_output
-                    })
+            # Run every function call from this turn concurrently; outputs keep call order
+            function_calls = [item for item in final_response.output if item.type == "function_call"]
+            has_function_calls = bool(function_calls)
+            if has_function_calls:
+                trace.stage = "tools"
+                input_list += await run_function_calls(function_calls, execute_patient_function_call)
             
             # If no function calls, we're done
             if not has_function_calls:
@@ -241,5 +260,5 @@ def stream_patient_text(messages: List[dict], protocol: str = "data"):
             "usage": {"promptTokens": prompt_tokens, "completionTokens": completion_tokens},
             "isContinued": False,
         }
-        yield f'e:{json.dumps(tail)}\n'
+        yield finish_frame(tail)
 
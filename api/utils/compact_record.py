@@ -0,0 +1,200 @@
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+# Store encounter records in the compact form below ("0" keeps plain dicts)
+RECORDS_COMPACT = os.getenv("RECORDS_COMPACT", "1") not in ("0", "false", "no")
+# Pre-serialized JSON kept for the most recently requested records
+COMPACT_JSON_CACHE_SIZE = int(os.getenv("COMPACT_JSON_CACHE_SIZE", "1024"))
+
+
+class Patient(NamedTuple):
+    mrn: Any
+    name: Any
+    dob: Any
+    age: Any
+    sex: Any
+
+
+class Vitals(NamedTuple):
+    bp: Any
+    hr_bpm: Any
+    rr_bpm: Any
+    temp_f: Any
+    spo2_pct: Any
+    bmi: Any
+
+
+class Assessment(NamedTuple):
+    problem: Any
+    icd10: Any
+    # Remaining keys of the assessment item, in order, as (key, value) pairs
+    extra: Tuple[Tuple[str, Any], ...]
+
+
+class Transcript(tuple):
+    """Transcript turns as (t, speaker, text) tuples with interned t/speaker strings."""
+
+    __slots__ = ()
+
+
+_TURN_KEYS = ("t", "speaker", "text")
+_key_orders: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def _shared_keys(keys: Tuple[str, ...]) -> Tuple[str, ...]:
+    """One key-order tuple shared by every record with the same top-level layout."""
+    return _key_orders.setdefault(keys, keys)
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _pack_fixed(value: Any, cls) -> Any:
+    """dict -> NamedTuple when it has exactly cls._fields in that order, else unchanged."""
+    if isinstance(value, dict) and tuple(value) == cls._fields:
+        return cls(*value.values())
+    return value
+
+
+def _pack_assessment(value: Any) -> Any:
+    if not isinstance(value, list) or not all(
+        isinstance(item, dict) and tuple(item)[:2] == ("problem", "icd10") for item in value
+    ):
+        return value
+    return tuple(
+        Assessment(item["problem"], item["icd10"], tuple((k, v) for k, v in item.items() if k not in ("problem", "icd10")))
+        for item in value
+    )
+
+
+def _pack_transcript(value: Any) -> Any:
+    if not isinstance(value, list) or not all(isinstance(turn, dict) and tuple(turn) == _TURN_KEYS for turn in value):
+        return value
+    return Transcript((_intern(turn["t"]), _intern(turn["speaker"]), turn["text"]) for turn in value)
+
+
+_PACKERS = {
+    "patient": lambda v: _pack_fixed(v, Patient),
+    "vitals": lambda v: _pack_fixed(v, Vitals),
+    "assessment": _pack_assessment,
+    "transcript": _pack_transcript,
+}
+
+
+def _unpack(value: Any) -> Any:
+    # JSON never decodes to tuples, so any tuple here is one of ours
+    if isinstance(value, (Patient, Vitals)):
+        return value._asdict()
+    if isinstance(value, Transcript):
+        return [{"t": t, "speaker": speaker, "text": text} for t, speaker, text in value]
+    if isinstance(value, tuple):
+        return [{"problem": a.problem, "icd10": a.icd10, **dict(a.extra)} for a in value]
+    return value
+
+
+class CompactRecord:
+    """
+    One encounter record with its hot fields packed: patient and vitals as
+    NamedTuples, assessment items as (problem, icd10, extra) tuples, and the
+    transcript as (t, speaker, text) tuples. Fields without the expected shape,
+    and all other fields, keep their decoded JSON values.
+
+    to_dict() rebuilds an equal dict with the original key order, so
+    json.dumps(record.to_dict()) is byte-identical to json.dumps(original).
+    Nested values of other fields are shared with the caller: treat them as read-only.
+    """
+
+    __slots__ = ("keys", "values")
+
+    def __init__(self, record: Dict[str, Any]):
+        self.keys = _shared_keys(tuple(record))
+        self.values = tuple(
+            _PACKERS[key](value) if key in _PACKERS else value
+            for key, value in record.items()
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Field value in its dict form."""
+        try:
+            return _unpack(self.values[self.keys.index(key)])
+        except ValueError:
+            return default
+
+    def field(self, key: str) -> Any:
+        """Field value in its packed form, or None."""
+        try:
+            return self.values[self.keys.index(key)]
+        except ValueError:
+            return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: _unpack(value) for key, value in zip(self.keys, self.values)}
+
+
+class CompactRecordMapping(Mapping):
+    """
+    Read-only patient_id -> record mapping over CompactRecords.
+
+    Lookups return a freshly rebuilt dict. json(patient_id) returns the record's
+    serialized JSON, encoded on first request and kept in an LRU, so repeated
+    full-record tool calls skip json.dumps.
+    """
+
+    def __init__(self, records: Dict[str, Dict[str, Any]], json_cache_size: int = COMPACT_JSON_CACHE_SIZE):
+        self._records: Dict[str, CompactRecord] = {key: CompactRecord(record) for key, record in records.items()}
+        self._json: "OrderedDict[str, str]" = OrderedDict()
+        self._json_cache_size = json_cache_size
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> Dict[str, Any]:
+        return self._records[key].to_dict()
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def compact(self, key: str) -> Optional[CompactRecord]:
+        return self._records.get(key)
+
+    def json(self, key: str) -> Optional[str]:
+        with self._lock:
+            blob = self._json.get(key)
+            if blob is not None:
+                self._json.move_to_end(key)
+                return blob
+        record = self._records.get(key)
+        if record is None:
+            return None
+        blob = json.dumps(record.to_dict())
+        with self._lock:
+            self._json[key] = blob
+            while len(self._json) > self._json_cache_size:
+                self._json.popitem(last=False)
+        return blob
+
+    def _patients(self) -> Iterator[Tuple[str, Any]]:
+        for key, record in self._records.items():
+            patient = record.field("patient")
+            yield key, patient._asdict() if isinstance(patient, Patient) else (patient or {})
+
+    def names(self) -> List[Dict[str, str]]:
+        return [{"patient_id": key, "name": p.get("name")} for key, p in self._patients() if p.get("name")]
+
+    def mrns(self) -> Dict[str, str]:
+        return {str(p["mrn"]).strip(): key for key, p in self._patients() if p.get("mrn")}
+
+    def directory(self) -> List[Tuple[str, str, str, str]]:
+        return [
+            (key, str(p.get("name") or ""), str(p.get("mrn") or ""), str(p.get("dob") or ""))
+            for key, p in self._patients()
+        ]
@@ -1,81 +1,142 @@
-import json
-import os
+import logging
 from typing import Optional, Tuple, List, Dict, Any
-from openai import OpenAI
-from dotenv import load_dotenv
 
+from .serialization import dumps
+from .storage import get_storage
+from .rag_cache import rag_cache
+from .patient_query import DEFAULT_LIMIT, get_query_index
+from .projection import project_patient_record
+from .transcript_search import get_transcript_index
+from .patient_resolver import RESOLVE_LIMIT, confident_match, get_patient_resolver
 
+logger = logging.getLogger(__name__)
 
-def _load_patient_records() -> Dict[str, Any]:
-    """
-    Helper function to load patient records from JSON file.
-    
-    Returns:
-        Dictionary containing patient_scribes data, or empty dict if error.
-    """
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(os.path.dirname(current_dir))
-    records_path = os.path.join(project_root, "patient_records.json")
+# Patients per get_patient_names page (and the most a caller may ask for)
+PATIENT_NAMES_PAGE_SIZE = 50
+PATIENT_NAMES_MAX_PAGE_SIZE = 200
 
+
+def parse_int_arg(name: str, value: Any) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """(int, None) for an integer tool argument (ints and numeric strings), else (None, error dict)."""
     try:
-        with open(records_path, "r") as f:
-            data = json.load(f)
-            return data.get("patient_scribes", {})
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+        return int(value), None
+    except (TypeError, ValueError):
+        return None, {"error": f"Invalid {name} '{value}'. Expected an integer"}
+
+
+def parse_age_arg(age: Any) -> Tuple[Optional[Tuple[int, int]], Optional[Dict[str, Any]]]:
+    """((start_age, end_age), None) for an age range argument (None passes through), else (None, error dict)."""
+    if age is None:
+        return None, None
+    if isinstance(age, (str, bytes)) or not hasattr(age, "__len__") or len(age) != 2:
+        return None, {"error": f"Invalid age '{age}'. Expected [start_age, end_age]"}
+    start_age, error = parse_int_arg("start age", age[0])
+    if error:
+        return None, error
+    end_age, error = parse_int_arg("end age", age[1])
+    if error:
+        return None, error
+    return (start_age, end_age), None
+
 
-def get_patient_names() -> List[Dict[str, str]]:
+def get_patient_names(offset: int = 0, limit: int = PATIENT_NAMES_PAGE_SIZE) -> Dict[str, Any]:
     """
-    Retrieve all patient names and their corresponding patient IDs.
-    
+    Retrieve one page of patient names and their corresponding patient IDs.
+
+    Args:
+        offset: Index of the first patient to return
+        limit: Page size (capped at PATIENT_NAMES_MAX_PAGE_SIZE)
+
     Returns:
-        List of dictionaries with 'patient_id' and 'name' keys.
-        Example: [{"patient_id": "jordan_carter", "name": "Jordan Carter"}, ...]
+        {"patients", "total", "offset", "next_offset"} where patients is a list of
+        {"patient_id", "name"} and next_offset is None on the last page, or
+        {"error": ...} when offset or limit is not an integer.
+        Example: {"patients": [{"patient_id": "jordan_carter", "name": "Jordan Carter"}, ...],
+                  "total": 5, "offset": 0, "next_offset": None}
     """
-    patient_scribes = _load_patient_records()
-    
-    patient_list = []
-    for patient_id, record in patient_scribes.items():
-        patient_info = record.get("patient", {})
-        name = patient_info.get("name", "")
-        if name:
-            patient_list.append({
-                "patient_id": patient_id,
-                "name": name
-            })
-    
-    return patient_list
+    offset, error = parse_int_arg("offset", offset)
+    if error:
+        return error
+    limit, error = parse_int_arg("limit", limit)
+    if error:
+        return error
+    names = get_storage().patient_names()
+    offset = max(0, offset)
+    limit = max(1, min(limit, PATIENT_NAMES_MAX_PAGE_SIZE))
+    page = names[offset:offset + limit]
+    next_offset = offset + limit if offset + limit < len(names) else None
+    return {"patients": page, "total": len(names), "offset": offset, "next_offset": next_offset}
+
+def resolve_patient_id(name_or_id: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    (patient_id, None) for a patient ID, MRN or name that identifies one patient
+    confidently, else (None, error dict listing the candidates to choose from).
+    """
+    matches = get_patient_resolver().resolve(name_or_id)
+    match = confident_match(matches)
+    if match is not None:
+        return match["patient_id"], None
+    if not matches:
+        return None, {"error": f"No patient found for '{name_or_id}'"}
+    return None, {"error": f"'{name_or_id}' matches more than one patient; pick one patient_id", "candidates": matches}
 
 def get_patient_info(
     patient_id: str,
     age: Optional[Tuple[int, int]] = None,
     gender: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    view: Optional[str] = None,
+    transcript_start: Optional[str] = None,
+    transcript_end: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
-    Retrieve a specific patient record by patient ID with optional filters.
+    Retrieve a specific patient record with optional filters and projection.
 
     Args:
-        patient_id: Required patient ID to retrieve (e.g., "jordan_carter", "emily_chen")
+        patient_id: Required patient ID, MRN or name (e.g., "jordan_carter", "JC-045872", "Jordan Carter").
+                    Anything that is not a patient ID is resolved with resolve_patient.
         age: Optional tuple of (start_age, end_age) to filter patients within age range.
              The upper limit is capped at 100.
         gender: Optional gender to filter by (M, F, or variations like "Male", "Female")
+        fields: Optional dot paths to return (e.g. ["vitals", "plan.medication_changes"])
+        exclude: Optional dot paths to leave out (e.g. ["transcript", "exam"])
+        view: Optional named view: "summary", "meds", "transcript_window" or "full" (default)
+        transcript_start: Optional start mark ("MM:SS") to window the transcript
+        transcript_end: Optional end mark ("MM:SS") to window the transcript
 
     Returns:
-        Patient record dictionary if found and matches filters, otherwise empty dict.
+        Patient record dictionary (projected if requested) if found and matches filters,
+        otherwise a dict with an "error" key (and "candidates" when a name is ambiguous,
+        or when age is not a pair of integers).
 
     Example:
         # Get patient by ID
         get_patient_info(patient_id="jordan_carter")
+
+        # Get patient by name or MRN
+        get_patient_info(patient_id="Jordan Carter", view="summary")
         
         # Get patient by ID with age filter
         get_patient_info(patient_id="emily_chen", age=(30, 50), gender="F")
+
+        # Only medications, or two minutes of transcript
+        get_patient_info(patient_id="jordan_carter", view="meds")
+        get_patient_info(patient_id="jordan_carter", view="transcript_window", transcript_start="01:00", transcript_end="03:00")
     """
-    patient_scribes = _load_patient_records()
-    
-    # Get the specific patient record
-    patient_record = patient_scribes.get(patient_id)
+    age, error = parse_age_arg(age)
+    if error:
+        return error
+    # Indexed lookup in the configured storage backend (STORAGE_BACKEND)
+    storage = get_storage()
+    patient_record = storage.get_record(patient_id)
     if not patient_record:
-        return {"error": f"Patient ID '{patient_id}' not found"}
+        resolved_id, error = resolve_patient_id(patient_id)
+        if error is not None:
+            return error
+        patient_record = storage.get_record(resolved_id)
+        if not patient_record:
+            return {"error": f"Patient ID '{resolved_id}' not found"}
     
     patient_info = patient_record.get("patient", {})
     
@@ -99,39 +160,158 @@ def get_patient_info(
         if patient_sex != gender_normalized:
             return {"error": f"Patient does not match gender filter '{gender}'"}
     
-    return patient_record
+    return project_patient_record(
+        patient_record,
+        fields=fields,
+        exclude=exclude,
+        view=view,
+        transcript_start=transcript_start,
+        transcript_end=transcript_end,
+    )
 
-# ----------------
-# TOOL 3. Rag search. This tool is used when the agent wants to find a general piece of info in the client records. ex: "Find me patients with mental health issues" -> becomes increasingly important as you scale up the patient records database. 
-# Vector already initalized in testing_rag and file was already uploaded there as well. 
-load_dotenv()
-vectorStoreID = os.getenv("VECTOR_STORE_ID")
-if not vectorStoreID:
-    vectorStoreID = "vs_68f972091abc8191ac6168a7566427a1" # generated in testing_rag.py! 
-    print("[INFO] Using default VECTOR_STORE_ID:", vectorStoreID)
+def get_patient_info_json(patient_id: str, **kwargs: Any) -> str:
+    """
+    get_patient_info(patient_id, **kwargs) as JSON, but an unfiltered,
+    unprojected full-record request is answered from the storage backend's
+    pre-serialized JSON instead of being re-encoded on every tool call.
+    A name or MRN is resolved to its patient ID first.
+    """
+    filters = ("age", "gender", "fields", "exclude", "transcript_start", "transcript_end")
+    wants_full_record = (
+        set(kwargs) <= {"view", *filters}
+        and kwargs.get("view") in (None, "full")
+        and all(kwargs.get(name) is None for name in filters)
+    )
+    if wants_full_record:
+        storage = get_storage()
+        blob = storage.get_record_json(patient_id)
+        if blob is None:
+            resolved_id, error = resolve_patient_id(patient_id)
+            if error is not None:
+                return dumps(error)
+            blob = storage.get_record_json(resolved_id)
+        if blob is not None:
+            return blob
+    return dumps(get_patient_info(patient_id, **kwargs))
+
+def query_patients(
+    age: Optional[Tuple[int, int]] = None,
+    sex: Optional[str] = None,
+    icd10: Optional[List[str]] = None,
+    medication: Optional[str] = None,
+    medication_action: str = "any",
+    specialty: Optional[str] = None,
+    limit: int = DEFAULT_LIMIT,
+) -> Dict[str, Any]:
+    """
+    Find all patients matching structured filters, using in-memory secondary indexes.
 
+    Args:
+        age: Optional (start_age, end_age) range, inclusive. The upper limit is capped at 100.
+        sex: Optional sex filter (M, F, or variations like "Male", "Female")
+        icd10: Optional list of ICD-10 codes the patient must all have; a category like "E11" matches "E11.9"
+        medication: Optional drug name from plan.medication_changes (e.g. "losartan")
+        medication_action: "start", "stop" or "any" (default) for the medication filter
+        specialty: Optional provider specialty (e.g. "Family Medicine")
+        limit: Maximum number of results to return
 
-client = OpenAI() 
+    Returns:
+        {"count", "results", "truncated"} where results are compact projections
+        (patient_id, name, mrn, age, sex, chief_complaint, icd10, medication_changes, specialty),
+        or {"error": ...} when age or limit is not an integer.
 
-def search_records_RAG(query: str):
-    print("\nUsing RAG to search through patient records database.\n")
-    results = client.vector_stores.search(
-        vector_store_id=vectorStoreID, 
-        query=query
+    Example:
+        # All female patients 60-70 with type 2 diabetes
+        query_patients(age=(60, 70), sex="F", icd10=["E11.9"])
+    """
+    age, error = parse_age_arg(age)
+    if error:
+        return error
+    limit, error = parse_int_arg("limit", limit)
+    if error:
+        return error
+    return get_query_index().query(
+        age=age,
+        sex=sex,
+        icd10=icd10,
+        medication=medication,
+        medication_action=medication_action,
+        specialty=specialty,
+        limit=max(0, limit),
     )
-    
-    # Convert the SyncPage object to a JSON-serializable format
-    search_results = []
-    for result in results.data:
-        search_results.append({
-            "content": result.content,
-            "score": getattr(result, 'score', None),
-            "metadata": getattr(result, 'metadata', {}),
-        })
-    
-    return str({
+
+def search_transcript(
+    patient_id: str,
+    query: str,
+    window: int = 2,
+    max_matches: int = 10,
+) -> Dict[str, Any]:
+    """
+    Search one patient's encounter transcript and return only the matching turns
+    plus surrounding context, with their time marks.
+
+    Args:
+        patient_id: Patient ID, MRN or name whose transcript to search (e.g., "jordan_carter")
+        query: Words to look for (e.g., "heartburn at night")
+        window: Number of turns of context to include before and after each match
+        max_matches: Maximum number of matching turns to return
+
+    Returns:
+        {"patient_id", "query", "total_turns", "matches", "segments"} where each segment is
+        {"start", "end", "turns"} and matching turns are flagged with "match": true,
+        or {"error": ...} when window or max_matches is not an integer.
+    """
+    window, error = parse_int_arg("window", window)
+    if error:
+        return error
+    max_matches, error = parse_int_arg("max_matches", max_matches)
+    if error:
+        return error
+    storage = get_storage()
+    # Intake writes don't touch encounter transcripts, so they keep the cached indexes
+    records_version = storage.records_version()
+    patient_record = storage.get_record(patient_id)
+    if not patient_record:
+        patient_id, error = resolve_patient_id(patient_id)
+        if error is not None:
+            return error
+        patient_record = storage.get_record(patient_id)
+        if not patient_record:
+            return {"error": f"Patient ID '{patient_id}' not found"}
+
+    transcript = patient_record.get("transcript") or []
+    index = get_transcript_index(records_version, patient_id, transcript)
+    result = index.search(query, window=max(0, window), max_matches=max(1, max_matches))
+    return {"patient_id": patient_id, "query": query, "total_turns": len(transcript), **result}
+
+def resolve_patient(name_or_mrn: str, limit: int = RESOLVE_LIMIT) -> Dict[str, Any]:
+    """
+    Find patients by name (typos and partial names allowed), MRN, patient ID or
+    date of birth, or a name plus date of birth ("Jordan Carter 1967-03-11").
+
+    Returns:
+        {"query", "matches"} with at most `limit` matches, best first, each
+        {"patient_id", "name", "mrn", "dob", "score", "matched_on"}, or
+        {"error": ...} when limit is not an integer.
+    """
+    limit, error = parse_int_arg("limit", limit)
+    if error:
+        return error
+    matches = get_patient_resolver().resolve(name_or_mrn, limit=max(1, min(limit, 25)))
+    return {"query": name_or_mrn, "matches": matches}
+
+# ----------------
+# TOOL 3. Rag search. This tool is used when the agent wants to find a general piece of info in the client records. ex: "Find me patients with mental health issues" -> becomes increasingly important as you scale up the patient records database. 
+# The backend is picked by RAG_BACKEND: "openai" uses the hosted vector store populated in testing_rag.py,
+# "local" searches an in-process index over the record store (see retrieval.py). Repeated and
+# equivalent queries are answered from rag_cache until the index changes.
+
+def search_records_RAG(query: str) -> Dict[str, Any]:
+    search_results = rag_cache.search(query)
+    logger.debug("search_records_RAG %r: %d results", query, len(search_results))
+
+    return {
         "query": query,
         "results": search_results,
         "count": len(search_results)
-    })
-
+    }
@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from .tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Prompt-token budget for the Responses `input` (0 disables compaction)
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "24000"))
+# Most recent user turns that are always kept verbatim
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+SUMMARY_CHARS_PER_MESSAGE = 160
+
+
+@dataclass
+class CompactionStats:
+    tokens_before: int = 0
+    tokens_after: int = 0
+    outputs_deduplicated: int = 0
+    outputs_referenced: int = 0
+    messages_summarized: int = 0
+    messages_truncated: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+class HistoryMetrics:
+    """Process-wide totals across all compactions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compactions = 0
+        self.tokens_before = 0
+        self.tokens_saved = 0
+
+    def record(self, stats: CompactionStats) -> None:
+        with self._lock:
+            self.compactions += 1
+            self.tokens_before += stats.tokens_before
+            self.tokens_saved += stats.tokens_saved
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "compactions": self.compactions,
+            "tokens_before": self.tokens_before,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+history_metrics = HistoryMetrics()
+
+
+def _get(item: Any, key: str, default: Any = None) -> Any:
+    if isinstance(item, dict):
+        return item.get(key, default)
+    return getattr(item, key, default)
+
+
+def _item_type(item: Any) -> str:
+    return _get(item, "type") or ("message" if _get(item, "role") else "")
+
+
+def _item_tokens(item: Any) -> int:
+    if isinstance(item, dict):
+        return estimate_tokens(item)
+    if hasattr(item, "model_dump"):
+        return estimate_tokens(item.model_dump(exclude_none=True))
+    return estimate_tokens(str(item))
+
+
+def _total_tokens(items: List[Any]) -> int:
+    return sum(_item_tokens(item) for item in items)
+
+
+def _message_text(item: Any) -> str:
+    content = _get(item, "content")
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        text = _get(part, "text")
+        if text:
+            parts.append(text)
+    return " ".join(parts)
+
+
+def _describe_call(name: str, arguments: str) -> str:
+    try:
+        args = json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        args = {}
+    if name == "get_patient_info" and args.get("patient_id"):
+        return f"record {args['patient_id']}"
+    if args:
+        return f"{name}(" + ", ".join(f"{k}={json.dumps(v)}" for k, v in args.items()) + ")"
+    return f"{name}()"
+
+
+def _truncate_text(text: str, max_tokens: int) -> str:
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN - 20)
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + " …[truncated]"
+
+
+def compact_history(
+    input_list: List[Any],
+    budget_tokens: int = HISTORY_TOKEN_BUDGET,
+    keep_turns: int = HISTORY_KEEP_TURNS,
+) -> Tuple[List[Any], CompactionStats]:
+    """
+    Shrink a Responses `input` list to fit a token budget before sending it.
+
+    An input within budget is returned as is, so earlier items stay
+    byte-identical between turns and keep hitting the prompt cache. Otherwise
+    stages run cheapest and least lossy first, each only while the input is
+    still over budget:
+      1. An output of a tool call that is repeated later with the same
+         arguments is replaced by a pointer to the later call.
+      2. Tool outputs from before the latest model round become short references
+         ("record jordan_carter, fetched earlier").
+      3. Messages before the last `keep_turns` user turns are folded into one
+         summary message, placed where the first of them was.
+      4. Remaining long messages and tool outputs are cut, oldest first. The latest
+         user message is never cut.
+
+    function_call items are always kept so every remaining output still has its call,
+    and items that remain keep their relative order. The input list is not modified.
+
+    Returns:
+        (compacted input list, CompactionStats)
+    """
+    stats = CompactionStats(tokens_before=_total_tokens(input_list))
+    if budget_tokens <= 0 or stats.tokens_before <= budget_tokens:
+        stats.tokens_after = stats.tokens_before
+        return list(input_list), stats
+
+    items = list(input_list)
+    calls: Dict[str, Tuple[str, str]] = {}
+    for item in items:
+        if _item_type(item) == "function_call":
+            calls[_get(item, "call_id")] = (_get(item, "name", ""), _get(item, "arguments", ""))
+
+    # 1. Deduplicate repeated fetches: keep only the newest output per (tool, args)
+    latest_call_for: Dict[Tuple[str, str], str] = {}
+    for item in items:
+        if _item_type(item) == "function_call_output" and _get(item, "call_id") in calls:
+            name, arguments = calls[_get(item, "call_id")]
+            latest_call_for[(name, json.dumps(_safe_json(arguments), sort_keys=True))] = _get(item, "call_id")
+    for i, item in enumerate(items):
+        if _item_type(item) != "function_call_output" or _get(item, "call_id") not in calls:
+            continue
+        name, arguments = calls[_get(item, "call_id")]
+        latest = latest_call_for[(name, json.dumps(_safe_json(arguments), sort_keys=True))]
+        if latest != _get(item, "call_id"):
+            items[i] = _with_output(item, f"[Same result as the later {name} call {latest}]")
+            stats.outputs_deduplicated += 1
+
+    # 2. Older tool outputs -> references; the latest round's outputs stay intact
+    if _total_tokens(items) > budget_tokens:
+        last_round_start = _last_round_start(items)
+        for i in range(last_round_start):
+            item = items[i]
+            if _item_type(item) != "function_call_output" or _get(item, "output", "").startswith("[Same result"):
+                continue
+            name, arguments = calls.get(_get(item, "call_id"), ("tool", ""))
+            reference = f"[{_describe_call(name, arguments)}, fetched earlier; call {name} again if you need the details]"
+            if len(reference) < len(_get(item, "output", "")):
+                items[i] = _with_output(item, reference)
+                stats.outputs_referenced += 1
+
+    # 3. Summarize messages beyond the last keep_turns user turns
+    if _total_tokens(items) > budget_tokens:
+        user_positions = [i for i, item in enumerate(items) if _item_type(item) == "message" and _get(item, "role") == "user"]
+        if len(user_positions) > keep_turns:
+            cut = user_positions[-keep_turns] if keep_turns > 0 else user_positions[-1]
+            old = [item for item in items[:cut] if _item_type(item) == "message"]
+            if old:
+                first = next(i for i, item in enumerate(items) if _item_type(item) == "message")
+                before = items[:first]
+                kept_old = [item for item in items[first:cut] if _item_type(item) != "message"]
+                summary = _summarize(old, budget_tokens - _total_tokens(before + kept_old + items[cut:]))
+                items = before + [summary] + kept_old + items[cut:]
+                stats.messages_summarized += len(old)
+
+    # 4. Last resort: cut long content, oldest first, never the latest user message
+    item_tokens = [_item_tokens(item) for item in items]
+    if sum(item_tokens) > budget_tokens:
+        last_user = max((i for i, item in enumerate(items) if _get(item, "role") == "user"), default=-1)
+        for i, item in enumerate(items):
+            over = sum(item_tokens) - budget_tokens
+            if over <= 0:
+                break
+            if i == last_user:
+                continue
+            kind = _item_type(item)
+            if kind == "function_call_output":
+                text = _get(item, "output", "")
+                items[i] = _with_output(item, _truncate_text(text, max(8, estimate_tokens(text) - over)))
+            elif kind == "message" and isinstance(item, dict) and isinstance(item.get("content"), str):
+                text = item["content"]
+                items[i] = {**item, "content": _truncate_text(text, max(8, estimate_tokens(text) - over))}
+            else:
+                continue
+            item_tokens[i] = _item_tokens(items[i])
+            stats.messages_truncated += 1
+
+    stats.tokens_after = sum(item_tokens)
+    history_metrics.record(stats)
+    return items, stats
+
+
+def _safe_json(arguments: str) -> Any:
+    try:
+        return json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        return arguments
+
+
+def _with_output(item: Any, output: str) -> Dict[str, Any]:
+    return {"type": "function_call_output", "call_id": _get(item, "call_id"), "output": output}
+
+
+def _last_round_start(items: List[Any]) -> int:
+    """Index of the first item of the most recent model round (its function calls and their outputs)."""
+    i = len(items)
+    while i > 0 and _item_type(items[i - 1]) == "function_call_output":
+        i -= 1
+    while i > 0 and _item_type(items[i - 1]) in ("function_call", "reasoning"):
+        i -= 1
+    return i
+
+
+def _summarize(messages: List[Any], max_tokens: int) -> Dict[str, str]:
+    """Fold messages into one developer message of 'role: first words' lines, dropping the oldest to fit."""
+    lines = []
+    for message in messages:
+        text = " ".join(_message_text(message).split())
+        if len(text) > SUMMARY_CHARS_PER_MESSAGE:
+            text = text[:SUMMARY_CHARS_PER_MESSAGE] + "…"
+        lines.append(f"- {_get(message, 'role')}: {text}")
+
+    header = f"Summary of the {len(messages)} earlier messages in this conversation (oldest first):"
+    omitted = 0
+    while lines and estimate_tokens(header + "\n" + "\n".join(lines)) > max(max_tokens, 0):
+        lines.pop(0)
+        omitted += 1
+    if omitted:
+        lines.insert(0, f"- ({omitted} oldest messages omitted)")
+    return {"role": "developer", "content": header + "\n" + "\n".join(lines)}
+
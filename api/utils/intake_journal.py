@@ -0,0 +1,201 @@
+import fcntl
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .record_store import INTAKE_JOURNAL_PATH, PATIENT_RECORDS_PATH, read_journal
+
+# fsync once per this many appends, or once this many seconds after the first unsynced append
+FSYNC_BATCH = int(os.getenv("INTAKE_FSYNC_BATCH", "16"))
+FSYNC_INTERVAL_S = float(os.getenv("INTAKE_FSYNC_INTERVAL_MS", "50")) / 1000
+# Fold the journal into patient_records.json after this many entries (0 disables)
+COMPACT_EVERY = int(os.getenv("INTAKE_COMPACT_EVERY", "500"))
+
+
+def _new_file_mode() -> int:
+    """Mode open() gives a new file under the current umask (mkstemp always uses 0600)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+class IntakeJournal:
+    """
+    Append-only JSONL log of AI intake records.
+
+    Each intake is one line appended with O_APPEND, so writes are O(record)
+    instead of O(database) and concurrent writers never overwrite each other.
+    fsyncs are batched across writers, and the journal is periodically
+    compacted into the AI_scribes section of patient_records.json.
+    """
+
+    def __init__(
+        self,
+        path: str = INTAKE_JOURNAL_PATH,
+        snapshot_path: str = PATIENT_RECORDS_PATH,
+        fsync_batch: int = FSYNC_BATCH,
+        fsync_interval_s: float = FSYNC_INTERVAL_S,
+        compact_every: int = COMPACT_EVERY,
+    ):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.fsync_batch = max(1, fsync_batch)
+        self.fsync_interval_s = fsync_interval_s
+        self.compact_every = compact_every
+
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._unsynced = 0
+        self._first_unsynced_at = 0.0
+        self._flusher: Optional[threading.Timer] = None
+        self._entries_since_compact = self._count_lines()
+
+        self.appends = 0
+        self.fsyncs = 0
+        self.compactions = 0
+
+    def _count_lines(self) -> int:
+        try:
+            with open(self.path, "rb") as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def _open(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def append(self, patient_id: str, record: Dict[str, Any]) -> None:
+        """Durably (within the fsync batch window) append one intake record."""
+        line = (json.dumps({"patient_id": patient_id, "record": record}) + "\n").encode("utf-8")
+
+        with self._lock:
+            fd = self._open()
+            # Shared lock: appends from many processes may interleave, compaction may not
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                os.write(fd, line)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+            self.appends += 1
+            self._entries_since_compact += 1
+            if self._unsynced == 0:
+                self._first_unsynced_at = time.monotonic()
+            self._unsynced += 1
+
+            if (self._unsynced >= self.fsync_batch
+                    or time.monotonic() - self._first_unsynced_at >= self.fsync_interval_s):
+                self._fsync_locked()
+            elif self._flusher is None:
+                # Make sure a lone write is synced even if no further writes arrive
+                self._flusher = threading.Timer(self.fsync_interval_s, self.flush)
+                self._flusher.daemon = True
+                self._flusher.start()
+
+            should_compact = self.compact_every and self._entries_since_compact >= self.compact_every
+
+        if should_compact:
+            self.compact()
+
+    def _fsync_locked(self) -> None:
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+            self.fsyncs += 1
+        self._unsynced = 0
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    def flush(self) -> None:
+        """fsync any appends that are still inside the batch window."""
+        with self._lock:
+            self._fsync_locked()
+
+    def entries(self) -> Dict[str, Any]:
+        return read_journal(self.path)[0]
+
+    def compact(self) -> int:
+        """
+        Merge the journal into patient_records.json and truncate it.
+
+        The snapshot is replaced atomically (write temp file, fsync, rename) and
+        keeps its file mode. Replaying a journal over a snapshot it was already
+        merged into is a no-op, so a crash between the rename and the truncate
+        loses nothing.
+
+        Returns:
+            Number of journal entries folded into the snapshot.
+        """
+        with self._lock:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                entries, _ = read_journal(self.path)
+                if entries:
+                    try:
+                        with open(self.snapshot_path, "r") as f:
+                            mode = stat.S_IMODE(os.fstat(f.fileno()).st_mode)
+                            data = json.load(f)
+                    except FileNotFoundError:
+                        mode = _new_file_mode()
+                        data = {}
+                    data.setdefault("AI_scribes", {}).update(entries)
+
+                    snapshot_dir = os.path.dirname(self.snapshot_path) or "."
+                    tmp_fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, suffix=".tmp")
+                    try:
+                        # The rename keeps the temp file's mode; give it the snapshot's
+                        os.fchmod(tmp_fd, mode)
+                        with os.fdopen(tmp_fd, "w") as f:
+                            json.dump(data, f, indent=2)
+                            f.flush()
+                            os.fsync(f.fileno())
+                        os.replace(tmp_path, self.snapshot_path)
+                    except BaseException:
+                        if os.path.exists(tmp_path):
+                            os.unlink(tmp_path)
+                        raise
+
+                os.ftruncate(fd, 0)
+                os.fsync(fd)
+                self._unsynced = 0
+                self._entries_since_compact = 0
+                self.compactions += 1
+                return len(entries)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        with self._lock:
+            self._fsync_locked()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "appends": self.appends,
+            "fsyncs": self.fsyncs,
+            "compactions": self.compactions,
+            "pending_entries": self._entries_since_compact,
+        }
+
+
+_journal: Optional[IntakeJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_intake_journal() -> IntakeJournal:
+    """Return the process-wide IntakeJournal, creating it on first use."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = IntakeJournal()
+    return _journal
@@ -0,0 +1,319 @@
+import json
+import os
+import re
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+# How many decoded records each LazyRecordMapping keeps around
+LAZY_RECORD_CACHE_SIZE = int(os.getenv("LAZY_RECORD_CACHE_SIZE", "256"))
+# Persist the offset index next to the data file so later cold starts skip the scan
+RECORDS_OFFSET_INDEX = os.getenv("RECORDS_OFFSET_INDEX", "1") not in ("0", "false", "no")
+
+INDEXED_SECTIONS = ("patient_scribes", "AI_scribes")
+INDEX_FORMAT = 2
+
+_NON_WS_RE = re.compile(rb"[^ \t\r\n]")
+_STRING_RE = re.compile(rb'"(?:[^"\\]|\\.)*"')
+_DECODER = json.JSONDecoder()
+_READ_CHUNK = 1 << 20
+_FIRST_VALUE_WINDOW = 1 << 16
+
+
+class _Reader:
+    """Buffered positional reads (os.pread) over an open file."""
+
+    def __init__(self, fd: int, size: int):
+        self.fd = fd
+        self.size = size
+        self.buf = b""
+        self.buf_start = 0
+
+    def _fill(self, pos: int, length: int) -> None:
+        self.buf = os.pread(self.fd, max(length, _READ_CHUNK), pos)
+        self.buf_start = pos
+
+    def window(self, pos: int, length: int) -> bytes:
+        offset = pos - self.buf_start
+        if offset < 0 or offset + length > len(self.buf) and self.buf_start + len(self.buf) < self.size:
+            self._fill(pos, length)
+            offset = 0
+        return self.buf[offset:offset + length]
+
+    def skip_ws(self, pos: int) -> Tuple[int, bytes]:
+        """Position and value of the next non-whitespace byte."""
+        while pos < self.size:
+            chunk = self.window(pos, 4096)
+            match = _NON_WS_RE.search(chunk)
+            if match:
+                pos += match.start()
+                return pos, chunk[match.start():match.start() + 1]
+            pos += len(chunk)
+        raise ValueError("unexpected end of JSON document")
+
+    def expect(self, pos: int, char: bytes) -> int:
+        pos, found = self.skip_ws(pos)
+        if found != char:
+            raise ValueError(f"expected {char!r} at byte {pos}, found {found!r}")
+        return pos + 1
+
+    def string(self, pos: int) -> Tuple[str, int]:
+        length = 4096
+        while True:
+            chunk = self.window(pos, length)
+            match = _STRING_RE.match(chunk)
+            if match:
+                return json.loads(match.group(0)), pos + match.end()
+            if pos + len(chunk) >= self.size:
+                raise ValueError(f"unterminated string at byte {pos}")
+            length *= 4
+
+    def value(self, pos: int) -> Tuple[Any, int]:
+        """Decode the JSON value starting at pos; returns (value, end byte offset)."""
+        return decode_span(lambda start, length: os.pread(self.fd, length, start), pos, self.size)
+
+
+def decode_span(read, pos: int, size: int) -> Tuple[Any, int]:
+    """
+    Decode one JSON value starting at byte `pos`, reading a window that doubles
+    until the whole value fits. Returns (value, end byte offset).
+    """
+    length = _FIRST_VALUE_WINDOW
+    while True:
+        raw = read(pos, length)
+        text = raw.decode("utf-8", errors="replace")
+        try:
+            value, end = _DECODER.raw_decode(text)
+        except json.JSONDecodeError:
+            if pos + len(raw) >= size:
+                raise
+            length *= 4
+            continue
+        # Character offset -> byte offset (identical for ASCII, json.dump's default)
+        end_byte = end if text.isascii() else len(text[:end].encode("utf-8"))
+        return value, pos + end_byte
+
+
+def _summary(section: str, record: Any) -> Tuple[str, str, str]:
+    """(name, mrn, dob) kept in the index for get_patient_names, MRN lookups and resolve_patient."""
+    if not isinstance(record, dict):
+        return "", "", ""
+    patient = record.get("patient") or record.get("patient_info") or {}
+    return str(patient.get("name") or ""), str(patient.get("mrn") or ""), str(patient.get("dob") or "")
+
+
+class SectionIndex:
+    """Byte spans of every entry in one top-level object (e.g. patient_scribes)."""
+
+    __slots__ = ("keys", "starts", "ends", "names", "mrns", "dobs", "positions")
+
+    def __init__(self):
+        self.keys: List[str] = []
+        self.starts = array("q")
+        self.ends = array("q")
+        self.names: List[str] = []
+        self.mrns: List[str] = []
+        self.dobs: List[str] = []
+        self.positions: Dict[str, int] = {}
+
+    def add(self, key: str, start: int, end: int, name: str, mrn: str, dob: str = "") -> None:
+        if key in self.positions:
+            # Duplicate keys: json.load keeps the last one, so do we
+            i = self.positions[key]
+            self.starts[i], self.ends[i], self.names[i], self.mrns[i], self.dobs[i] = start, end, name, mrn, dob
+            return
+        self.positions[key] = len(self.keys)
+        self.keys.append(key)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.names.append(name)
+        self.mrns.append(mrn)
+        self.dobs.append(dob)
+
+    def to_json(self) -> List[list]:
+        return [list(row) for row in zip(self.keys, self.starts, self.ends, self.names, self.mrns, self.dobs)]
+
+    @classmethod
+    def from_json(cls, rows: List[list]) -> "SectionIndex":
+        section = cls()
+        for key, start, end, name, mrn, dob in rows:
+            section.add(key, start, end, name, mrn, dob)
+        return section
+
+
+class RecordOffsetIndex:
+    """
+    Offset index over patient_records.json.
+
+    One pass over the file decodes each entry of patient_scribes / AI_scribes
+    in turn (so only one record is ever materialized), recording its byte span
+    plus the patient name, MRN and date of birth. Other top-level keys are decoded eagerly;
+    they are small. With RECORDS_OFFSET_INDEX on, the index is saved beside the
+    data file, keyed by its size and mtime, so the next cold start reads the
+    index instead of scanning.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sections: Dict[str, SectionIndex] = {}
+        self.other: Dict[str, Any] = {}
+        self.loaded_from_cache = False
+        st = os.stat(path)
+        self.signature = [st.st_mtime_ns, st.st_size]
+        if not self._load_cached():
+            self._scan(st.st_size)
+            self._save_cached()
+
+    @property
+    def cache_path(self) -> str:
+        return self.path + ".offsets"
+
+    def _scan(self, size: int) -> None:
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            reader = _Reader(fd, size)
+            pos = reader.expect(0, b"{")
+            pos, char = reader.skip_ws(pos)
+            while char != b"}":
+                key, pos = reader.string(pos)
+                pos = reader.expect(pos, b":")
+                pos, char = reader.skip_ws(pos)
+                if key in INDEXED_SECTIONS and char == b"{":
+                    pos = self._scan_section(reader, key, pos + 1)
+                else:
+                    self.other[key], pos = reader.value(pos)
+                pos, char = reader.skip_ws(pos)
+                if char == b",":
+                    pos, char = reader.skip_ws(pos + 1)
+        finally:
+            os.close(fd)
+
+    def _scan_section(self, reader: _Reader, name: str, pos: int) -> int:
+        section = self.sections.setdefault(name, SectionIndex())
+        pos, char = reader.skip_ws(pos)
+        while char != b"}":
+            key, pos = reader.string(pos)
+            pos = reader.expect(pos, b":")
+            pos, _ = reader.skip_ws(pos)
+            record, end = reader.value(pos)
+            section.add(key, pos, end, *_summary(name, record))
+            pos, char = reader.skip_ws(end)
+            if char == b",":
+                pos, char = reader.skip_ws(pos + 1)
+        return pos + 1
+
+    def _load_cached(self) -> bool:
+        if not RECORDS_OFFSET_INDEX:
+            return False
+        try:
+            with open(self.cache_path, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if cached.get("format") != INDEX_FORMAT or cached.get("signature") != self.signature:
+            return False
+        self.sections = {name: SectionIndex.from_json(rows) for name, rows in cached["sections"].items()}
+        self.other = cached.get("other") or {}
+        self.loaded_from_cache = True
+        return True
+
+    def _save_cached(self) -> None:
+        if not RECORDS_OFFSET_INDEX:
+            return
+        payload = {
+            "format": INDEX_FORMAT,
+            "signature": self.signature,
+            "sections": {name: section.to_json() for name, section in self.sections.items()},
+            "other": self.other,
+        }
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".offsets-", suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            # Read-only deployments just scan on every cold start
+            pass
+
+    def section(self, name: str) -> SectionIndex:
+        return self.sections.get(name) or SectionIndex()
+
+
+class LazyRecordMapping(Mapping):
+    """
+    Read-only patient_id -> record mapping backed by a SectionIndex.
+
+    Records are decoded from the file on first access and kept in a small LRU.
+    The file descriptor is opened when the mapping is created, so a data file
+    replaced on disk (os.replace) keeps serving the version that was indexed.
+    """
+
+    def __init__(self, path: str, section: SectionIndex, cache_size: int = LAZY_RECORD_CACHE_SIZE):
+        self.section = section
+        self._fd = os.open(path, os.O_RDONLY)
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self.decodes = 0
+
+    def __del__(self):
+        try:
+            os.close(self._fd)
+        except (AttributeError, OSError):
+            pass
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        i = self.section.positions[key]
+        start, end = self.section.starts[i], self.section.ends[i]
+        raw = os.pread(self._fd, end - start, start)
+        if len(raw) != end - start:
+            raise KeyError(f"{key}: data file changed underneath the offset index")
+        self.decodes += 1
+        record = json.loads(raw)
+        with self._lock:
+            self._cache[key] = record
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return record
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.section.positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.section.keys)
+
+    def __len__(self) -> int:
+        return len(self.section.keys)
+
+    def names(self) -> List[Dict[str, str]]:
+        return [
+            {"patient_id": key, "name": name}
+            for key, name in zip(self.section.keys, self.section.names)
+            if name
+        ]
+
+    def mrns(self) -> Dict[str, str]:
+        return {mrn: key for key, mrn in zip(self.section.keys, self.section.mrns) if mrn}
+
+    def directory(self) -> List[Tuple[str, str, str, str]]:
+        return list(zip(self.section.keys, self.section.names, self.section.mrns, self.section.dobs))
+
+
+def load_lazy(path: str) -> Optional[Tuple[LazyRecordMapping, LazyRecordMapping, RecordOffsetIndex]]:
+    """Index `path` and return lazy (patient_scribes, AI_scribes) mappings, or None if it can't be indexed."""
+    try:
+        index = RecordOffsetIndex(path)
+    except (OSError, ValueError):
+        return None
+    return (
+        LazyRecordMapping(path, index.section("patient_scribes")),
+        LazyRecordMapping(path, index.section("AI_scribes")),
+        index,
+    )
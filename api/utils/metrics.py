@@ -0,0 +1,251 @@
+import asyncio
+import bisect
+import math
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from a cached replay up to a long multi-tool answer
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ITERATION_BUCKETS = (1, 2, 3, 4, 5)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Per-bucket (non-cumulative) counts; the last slot is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple[str, ...], child: Any) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Minimal Prometheus text-format registry: counters and histograms, plus
+    collectors that report existing stats() dicts as gauges at scrape time.
+    """
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, prefix: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        """Export the numeric values of collect() as gauges named <prefix>_<key>."""
+        self._collectors.append((prefix, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, collect in self._collectors:
+            try:
+                values = collect()
+            except Exception as e:
+                lines.append(f"# collector {prefix} failed: {_escape(e)}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter("chat_requests_total", "Chat requests by endpoint and outcome.", ("endpoint", "status"))
+REQUEST_SECONDS = registry.histogram("chat_request_duration_seconds", "Time from request start to the last frame.", ("endpoint",))
+TTFT_SECONDS = registry.histogram("chat_ttft_seconds", "Time from request start to the first text delta.", ("endpoint",))
+MODEL_CALL_SECONDS = registry.histogram("chat_model_call_seconds", "Latency of one Responses API round trip (one loop iteration).", ("endpoint",))
+ITERATIONS = registry.histogram("chat_iterations", "Model/tool loop iterations per request.", ("endpoint",), ITERATION_BUCKETS)
+TOKENS = registry.counter("chat_tokens_total", "Tokens reported by final_response.usage, summed over iterations.", ("endpoint", "kind"))
+TOOL_SECONDS = registry.histogram("chat_tool_duration_seconds", "Tool execution latency, including time queued for a worker.", ("tool",))
+TOOL_CALLS = registry.counter("chat_tool_calls_total", "Tool calls by tool and outcome.", ("tool", "status"))
+CANCELLED = registry.counter("chat_cancelled_total", "Requests cancelled because the client went away, by the step that was cut short.", ("endpoint", "stage"))
+
+
+class RequestTrace:
+    """
+    Timing for one chat request. Create it when the request starts, call
+    model_call()/add_usage() from the model loop and wrap the frame generator
+    with stream() so TTFT, duration and outcome are recorded.
+    """
+
+    __slots__ = ("endpoint", "start", "ttft_s", "iterations", "prompt_tokens", "completion_tokens", "status", "stage")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.ttft_s: Optional[float] = None
+        self.iterations = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.status = "ok"
+        # What the loop is waiting on: "prefetch", "model" or "tools"; reported if the request is cancelled
+        self.stage = "start"
+
+    def model_call(self, seconds: float) -> None:
+        self.iterations += 1
+        MODEL_CALL_SECONDS.labels(self.endpoint).observe(seconds)
+
+    def add_usage(self, usage: Any) -> None:
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "input_tokens", 0) or 0
+        self.completion_tokens += getattr(usage, "output_tokens", 0) or 0
+
+    async def stream(self, frames: AsyncIterator[str]) -> AsyncIterator[str]:
+        try:
+            async for frame in frames:
+                if self.ttft_s is None and frame.startswith("0:"):
+                    self.ttft_s = time.perf_counter() - self.start
+                elif frame.startswith('e:{"finishReason": "error"'):
+                    self.status = "error"
+                yield frame
+        except (GeneratorExit, asyncio.CancelledError):
+            # The client went away: the server closed the response generator,
+            # or the stream writer cancelled the task reading it
+            self.status = "disconnected"
+            CANCELLED.labels(self.endpoint, self.stage).inc()
+            raise
+        except BaseException:
+            self.status = "error"
+            raise
+        finally:
+            self.finish()
+
+    def finish(self) -> None:
+        endpoint = self.endpoint
+        REQUESTS.labels(endpoint, self.status).inc()
+        REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - self.start)
+        if self.ttft_s is not None:
+            TTFT_SECONDS.labels(endpoint).observe(self.ttft_s)
+        if self.iterations:
+            ITERATIONS.labels(endpoint).observe(self.iterations)
+        if self.prompt_tokens:
+            TOKENS.labels(endpoint, "prompt").inc(self.prompt_tokens)
+        if self.completion_tokens:
+            TOKENS.labels(endpoint, "completion").inc(self.completion_tokens)
+
+
+def observe_tool(name: str, seconds: float, status: str = "ok") -> None:
+    TOOL_SECONDS.labels(name).observe(seconds)
+    TOOL_CALLS.labels(name, status).inc()
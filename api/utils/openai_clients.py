@@ -0,0 +1,317 @@
+import importlib
+import importlib.util
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from .metrics import registry
+
+if TYPE_CHECKING:
+    # The SDK takes about half a second to import; it is imported on first client use
+    from openai import AsyncOpenAI, OpenAI
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Connections kept per pool (one pool for the async client, one for the sync client)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+# Idle connections kept open for reuse, and for how long
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY_S = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_S", "120"))
+OPENAI_CONNECT_TIMEOUT_S = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "5"))
+# Overall read timeout, as the SDK's default
+OPENAI_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "600"))
+# "auto" negotiates HTTP/2 when the h2 package is installed
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "auto").lower()
+# Import the SDK in a background thread at startup ("0" disables)
+OPENAI_PREWARM = os.getenv("OPENAI_PREWARM", "1").lower() not in ("0", "false", "no")
+
+CONNECT_SECONDS = registry.histogram(
+    "openai_connect_duration_seconds", "TCP connect and TLS handshake time for new OpenAI connections.", ("pool", "step")
+)
+
+
+def http2_enabled() -> bool:
+    if OPENAI_HTTP2 in ("0", "false", "no"):
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_S,
+    )
+
+
+class PoolStats:
+    """
+    Request and connection counters for one pool.
+
+    `saturated` counts requests started while max_connections requests were
+    already in flight; on HTTP/1.1 those wait for a free connection.
+    """
+
+    _TRACE_STEPS = {"connection.connect_tcp": "connect", "connection.start_tls": "tls"}
+
+    def __init__(self, pool: str, max_connections: int):
+        self.pool = pool
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def request_started(self) -> None:
+        with self._lock:
+            self.requests += 1
+            if self.in_flight >= self.max_connections:
+                self.saturated += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def trace(self, event: str, started: Dict[str, float]) -> None:
+        """Handle one httpcore trace event of a request; `started` holds that request's step start times."""
+        name, _, phase = event.rpartition(".")
+        step = self._TRACE_STEPS.get(name)
+        if step is None:
+            return
+        if phase == "started":
+            started[step] = time.perf_counter()
+        elif phase == "complete":
+            start = started.pop(step, None)
+            with self._lock:
+                if step == "connect":
+                    self.connections_opened += 1
+                else:
+                    self.tls_handshakes += 1
+            if start is not None:
+                CONNECT_SECONDS.labels(self.pool, step).observe(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                f"{self.pool}_requests": self.requests,
+                f"{self.pool}_in_flight": self.in_flight,
+                f"{self.pool}_peak_in_flight": self.peak_in_flight,
+                f"{self.pool}_saturation": self.in_flight / self.max_connections if self.max_connections else 0.0,
+                f"{self.pool}_saturated_requests": self.saturated,
+                f"{self.pool}_connections_opened": self.connections_opened,
+                f"{self.pool}_tls_handshakes": self.tls_handshakes,
+            }
+
+
+class _MeteredAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, stats: PoolStats):
+        self._stream = stream
+        self._stats = stats
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._stats.request_finished()
+
+
+class _MeteredSyncStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream, stats: PoolStats):
+        self._stream = stream
+        self._stats = stats
+        self._closed = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._stats.request_finished()
+
+
+class MeteredAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx transport that counts in-flight requests (until the body is closed) and new connections."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: PoolStats):
+        self._transport = transport
+        self.stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started: Dict[str, float] = {}
+
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            self.stats.trace(event, started)
+
+        request.extensions.setdefault("trace", trace)
+        self.stats.request_started()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.stats.request_finished()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_MeteredAsyncStream(response.stream, self.stats),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class MeteredSyncTransport(httpx.BaseTransport):
+    """Sync counterpart of MeteredAsyncTransport."""
+
+    def __init__(self, transport: httpx.BaseTransport, stats: PoolStats):
+        self._transport = transport
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started: Dict[str, float] = {}
+        request.extensions.setdefault("trace", lambda event, info: self.stats.trace(event, started))
+        self.stats.request_started()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self.stats.request_finished()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_MeteredSyncStream(response.stream, self.stats),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+async_pool = PoolStats("async", OPENAI_MAX_CONNECTIONS)
+sync_pool = PoolStats("sync", OPENAI_MAX_CONNECTIONS)
+
+_async_client: Optional["AsyncOpenAI"] = None
+_sync_client: Optional["OpenAI"] = None
+_client_lock = threading.Lock()
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(OPENAI_TIMEOUT_S, connect=OPENAI_CONNECT_TIMEOUT_S)
+
+
+def make_async_client(stats: PoolStats, limits: Optional[httpx.Limits] = None, **kwargs: Any) -> "AsyncOpenAI":
+    """AsyncOpenAI on its own metered pool; kwargs go to AsyncOpenAI (e.g. base_url)."""
+    from openai import AsyncOpenAI
+
+    transport = httpx.AsyncHTTPTransport(limits=limits or pool_limits(), http2=http2_enabled())
+    http_client = httpx.AsyncClient(
+        transport=MeteredAsyncTransport(transport, stats),
+        timeout=_timeout(),
+        follow_redirects=True,
+    )
+    kwargs.setdefault("api_key", os.environ.get("OPENAI_API_KEY"))
+    return AsyncOpenAI(http_client=http_client, **kwargs)
+
+
+def make_sync_client(stats: PoolStats, limits: Optional[httpx.Limits] = None, **kwargs: Any) -> "OpenAI":
+    """Sync counterpart of make_async_client."""
+    from openai import OpenAI
+
+    transport = httpx.HTTPTransport(limits=limits or pool_limits(), http2=http2_enabled())
+    http_client = httpx.Client(
+        transport=MeteredSyncTransport(transport, stats),
+        timeout=_timeout(),
+        follow_redirects=True,
+    )
+    kwargs.setdefault("api_key", os.environ.get("OPENAI_API_KEY"))
+    return OpenAI(http_client=http_client, **kwargs)
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    Process-wide AsyncOpenAI client for the chat orchestrators.
+
+    One connection pool for every request in the worker, so streams reuse
+    warm (keep-alive, already TLS-negotiated) connections instead of each
+    module paying for its own. Created on first use.
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = make_async_client(async_pool)
+    return _async_client
+
+
+def get_sync_client() -> "OpenAI":
+    """Process-wide OpenAI client for blocking callers (tool functions running in worker threads)."""
+    global _sync_client
+    if _sync_client is None:
+        with _client_lock:
+            if _sync_client is None:
+                _sync_client = make_sync_client(sync_pool)
+    return _sync_client
+
+
+def pool_stats() -> Dict[str, Any]:
+    return {"http2": int(http2_enabled()), "prewarm_seconds": round(_prewarm_seconds, 3),
+            **async_pool.stats(), **sync_pool.stats()}
+
+
+# The client plus the Responses resource and stream types the orchestrators use
+PREWARM_MODULES = ("openai", "openai.resources.responses", "openai.lib.streaming.responses", "openai.types.responses")
+
+_prewarm_seconds = 0.0
+_prewarm_thread: Optional[threading.Thread] = None
+
+
+def _prewarm() -> None:
+    global _prewarm_seconds
+    start = time.perf_counter()
+    try:
+        for module in PREWARM_MODULES:
+            importlib.import_module(module)
+    except Exception:
+        # Only a head start; the first real request imports the same modules if this fails
+        logger.warning("OpenAI SDK prewarm failed", exc_info=True)
+    _prewarm_seconds = time.perf_counter() - start
+
+
+def prewarm() -> None:
+    """
+    Start importing the OpenAI SDK modules in a daemon thread (once).
+
+    Called when the app module is loaded, so the import overlaps with
+    startup and the first request instead of adding about half a second to
+    import time or to that request.
+    """
+    global _prewarm_thread
+    if not OPENAI_PREWARM:
+        return
+    with _client_lock:
+        if _prewarm_thread is None:
+            _prewarm_thread = threading.Thread(target=_prewarm, name="openai-prewarm", daemon=True)
+            _prewarm_thread.start()
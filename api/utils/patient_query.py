@@ -0,0 +1,171 @@
+import bisect
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .storage import get_storage
+
+DEFAULT_LIMIT = 50
+_DRUG_RE = re.compile(r"[a-z][a-z0-9\-]+")
+
+
+def normalize_sex(value: str) -> str:
+    """Map M/F and variations like 'Male'/'female' to 'M' or 'F'."""
+    value = (value or "").strip().upper()
+    if value in ("MALE", "M", "MAN"):
+        return "M"
+    if value in ("FEMALE", "F", "WOMAN"):
+        return "F"
+    return value
+
+
+def normalize_icd10(code: str) -> str:
+    return (code or "").strip().upper()
+
+
+def drug_name(entry: str) -> str:
+    """'losartan 50 mg PO QD' -> 'losartan'."""
+    match = _DRUG_RE.search((entry or "").lower())
+    return match.group(0) if match else ""
+
+
+def medication_changes(record: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """Return (action, drug) pairs from plan.medication_changes, e.g. ('start', 'losartan')."""
+    changes = []
+    for change in (record.get("plan") or {}).get("medication_changes") or []:
+        if isinstance(change, dict):
+            for action, entry in change.items():
+                if isinstance(entry, str) and drug_name(entry):
+                    changes.append((action.lower(), drug_name(entry)))
+    return changes
+
+
+def project_record(patient_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact view returned by query_patients instead of the full record."""
+    patient = record.get("patient") or {}
+    return {
+        "patient_id": patient_id,
+        "name": patient.get("name"),
+        "mrn": patient.get("mrn"),
+        "age": patient.get("age"),
+        "sex": patient.get("sex"),
+        "chief_complaint": record.get("chief_complaint"),
+        "icd10": [a.get("icd10") for a in record.get("assessment") or [] if a.get("icd10")],
+        "medication_changes": [f"{action} {drug}" for action, drug in medication_changes(record)],
+        "specialty": (record.get("provider") or {}).get("specialty"),
+    }
+
+
+class PatientQueryIndex:
+    """
+    Secondary indexes over patient_scribes for structured filtering.
+
+    Equality filters (sex, ICD-10, medication, specialty) are hash maps from value
+    to a set of patient IDs; age is a sorted array searched with bisect. A query
+    intersects the smallest candidate sets first, so it never scans every record.
+    """
+
+    def __init__(self, patient_scribes: Dict[str, Dict[str, Any]]):
+        self.by_sex: Dict[str, Set[str]] = {}
+        self.by_icd10: Dict[str, Set[str]] = {}
+        self.by_medication: Dict[Tuple[str, str], Set[str]] = {}
+        self.by_specialty: Dict[str, Set[str]] = {}
+        self.age_of: Dict[str, int] = {}
+        self.projections: Dict[str, Dict[str, Any]] = {}
+
+        ages: List[Tuple[int, str]] = []
+        for patient_id, record in patient_scribes.items():
+            patient = record.get("patient") or {}
+            self.projections[patient_id] = project_record(patient_id, record)
+
+            if isinstance(patient.get("age"), (int, float)):
+                self.age_of[patient_id] = patient["age"]
+                ages.append((patient["age"], patient_id))
+            if patient.get("sex"):
+                self.by_sex.setdefault(normalize_sex(patient["sex"]), set()).add(patient_id)
+            for item in record.get("assessment") or []:
+                code = normalize_icd10(item.get("icd10", ""))
+                if code:
+                    # Index the full code and its category, so "E11" matches "E11.9"
+                    self.by_icd10.setdefault(code, set()).add(patient_id)
+                    self.by_icd10.setdefault(code.split(".")[0], set()).add(patient_id)
+            for action, drug in medication_changes(record):
+                self.by_medication.setdefault((action, drug), set()).add(patient_id)
+                self.by_medication.setdefault(("any", drug), set()).add(patient_id)
+            specialty = (record.get("provider") or {}).get("specialty")
+            if specialty:
+                self.by_specialty.setdefault(specialty.strip().lower(), set()).add(patient_id)
+
+        ages.sort()
+        self._ages = [a for a, _ in ages]
+        self._ids_by_age = [pid for _, pid in ages]
+
+    def _age_range(self, start_age: int, end_age: int) -> List[str]:
+        lo = bisect.bisect_left(self._ages, start_age)
+        hi = bisect.bisect_right(self._ages, end_age)
+        return self._ids_by_age[lo:hi]
+
+    def query(
+        self,
+        age: Optional[Tuple[int, int]] = None,
+        sex: Optional[str] = None,
+        icd10: Optional[Iterable[str]] = None,
+        medication: Optional[str] = None,
+        medication_action: str = "any",
+        specialty: Optional[str] = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> Dict[str, Any]:
+        candidate_sets: List[Set[str]] = []
+        if sex:
+            candidate_sets.append(self.by_sex.get(normalize_sex(sex), set()))
+        for code in icd10 or []:
+            candidate_sets.append(self.by_icd10.get(normalize_icd10(code), set()))
+        if medication:
+            candidate_sets.append(self.by_medication.get(((medication_action or "any").lower(), drug_name(medication)), set()))
+        if specialty:
+            candidate_sets.append(self.by_specialty.get(specialty.strip().lower(), set()))
+
+        if age is not None:
+            start_age, end_age = age[0], min(age[1], 100)
+
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            matches = set(candidate_sets[0])
+            for s in candidate_sets[1:]:
+                if not matches:
+                    break
+                matches &= s
+            if age is not None:
+                matches = {pid for pid in matches if start_age <= self.age_of.get(pid, -1) <= end_age}
+            ordered = sorted(matches, key=lambda pid: (self.age_of.get(pid, -1), pid))
+        elif age is not None:
+            ordered = self._age_range(start_age, end_age)
+        else:
+            ordered = list(self.projections)
+
+        return {
+            "count": len(ordered),
+            "results": [self.projections[pid] for pid in ordered[:limit]],
+            "truncated": len(ordered) > limit,
+        }
+
+
+_index: Optional[PatientQueryIndex] = None
+_index_version = -1
+_index_lock = threading.Lock()
+
+
+def get_query_index() -> PatientQueryIndex:
+    """
+    Return the query index for the current storage snapshot. It only covers
+    encounter records, so it is rebuilt when records_version changes, not on
+    intake writes.
+    """
+    global _index, _index_version
+    snapshot = get_storage().snapshot()
+    if _index is None or snapshot.records_version != _index_version:
+        with _index_lock:
+            if _index is None or snapshot.records_version != _index_version:
+                _index = PatientQueryIndex(snapshot.patient_scribes)
+                _index_version = snapshot.records_version
+    return _index
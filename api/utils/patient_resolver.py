@@ -0,0 +1,208 @@
+import re
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .storage import get_storage
+
+# Best matches returned per lookup
+RESOLVE_LIMIT = 5
+# Name matches scoring below this are not returned
+RESOLVE_MIN_SCORE = 0.3
+# get_patient_info uses the top match on its own only if it scores at least this...
+RESOLVE_CONFIDENT_SCORE = 0.8
+# ...and beats the runner-up by this much
+RESOLVE_CONFIDENT_MARGIN = 0.1
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+_DATE_PATTERNS = (
+    (re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b"), ("y", "m", "d")),
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b"), ("m", "d", "y")),
+)
+
+
+def normalize_name(value: str) -> str:
+    """'  José  O'Neil ' -> 'jose o neil': accents stripped, casefolded, punctuation to spaces."""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(c for c in value if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM_RE.sub(" ", value).strip()
+
+
+def normalize_mrn(value: str) -> str:
+    """MRNs compare case- and punctuation-insensitively: 'jc-045872' == 'JC 045872' == 'JC045872'."""
+    return re.sub(r"[^0-9A-Z]", "", (value or "").upper())
+
+
+def trigrams(normalized: str) -> List[str]:
+    """Distinct trigrams of each word padded as '  word ' (the pg_trgm convention)."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return sorted(grams)
+
+
+def parse_dob(text: str) -> Tuple[Optional[str], str]:
+    """Find a date (YYYY-MM-DD or MM/DD/YYYY) in `text`; returns (ISO date or None, text without it)."""
+    for pattern, order in _DATE_PATTERNS:
+        match = pattern.search(text)
+        if not match:
+            continue
+        parts = dict(zip(order, (int(g) for g in match.groups())))
+        try:
+            iso = datetime(parts["y"], parts["m"], parts["d"]).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+        return iso, (text[:match.start()] + " " + text[match.end():]).strip()
+    return None, text
+
+
+class PatientResolver:
+    """
+    Name / MRN / DOB index over the patient directory for resolve_patient.
+
+    Names are matched by trigram similarity (shared / union of distinct
+    trigrams, as pg_trgm does): postings map each trigram to the rows that
+    contain it, and one numpy bincount over the query's postings gives the
+    shared count for every candidate at once, so a lookup never scans the
+    roster. MRNs, patient IDs and dates of birth are exact hash lookups.
+
+    Full names ("jordan a carter", and "jordan carter" without the middle
+    names) are also kept as exact keys so find_mentions can spot a patient
+    named in free text with a few dict lookups.
+    """
+
+    def __init__(self, directory: Sequence[Tuple[str, str, str, str]]):
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.mrns: List[str] = []
+        self.dobs: List[str] = []
+        self.by_id: Dict[str, int] = {}
+        self.by_mrn: Dict[str, List[int]] = {}
+        self.by_dob: Dict[str, List[int]] = {}
+        self.by_name: Dict[str, List[int]] = {}
+        postings: Dict[str, List[int]] = {}
+        gram_counts: List[int] = []
+
+        for row, (patient_id, name, mrn, dob) in enumerate(directory):
+            self.ids.append(patient_id)
+            self.names.append(name)
+            self.mrns.append(mrn)
+            self.dobs.append(dob)
+            self.by_id[patient_id] = row
+            if mrn:
+                self.by_mrn.setdefault(normalize_mrn(mrn), []).append(row)
+            if dob:
+                iso, _ = parse_dob(dob)
+                self.by_dob.setdefault(iso or dob, []).append(row)
+            normalized = normalize_name(name)
+            words = normalized.split()
+            if len(words) >= 2:
+                self.by_name.setdefault(normalized, []).append(row)
+                if len(words) > 2:
+                    self.by_name.setdefault(f"{words[0]} {words[-1]}", []).append(row)
+            grams = trigrams(normalized)
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(row)
+
+        self.postings: Dict[str, np.ndarray] = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self.gram_counts = np.asarray(gram_counts, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _match(self, row: int, score: float, matched_on: str) -> Dict[str, Any]:
+        return {
+            "patient_id": self.ids[row],
+            "name": self.names[row],
+            "mrn": self.mrns[row],
+            "dob": self.dobs[row],
+            "score": round(score, 3),
+            "matched_on": matched_on,
+        }
+
+    def name_scores(self, name: str, rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, similarity) for every row sharing a trigram with `name` (restricted to `rows` if given)."""
+        query_grams = trigrams(normalize_name(name))
+        known = [g for g in query_grams if g in self.postings]
+        if not known:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        shared = np.bincount(np.concatenate([self.postings[g] for g in known]), minlength=len(self.ids))
+        candidates = np.flatnonzero(shared) if rows is None else rows[shared[rows] > 0]
+        hits = shared[candidates]
+        return candidates, hits / (len(query_grams) + self.gram_counts[candidates] - hits)
+
+    def resolve(self, query: str, limit: int = RESOLVE_LIMIT, min_score: float = RESOLVE_MIN_SCORE) -> List[Dict[str, Any]]:
+        query = (query or "").strip()
+        if not query:
+            return []
+
+        exact: List[Dict[str, Any]] = []
+        if query in self.by_id:
+            exact.append(self._match(self.by_id[query], 1.0, "patient_id"))
+        for row in self.by_mrn.get(normalize_mrn(query), ()) if normalize_mrn(query) else ():
+            exact.append(self._match(row, 1.0, "mrn"))
+        if exact:
+            return exact[:limit]
+
+        dob, name = parse_dob(query)
+        dob_rows = np.asarray(self.by_dob.get(dob, []), dtype=np.int32) if dob else None
+        if not normalize_name(name):
+            # Date of birth only
+            return [self._match(int(row), 1.0, "dob") for row in (dob_rows if dob_rows is not None else [])][:limit]
+
+        rows, scores = self.name_scores(name, dob_rows)
+        keep = scores >= min_score
+        rows, scores = rows[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")[:limit]
+        matched_on = "name+dob" if dob_rows is not None else "name"
+        return [self._match(int(rows[i]), float(scores[i]), matched_on) for i in order]
+
+
+    def find_mentions(self, text: str, max_name_words: int = 4) -> List[int]:
+        """
+        Rows of patients named in free text by full name (two or more words,
+        exactly as on the roster) or by MRN. No fuzzy matching: this runs on
+        every user message, so it only reports names it is sure of.
+        """
+        rows = set()
+        for token in text.split():
+            if any(c.isdigit() for c in token):
+                rows.update(self.by_mrn.get(normalize_mrn(token), ()))
+        words = normalize_name(text).split()
+        for size in range(2, max_name_words + 1):
+            for i in range(len(words) - size + 1):
+                rows.update(self.by_name.get(" ".join(words[i:i + size]), ()))
+        return sorted(rows)
+
+
+_resolver: Optional[PatientResolver] = None
+_resolver_version: Optional[int] = None
+_resolver_lock = threading.Lock()
+
+
+def get_patient_resolver() -> PatientResolver:
+    """Return the resolver for the current encounter records, rebuilding it when they changed."""
+    global _resolver, _resolver_version
+    storage = get_storage()
+    # Intakes don't change the roster; records_version ignores them
+    version = storage.records_version()
+    if _resolver is None or version != _resolver_version:
+        with _resolver_lock:
+            if _resolver is None or version != _resolver_version:
+                _resolver = PatientResolver(storage.patient_directory())
+                _resolver_version = version
+    return _resolver
+
+
+def confident_match(matches: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The top match if it is good enough to act on without asking, else None."""
+    if not matches or matches[0]["score"] < RESOLVE_CONFIDENT_SCORE:
+        return None
+    if len(matches) > 1 and matches[0]["score"] - matches[1]["score"] < RESOLVE_CONFIDENT_MARGIN:
+        return None
+    return matches[0]
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+
+from .get_patient_info import get_patient_info_json
+from .metrics import registry
+from .patient_resolver import get_patient_resolver
+from .serialization import dumps
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Look up a patient named in the newest user message before the first model call ("0" disables)
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1").lower() not in ("0", "false", "no")
+# get_patient_info view injected for a prefetched patient
+PREFETCH_VIEW = os.getenv("PREFETCH_VIEW", "summary")
+
+PREFETCH = registry.counter(
+    "chat_prefetch_total",
+    "Pre-dispatch patient lookups by outcome (hit, none, ambiguous, error).",
+    ("endpoint", "result"),
+)
+PREFETCH_SECONDS = registry.histogram("chat_prefetch_duration_seconds", "Pre-dispatch scan plus record fetch time.", ("endpoint",))
+
+
+def newest_user_text(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user" and isinstance(message.get("content"), str):
+            return message["content"]
+    return ""
+
+
+def prefetch_items(messages: List[Dict[str, Any]], endpoint: str = "chat") -> List[Dict[str, Any]]:
+    """
+    Responses input items to append after the newest user message: a
+    get_patient_info call and its output for the one patient that message
+    names, or [] when it names none or more than one.
+
+    The pair reads to the model exactly like a tool call it made itself, so a
+    question about a named patient is answered in the first model round
+    instead of waiting for that round to ask for the record.
+    """
+    if not PREFETCH_ENABLED:
+        return []
+    start = time.perf_counter()
+    result = "none"
+    try:
+        resolver = get_patient_resolver()
+        rows = resolver.find_mentions(newest_user_text(messages))
+        if len(rows) > 1:
+            result = "ambiguous"
+        if len(rows) != 1:
+            return []
+        patient_id = resolver.ids[rows[0]]
+        arguments = dumps({"patient_id": patient_id, "view": PREFETCH_VIEW})
+        output = get_patient_info_json(patient_id, view=PREFETCH_VIEW)
+        result = "hit"
+        call_id = f"call_prefetch_{patient_id}"
+        return [
+            {"type": "function_call", "call_id": call_id, "name": "get_patient_info", "arguments": arguments},
+            {"type": "function_call_output", "call_id": call_id, "output": output},
+        ]
+    except Exception:
+        # Prefetching is an optimization; the model can still call the tool itself
+        logger.warning("Patient prefetch failed", exc_info=True)
+        result = "error"
+        return []
+    finally:
+        PREFETCH.labels(endpoint, result).inc()
+        PREFETCH_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+
+
+async def prefetch_context(messages: List[Dict[str, Any]], endpoint: str = "chat") -> List[Dict[str, Any]]:
+    """prefetch_items off the event loop (the first call may build the name index)."""
+    if not PREFETCH_ENABLED:
+        return []
+    return await asyncio.to_thread(prefetch_items, messages, endpoint)
@@ -0,0 +1,141 @@
+from typing import Any, Dict, List, Optional, Union
+
+# Named views: field paths (dot-separated) to keep from a patient_scribes record
+VIEWS: Dict[str, List[str]] = {
+    "summary": [
+        "encounter_id",
+        "timestamp",
+        "patient",
+        "provider",
+        "chief_complaint",
+        "vitals",
+        "history.hpi",
+        "history.pmh",
+        "assessment",
+        "plan.medication_changes",
+        "plan.follow_up",
+    ],
+    "meds": [
+        "patient",
+        "history.medications_prior_to_visit",
+        "history.allergies",
+        "plan.medication_changes",
+        "medication_side_effects_and_concerns",
+        "adherence_and_acceptance",
+    ],
+    "transcript_window": [
+        "patient",
+        "transcript",
+    ],
+    "full": [],
+}
+
+TimeMark = Union[str, int, float, None]
+
+
+def parse_time_mark(mark: TimeMark) -> Optional[float]:
+    """'03:15' / '1:02:03' / 195 -> seconds. None stays None; raises ValueError for anything else."""
+    if mark is None or mark == "":
+        return None
+    if isinstance(mark, (int, float)):
+        return float(mark)
+    seconds = 0.0
+    for part in str(mark).strip().split(":"):
+        seconds = seconds * 60 + float(part or 0)
+    return seconds
+
+
+def transcript_window(transcript: List[Dict[str, Any]], start: TimeMark = None, end: TimeMark = None) -> List[Dict[str, Any]]:
+    """Transcript turns whose 't' mark falls within [start, end] (either bound optional)."""
+    start_s, end_s = parse_time_mark(start), parse_time_mark(end)
+    window = []
+    for turn in transcript or []:
+        try:
+            t = parse_time_mark(turn.get("t"))
+        except ValueError:
+            t = None
+        if t is None:
+            continue
+        if start_s is not None and t < start_s:
+            continue
+        if end_s is not None and t > end_s:
+            continue
+        window.append(turn)
+    return window
+
+
+def select_fields(record: Dict[str, Any], paths: List[str]) -> Dict[str, Any]:
+    """Build a new dict with only the given dot paths (shares leaf values with `record`)."""
+    out: Dict[str, Any] = {}
+    for path in paths:
+        keys = path.split(".")
+        src: Any = record
+        for key in keys:
+            if not isinstance(src, dict) or key not in src:
+                break
+            src = src[key]
+        else:
+            dst = out
+            for key in keys[:-1]:
+                dst = dst.setdefault(key, {})
+            dst[keys[-1]] = src
+    return out
+
+
+def exclude_fields(record: Dict[str, Any], paths: List[str]) -> Dict[str, Any]:
+    """Return a copy of `record` without the given dot paths (only copies along those paths)."""
+    out = dict(record)
+    for path in paths:
+        keys = path.split(".")
+        parent = out
+        for key in keys[:-1]:
+            child = parent.get(key)
+            if not isinstance(child, dict):
+                break
+            parent[key] = parent = dict(child)
+        else:
+            parent.pop(keys[-1], None)
+    return out
+
+
+def project_patient_record(
+    record: Dict[str, Any],
+    fields: Optional[List[str]] = None,
+    exclude: Optional[List[str]] = None,
+    view: Optional[str] = None,
+    transcript_start: TimeMark = None,
+    transcript_end: TimeMark = None,
+) -> Dict[str, Any]:
+    """
+    Cut a patient record down to what the caller asked for.
+
+    Args:
+        record: Full patient_scribes record
+        fields: Dot paths to keep (e.g. ["patient", "plan.medication_changes"]); added to the view's fields
+        exclude: Dot paths to drop (e.g. ["transcript", "exam"])
+        view: Named view from VIEWS ("summary", "meds", "transcript_window", "full")
+        transcript_start: Start time mark ("MM:SS" or seconds) when a transcript is included
+        transcript_end: End time mark ("MM:SS" or seconds) when a transcript is included
+
+    Returns:
+        The projected record, or {"error": ...} for an unknown view or an unparseable
+        transcript mark. The input record is never mutated.
+    """
+    if view and view not in VIEWS:
+        return {"error": f"Unknown view '{view}'. Use one of: {', '.join(VIEWS)}"}
+    for mark in (transcript_start, transcript_end):
+        try:
+            parse_time_mark(mark)
+        except ValueError:
+            return {"error": f"Invalid transcript mark '{mark}'. Use MM:SS, H:MM:SS or seconds"}
+
+    paths = list(VIEWS.get(view or "full", [])) + list(fields or [])
+    projected = select_fields(record, paths) if paths else record
+    if exclude:
+        projected = exclude_fields(projected, exclude)
+
+    if "transcript" in projected and (transcript_start is not None or transcript_end is not None):
+        if projected is record:
+            projected = dict(record)
+        projected["transcript"] = transcript_window(projected["transcript"], transcript_start, transcript_end)
+    return projected
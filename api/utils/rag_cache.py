@@ -0,0 +1,200 @@
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import registry
+from .retrieval import RAG_TOP_K, RetrievalBackend, get_retrieval_backend
+
+# Cached search_records_RAG results (0 disables the cache)
+RAG_CACHE_MAX_ENTRIES = int(os.getenv("RAG_CACHE_MAX_ENTRIES", "256"))
+RAG_CACHE_TTL_S = float(os.getenv("RAG_CACHE_TTL_S", "600"))
+# Reuse the results of a cached query whose embedding is at least this cosine-similar (0 disables)
+RAG_CACHE_SIMILARITY = float(os.getenv("RAG_CACHE_SIMILARITY", "0"))
+# Hashed buckets in a query embedding
+RAG_CACHE_VECTOR_DIM = int(os.getenv("RAG_CACHE_VECTOR_DIM", "1024"))
+
+# Words that do not change what a records search finds. Negations are kept on purpose.
+STOPWORDS = frozenset("""
+    a an the and or of for with in on at to from by about as is are was were be been has have had
+    do does did any all some who whom which that what this these those their there me my us our please
+    find show list search give tell get patient patients
+""".split())
+
+# A near-duplicate must negate the same way: "no depression" is close to "depression" in trigrams
+NEGATIONS = frozenset(["no", "not", "non", "without", "never", "denies"])
+
+_WORD_RE = re.compile(r"\w+(?:\.\d+)?")
+
+RAG_CACHE_LOOKUPS = registry.counter(
+    "rag_cache_total", "search_records_RAG cache lookups by result (hit, near_hit, miss, stale).", ("result",)
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Casefolded words with punctuation, extra whitespace and stopwords dropped:
+    "Patients with  depression?" and "patients with depression" both become
+    "depression". A query made only of stopwords keeps all its words.
+    """
+    words = _WORD_RE.findall(query.casefold())
+    return " ".join([w for w in words if w not in STOPWORDS] or words)
+
+
+def query_vector(normalized: str, dim: int = RAG_CACHE_VECTOR_DIM) -> np.ndarray:
+    """
+    L2-normalized signed hashing of the character trigrams of each word.
+    Computed locally so the near-duplicate tier costs no embedding call; a
+    misspelling or another form of a word ("depresion", "diabetic") keeps
+    most trigrams, and many trigrams per word keep one hash collision from
+    making two unrelated queries look the same.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in normalized.split():
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            h = zlib.crc32(padded[i:i + 3].encode("utf-8"))
+            vector[h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass
+class RagCacheEntry:
+    results: List[Dict[str, Any]]
+    created_at: float
+    index_version: Any
+    # Embedding of the normalized query, for the near-duplicate tier
+    vector: Optional[np.ndarray]
+
+
+class RagQueryCache:
+    """
+    Retrieval results keyed on the normalized query, LRU with a TTL.
+
+    An entry is served only while the backend's index_version() is the one it
+    was searched at. With similarity > 0, a query that misses is also compared
+    with the cached queries (query_vector of the normalized text) and reuses
+    the closest one's results when the cosine reaches the threshold.
+    """
+
+    def __init__(self, max_entries: int = RAG_CACHE_MAX_ENTRIES, ttl_s: float = RAG_CACHE_TTL_S,
+                 similarity: float = RAG_CACHE_SIMILARITY, vector_dim: int = RAG_CACHE_VECTOR_DIM):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity = similarity
+        self.vector_dim = vector_dim
+        self._entries: "OrderedDict[Tuple[str, str, int], RagCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_s > 0
+
+    def _record(self, result: str) -> None:
+        RAG_CACHE_LOOKUPS.labels(result).inc()
+        with self._lock:
+            if result == "hit":
+                self.hits += 1
+            elif result == "near_hit":
+                self.near_hits += 1
+            elif result == "miss":
+                self.misses += 1
+            else:
+                self.stale += 1
+
+    def _valid(self, entry: RagCacheEntry, version: Any, now: float) -> bool:
+        return now - entry.created_at <= self.ttl_s and entry.index_version == version
+
+    def _nearest(self, key: Tuple[str, str, int], vector: np.ndarray, version: Any, now: float) -> Optional[RagCacheEntry]:
+        """
+        The valid entry for the same backend, k and negation words whose query
+        is most similar, if it reaches the threshold.
+        """
+        backend, normalized, k = key
+        negations = NEGATIONS.intersection(normalized.split())
+        with self._lock:
+            candidates = [
+                (other, entry) for other, entry in self._entries.items()
+                if other[0] == backend and other[2] == k and entry.vector is not None
+                and self._valid(entry, version, now) and NEGATIONS.intersection(other[1].split()) == negations
+            ]
+            if not candidates:
+                return None
+            scores = np.stack([entry.vector for _, entry in candidates]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity:
+                return None
+            other, entry = candidates[best]
+            self._entries.move_to_end(other)
+            return entry
+
+    def search(self, query: str, k: int = RAG_TOP_K, backend: Optional[RetrievalBackend] = None) -> List[Dict[str, Any]]:
+        """backend.search(query, k), answered from the cache when an equivalent query is still valid."""
+        backend = backend or get_retrieval_backend()
+        if not self.enabled:
+            return backend.search(query, k)
+
+        normalized = normalize_query(query)
+        key = (backend.name, normalized, k)
+        # Read before searching: an index change during the search leaves the entry stale
+        version = backend.index_version()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            valid = entry is not None and self._valid(entry, version, now)
+            if valid:
+                self._entries.move_to_end(key)
+            elif entry is not None:
+                del self._entries[key]
+        if valid:
+            self._record("hit")
+            return list(entry.results)
+
+        vector = None
+        if self.similarity > 0 and normalized:
+            vector = query_vector(normalized, self.vector_dim)
+            near = self._nearest(key, vector, version, now)
+            if near is not None:
+                self._record("near_hit")
+                return list(near.results)
+        self._record("miss" if entry is None else "stale")
+
+        results = backend.search(query, k)
+        with self._lock:
+            self._entries[key] = RagCacheEntry(list(results), time.monotonic(), version, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return results
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.near_hits + self.misses + self.stale
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+rag_cache = RagQueryCache()
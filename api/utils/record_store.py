@@ -0,0 +1,276 @@
+import json
+import os
+import threading
+from collections import ChainMap
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .compact_record import RECORDS_COMPACT, CompactRecordMapping
+from .lazy_records import LazyRecordMapping, load_lazy
+
+# Both paths can be overridden, e.g. to point a load test at a scratch copy
+PATIENT_RECORDS_PATH = os.getenv("PATIENT_RECORDS_PATH") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "patient_records.json"
+)
+INTAKE_JOURNAL_PATH = os.getenv("INTAKE_JOURNAL_PATH") or os.path.join(
+    os.path.dirname(PATIENT_RECORDS_PATH),
+    "patient_intakes.jsonl"
+)
+# "auto" indexes files of at least RECORDS_LAZY_MIN_MB and decodes records on
+# demand; "1" always does, "0" always parses the whole file
+RECORDS_LAZY_LOAD = os.getenv("RECORDS_LAZY_LOAD", "auto").lower()
+RECORDS_LAZY_MIN_MB = float(os.getenv("RECORDS_LAZY_MIN_MB", "64"))
+
+PatientRecord = Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class RecordSnapshot:
+    """
+    Parsed contents of patient_records.json at one point in time.
+
+    Attributes:
+        patient_scribes: patient_id -> full encounter record, as a read-only
+            CompactRecordMapping (compact_record.py) or, for large files, a
+            LazyRecordMapping (lazy_records.py)
+        ai_scribes: patient_id -> AI intake record (snapshot merged with the intake journal)
+        names: Precomputed [{"patient_id", "name"}] list for get_patient_names
+        mrns: MRN -> patient_id for encounter records
+        version: Monotonic counter, bumped every time the file or the journal changes
+        records_version: Monotonic counter, bumped only when patient_scribes may have
+            changed (the file was re-parsed); journal appends leave it alone
+        source_mtime: Latest mtime (epoch seconds) of the files this snapshot was read from
+    """
+    patient_scribes: Mapping[str, PatientRecord] = field(default_factory=dict)
+    ai_scribes: Mapping[str, PatientRecord] = field(default_factory=dict)
+    names: List[Dict[str, str]] = field(default_factory=list)
+    mrns: Dict[str, str] = field(default_factory=dict)
+    version: int = 0
+    records_version: int = 0
+    source_mtime: float = 0.0
+
+
+def read_journal(path: str, offset: int = 0) -> Tuple[Dict[str, PatientRecord], int]:
+    """
+    Read intake journal entries starting at a byte offset.
+
+    A torn last line (crash mid-append) is not consumed, so it is picked up
+    again once the writer finishes it.
+
+    Returns:
+        (entries, new_offset) where entries maps patient_id -> intake record
+        (later lines win).
+    """
+    entries: Dict[str, PatientRecord] = {}
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries[entry["patient_id"]] = entry["record"]
+    except FileNotFoundError:
+        return {}, 0
+    return entries, offset
+
+
+def build_names(patient_scribes: Mapping[str, PatientRecord]) -> List[Dict[str, str]]:
+    if isinstance(patient_scribes, (LazyRecordMapping, CompactRecordMapping)):
+        return patient_scribes.names()
+    names = []
+    for patient_id, record in patient_scribes.items():
+        name = (record.get("patient") or {}).get("name", "")
+        if name:
+            names.append({"patient_id": patient_id, "name": name})
+    return names
+
+
+def build_mrns(patient_scribes: Mapping[str, PatientRecord]) -> Dict[str, str]:
+    if isinstance(patient_scribes, (LazyRecordMapping, CompactRecordMapping)):
+        return patient_scribes.mrns()
+    mrns = {}
+    for patient_id, record in patient_scribes.items():
+        mrn = (record.get("patient") or {}).get("mrn")
+        if mrn:
+            mrns[str(mrn).strip()] = patient_id
+    return mrns
+
+
+def build_directory(patient_scribes: Mapping[str, PatientRecord]) -> List[Tuple[str, str, str, str]]:
+    """(patient_id, name, mrn, dob) for every encounter record, for the patient resolver."""
+    if isinstance(patient_scribes, (LazyRecordMapping, CompactRecordMapping)):
+        return patient_scribes.directory()
+    rows = []
+    for patient_id, record in patient_scribes.items():
+        patient = record.get("patient") or {}
+        rows.append((patient_id, str(patient.get("name") or ""), str(patient.get("mrn") or ""), str(patient.get("dob") or "")))
+    return rows
+
+
+class PatientRecordStore:
+    """
+    Process-wide, in-memory view of patient_records.json plus the intake journal.
+
+    The file is parsed once and kept in memory. Every access does a cheap
+    os.stat() and only re-parses when the file's mtime or size changed, so
+    edits made by other processes (or by hand) are still picked up. New
+    journal lines are read incrementally from the last consumed offset.
+    """
+
+    def __init__(self, path: str = PATIENT_RECORDS_PATH, journal_path: Optional[str] = INTAKE_JOURNAL_PATH):
+        self.path = path
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+        self._snapshot = RecordSnapshot()
+        self._signature: Optional[Tuple] = None
+        self._data: Dict[str, Any] = {}
+        self._data_signature: Optional[Tuple[int, int]] = None
+        self._journal_entries: Dict[str, PatientRecord] = {}
+        self._journal_offset = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @staticmethod
+    def _stat(path: Optional[str]) -> Optional[Tuple[int, int]]:
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _stat_signature(self) -> Optional[Tuple]:
+        data_signature = self._stat(self.path)
+        if data_signature is None:
+            return None
+        return (data_signature, self._stat(self.journal_path))
+
+    def _refresh_journal(self, journal_signature: Optional[Tuple[int, int]]) -> None:
+        if journal_signature is None:
+            self._journal_entries, self._journal_offset = {}, 0
+            return
+        if journal_signature[1] < self._journal_offset:
+            # Journal was compacted (truncated): start over
+            self._journal_entries, self._journal_offset = {}, 0
+        entries, self._journal_offset = read_journal(self.journal_path, self._journal_offset)
+        if entries:
+            self._journal_entries = {**self._journal_entries, **entries}
+
+    def _use_lazy(self, size: int) -> bool:
+        if RECORDS_LAZY_LOAD in ("1", "true", "yes", "on"):
+            return True
+        if RECORDS_LAZY_LOAD == "auto":
+            return size >= RECORDS_LAZY_MIN_MB * 1024 * 1024
+        return False
+
+    def _parse(self) -> Dict[str, Any]:
+        try:
+            if self._use_lazy(os.path.getsize(self.path)):
+                lazy = load_lazy(self.path)
+                if lazy is not None:
+                    patient_scribes, ai_scribes, index = lazy
+                    return {**index.other, "patient_scribes": patient_scribes, "AI_scribes": ai_scribes}
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if RECORDS_COMPACT and isinstance(data.get("patient_scribes"), dict):
+                data["patient_scribes"] = CompactRecordMapping(data["patient_scribes"])
+            return data
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def snapshot(self) -> RecordSnapshot:
+        """
+        Return the current snapshot, reloading the file first if it changed on disk.
+        """
+        signature = self._stat_signature()
+        if signature is not None and signature == self._signature:
+            self.hits += 1
+            return self._snapshot
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            signature = self._stat_signature()
+            if signature is not None and signature == self._signature:
+                self.hits += 1
+                return self._snapshot
+
+            self.misses += 1
+            if self._signature is not None:
+                self.reloads += 1
+
+            data_signature, journal_signature = signature if signature else (None, None)
+            records_version = self._snapshot.records_version
+            if data_signature is None or data_signature != self._data_signature:
+                records_version += 1
+                self._data = self._parse()
+                self._data_signature = data_signature
+                # A rewritten snapshot may already contain (compacted) journal entries
+                self._journal_entries, self._journal_offset = {}, 0
+            self._refresh_journal(journal_signature)
+
+            patient_scribes = self._data.get("patient_scribes", {}) or {}
+            ai_scribes = self._data.get("AI_scribes", {}) or {}
+            if self._journal_entries:
+                if isinstance(ai_scribes, LazyRecordMapping):
+                    # Don't decode every indexed intake just to overlay the journal
+                    ai_scribes = ChainMap(self._journal_entries, ai_scribes)
+                else:
+                    ai_scribes = {**ai_scribes, **self._journal_entries}
+            previous = self._snapshot
+            reparsed = records_version != previous.records_version
+            self._snapshot = RecordSnapshot(
+                patient_scribes=patient_scribes,
+                ai_scribes=ai_scribes,
+                # A journal append leaves the encounter records (and so their names and MRNs) alone
+                names=build_names(patient_scribes) if reparsed else previous.names,
+                mrns=build_mrns(patient_scribes) if reparsed else previous.mrns,
+                version=previous.version + 1,
+                records_version=records_version,
+                source_mtime=max((sig[0] for sig in (data_signature, journal_signature) if sig), default=0) / 1e9,
+            )
+            self._signature = signature
+            return self._snapshot
+
+    def patient_scribes(self) -> Mapping[str, PatientRecord]:
+        return self.snapshot().patient_scribes
+
+    def ai_scribes(self) -> Mapping[str, PatientRecord]:
+        return self.snapshot().ai_scribes
+
+    def invalidate(self) -> None:
+        """Force the next access to re-parse the file and re-read the journal."""
+        with self._lock:
+            self._signature = None
+            self._data_signature = None
+            self._journal_entries, self._journal_offset = {}, 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "version": self._snapshot.version,
+            "patients": len(self._snapshot.patient_scribes),
+        }
+
+
+_store: Optional[PatientRecordStore] = None
+_store_lock = threading.Lock()
+
+
+def get_record_store() -> PatientRecordStore:
+    """Return the process-wide PatientRecordStore, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PatientRecordStore()
+    return _store
@@ -0,0 +1,135 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", "300"))
+# 0 disables the cache
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _canonical(value: Any) -> Any:
+    """Recursively sort dict keys so json.dumps output is byte-stable."""
+    if isinstance(value, dict):
+        return {k: _canonical(value[k]) for k in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def canonical_tools(tools: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Return a deep copy of a tool list in a deterministic order (by name, keys sorted).
+
+    The provider's prompt-prefix cache only applies when instructions + tools are
+    byte-identical between calls, so every request should send this same object.
+    """
+    return [_canonical(copy.deepcopy(tool)) for tool in sorted(tools, key=lambda t: t.get("name", ""))]
+
+
+def prompt_cache_key(namespace: str, instructions: str, tools: Sequence[Dict[str, Any]]) -> str:
+    """Stable prompt_cache_key for the Responses API, so requests sharing a prefix are routed together."""
+    digest = hashlib.sha256(
+        json.dumps([instructions, tools], sort_keys=True, separators=(",", ":")).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"{namespace}-{digest}"
+
+
+def normalize_input(messages: List[dict]) -> List[dict]:
+    """Role + whitespace-collapsed content for each plain chat message."""
+    return [
+        {"role": m.get("role"), "content": _WHITESPACE_RE.sub(" ", str(m.get("content") or "")).strip()}
+        for m in messages
+    ]
+
+
+def cache_key(model: str, instructions: str, tools: Sequence[Dict[str, Any]], messages: List[dict], data_version: Any = None) -> str:
+    """
+    Hash of everything that determines a response. data_version should change
+    whenever the patient data the tools read changes (e.g. the record store version).
+    """
+    payload = {
+        "model": model,
+        "instructions": instructions,
+        "tools": list(tools),
+        "input": normalize_input(messages),
+        "data_version": data_version,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    frames: List[str]
+    ttft_s: Optional[float]
+    created_at: float
+
+
+class ResponseCache:
+    """
+    Exact-match cache of fully streamed answers (the 0:/e: frames as sent to the
+    client), with LRU eviction and a TTL.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl_s: float = RESPONSE_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Sum of the original time-to-first-token of every answer served from cache
+        self.ttft_saved_s = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_s > 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl_s:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.ttft_saved_s += entry.ttft_s or 0.0
+            return entry
+
+    def put(self, key: str, frames: List[str], ttft_s: Optional[float]) -> None:
+        with self._lock:
+            self._entries[key] = CachedResponse(list(frames), ttft_s, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "ttft_saved_s": round(self.ttft_saved_s, 3),
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,542 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import ChainMap, Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .compact_record import CompactRecordMapping
+from .lazy_records import LazyRecordMapping
+from .openai_clients import get_sync_client
+from .record_store import RecordSnapshot
+from .storage import get_storage
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "openai" keeps using the hosted vector store; "local" searches an in-process index
+RAG_BACKEND = os.getenv("RAG_BACKEND", "openai").lower()
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "10"))
+RAG_EMBED_DIM = int(os.getenv("RAG_EMBED_DIM", "1024"))
+# Transcript turns per chunk
+TRANSCRIPT_CHUNK_TURNS = int(os.getenv("RAG_TRANSCRIPT_CHUNK_TURNS", "6"))
+# Poll the record storage in the background this often (0 = only sync on search)
+RAG_INDEX_WATCH_INTERVAL_S = float(os.getenv("RAG_INDEX_WATCH_INTERVAL_S", "0"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+
+# ----------------
+# Chunking
+
+
+@dataclass
+class Chunk:
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+def _as_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def chunk_patient_record(patient_id: str, record: Dict[str, Any]) -> List[Chunk]:
+    """
+    Split a patient_scribes record into searchable chunks: a demographic summary,
+    the HPI, the assessment, the plan, and windows of transcript turns.
+    """
+    patient = record.get("patient") or {}
+    history = record.get("history") or {}
+    base = {"patient_id": patient_id, "name": patient.get("name", ""), "source": "patient_scribes"}
+    header = f"{patient.get('name', '')}, {patient.get('age', '')} {patient.get('sex', '')}."
+
+    chunks = [
+        Chunk(
+            f"{header} Chief complaint: {record.get('chief_complaint', '')} "
+            f"PMH: {_as_text(history.get('pmh'))} "
+            f"Medications: {_as_text(history.get('medications_prior_to_visit'))}",
+            {**base, "section": "summary"},
+        ),
+    ]
+    if history.get("hpi"):
+        chunks.append(Chunk(f"{header} HPI: {history['hpi']}", {**base, "section": "hpi"}))
+
+    problems = []
+    for item in record.get("assessment") or []:
+        problems.append(f"{item.get('problem', '')} ({item.get('icd10', '')}) {_as_text(item.get('likely_etiologies', ''))}")
+    if problems:
+        chunks.append(Chunk(f"{header} Assessment: " + "; ".join(problems), {**base, "section": "assessment"}))
+
+    if record.get("plan"):
+        chunks.append(Chunk(f"{header} Plan: {_as_text(record['plan'])}", {**base, "section": "plan"}))
+
+    transcript = record.get("transcript") or []
+    for start in range(0, len(transcript), TRANSCRIPT_CHUNK_TURNS):
+        turns = transcript[start:start + TRANSCRIPT_CHUNK_TURNS]
+        text = " ".join(f"[{t.get('t', '')}] {t.get('speaker', '')}: {t.get('text', '')}" for t in turns)
+        chunks.append(Chunk(
+            f"{header} Transcript: {text}",
+            {**base, "section": "transcript", "t_start": turns[0].get("t"), "t_end": turns[-1].get("t")},
+        ))
+    return chunks
+
+
+def chunk_intake_record(patient_id: str, record: Dict[str, Any]) -> List[Chunk]:
+    """Turn an AI_scribes intake record into a single chunk."""
+    info = record.get("patient_info") or {}
+    text = (
+        f"{info.get('name', '')}, {info.get('age', '')} {info.get('sex', '')}. AI intake. "
+        f"Chief complaint: {record.get('chief_complaint', '')} "
+        f"Symptoms: {_as_text(record.get('symptoms'))} "
+        f"Medications: {_as_text(record.get('current_medications'))} "
+        f"Conditions: {_as_text(record.get('existing_conditions'))} "
+        f"Summary: {record.get('conversation_summary', '')} "
+        f"Assessment: {record.get('ai_assessment', '')}"
+    )
+    return [Chunk(text, {"patient_id": patient_id, "name": info.get("name", ""), "source": "AI_scribes", "section": "intake"})]
+
+
+def chunk_snapshot(snapshot: RecordSnapshot) -> List[Chunk]:
+    chunks: List[Chunk] = []
+    for patient_id, record in snapshot.patient_scribes.items():
+        chunks.extend(chunk_patient_record(patient_id, record))
+    for patient_id, record in snapshot.ai_scribes.items():
+        chunks.extend(chunk_intake_record(patient_id, record))
+    return chunks
+
+
+# ----------------
+# Embedding
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class HashingEmbedder:
+    """
+    Offline TF-IDF embedder using the hashing trick.
+
+    Tokens are hashed (crc32, stable across processes) into `dim` signed buckets,
+    weighted by sublinear TF times an IDF fitted on the corpus, and L2-normalized,
+    so a dot product is a cosine similarity. Needs no network and no vocabulary.
+    """
+
+    def __init__(self, dim: int = RAG_EMBED_DIM):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def _bucket(self, token: str) -> Tuple[int, float]:
+        cached = self._buckets.get(token)
+        if cached is None:
+            h = zlib.crc32(token.encode("utf-8"))
+            cached = (h % self.dim, 1.0 if (h >> 31) & 1 else -1.0)
+            self._buckets[token] = cached
+        return cached
+
+    def fit(self, texts: Iterable[str]) -> None:
+        df = np.zeros(self.dim, dtype=np.float64)
+        n_docs = 0
+        for text in texts:
+            n_docs += 1
+            for bucket in {self._bucket(tok)[0] for tok in tokenize(text)}:
+                df[bucket] += 1
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token, tf in Counter(tokenize(text)).items():
+                bucket, sign = self._bucket(token)
+                out[row, bucket] += sign * (1 + math.log(tf))
+        out *= self.idf
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return out / norms
+
+
+ChunkKey = Tuple[str, str]  # (source, patient_id)
+
+
+def chunk_key(chunk: Chunk) -> ChunkKey:
+    return (chunk.metadata.get("source", ""), chunk.metadata.get("patient_id", ""))
+
+
+class LocalVectorIndex:
+    """
+    Dense chunk matrix searched with one matrix-vector product and a top-k partition.
+
+    Supports incremental updates: add() appends rows (the matrix grows by doubling,
+    so appends are amortized O(rows added)) and remove() tombstones every row of a
+    record. The IDF is fitted by build() and kept for later adds; tombstoned rows
+    are reclaimed by compact() once they make up half the matrix.
+    """
+
+    def __init__(self, embedder: Optional[HashingEmbedder] = None):
+        self.embedder = embedder or HashingEmbedder()
+        self.chunks: List[Optional[Chunk]] = []
+        self._matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows: Dict[ChunkKey, List[int]] = {}
+        self._dead = 0
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[:len(self.chunks)]
+
+    def __len__(self) -> int:
+        return len(self.chunks) - self._dead
+
+    def build(self, chunks: List[Chunk]) -> None:
+        texts = [c.text for c in chunks]
+        self.embedder.fit(texts)
+        self.chunks, self._rows, self._dead = [], {}, 0
+        self._matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self.add(chunks)
+
+    def _reserve(self, rows: int) -> None:
+        capacity = self._matrix.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(rows, capacity * 2, 64)
+        matrix = np.zeros((new_capacity, self.embedder.dim), dtype=np.float32)
+        matrix[:len(self.chunks)] = self.matrix
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:len(self.chunks)] = self._alive[:len(self.chunks)]
+        self._matrix, self._alive = matrix, alive
+
+    def add(self, chunks: List[Chunk]) -> None:
+        if not chunks:
+            return
+        start = len(self.chunks)
+        self._reserve(start + len(chunks))
+        self._matrix[start:start + len(chunks)] = self.embedder.embed([c.text for c in chunks])
+        self._alive[start:start + len(chunks)] = True
+        for offset, chunk in enumerate(chunks):
+            self._rows.setdefault(chunk_key(chunk), []).append(start + offset)
+        self.chunks.extend(chunks)
+
+    def remove(self, keys: Iterable[ChunkKey]) -> None:
+        for key in keys:
+            for row in self._rows.pop(key, []):
+                self._alive[row] = False
+                self.chunks[row] = None
+                self._dead += 1
+        if self._dead and self._dead * 2 >= len(self.chunks):
+            self.compact()
+
+    def compact(self) -> None:
+        keep = np.flatnonzero(self._alive[:len(self.chunks)])
+        self._matrix = self.matrix[keep].copy()
+        self._alive = np.ones(len(keep), dtype=bool)
+        self.chunks = [self.chunks[i] for i in keep]
+        self._rows = {}
+        for row, chunk in enumerate(self.chunks):
+            self._rows.setdefault(chunk_key(chunk), []).append(row)
+        self._dead = 0
+
+    def search(self, query: str, k: int = RAG_TOP_K) -> List[Tuple[Chunk, float]]:
+        if not len(self):
+            return []
+        scores = self.matrix @ self.embedder.embed([query])[0]
+        if self._dead:
+            scores[~self._alive[:len(self.chunks)]] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunks[i], float(scores[i])) for i in top if scores[i] > 0]
+
+
+def record_hash(record: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def record_token(records: Mapping[str, Any], key: str) -> Any:
+    """
+    An object that is the same (`is`) at the next sync for as long as the
+    record is unchanged, found without rebuilding the record: the packed
+    CompactRecord, the LazyRecordMapping itself (read-only and replaced when
+    the file is re-parsed), or the plain dict.
+    """
+    if isinstance(records, ChainMap):
+        for mapping in records.maps:
+            if key in mapping:
+                return record_token(mapping, key)
+    if isinstance(records, CompactRecordMapping):
+        return records.compact(key)
+    if isinstance(records, LazyRecordMapping):
+        return records
+    return records[key]
+
+
+class IncrementalIndexer:
+    """
+    Keeps a LocalVectorIndex in sync with the configured record storage.
+
+    On each sync only records that are new or whose content hash changed are
+    re-chunked and re-embedded; deleted records are tombstoned. Records whose
+    record_token is identical (`is`) to the one seen last time are skipped
+    without hashing, which is the common case for journal-only updates.
+    """
+
+    def __init__(self, store=None, embedder_factory=HashingEmbedder):
+        # Anything with snapshot(): the configured RecordStorage by default
+        self.store = store or get_storage()
+        self.embedder_factory = embedder_factory
+        self.index = LocalVectorIndex(embedder_factory())
+        self.indexed_version = -1
+        self._hashes: Dict[ChunkKey, str] = {}
+        # record_token of each record as of the last sync
+        self._objects: Dict[ChunkKey, Any] = {}
+        self._lock = threading.Lock()
+
+        self.syncs = 0
+        self.records_indexed = 0
+        self.records_skipped = 0
+        # Skipped records that had to be hashed to find out they were unchanged
+        self.records_rehashed = 0
+        self.last_sync_s = 0.0
+        # Seconds between the source files changing and the change becoming searchable
+        self.last_freshness_lag_s = 0.0
+
+    def _sources(self, snapshot: RecordSnapshot):
+        return (
+            ("patient_scribes", snapshot.patient_scribes, chunk_patient_record),
+            ("AI_scribes", snapshot.ai_scribes, chunk_intake_record),
+        )
+
+    def rebuild(self) -> None:
+        """Re-chunk and re-embed everything, re-fitting the IDF."""
+        with self._lock:
+            self.indexed_version = -1
+            self._hashes, self._objects = {}, {}
+            self._sync_locked(self.store.snapshot(), full=True)
+
+    def sync(self) -> None:
+        snapshot = self.store.snapshot()
+        if snapshot.version == self.indexed_version:
+            return
+        with self._lock:
+            if snapshot.version != self.indexed_version:
+                self._sync_locked(snapshot, full=not self._hashes)
+
+    def search(self, query: str, k: int = RAG_TOP_K) -> List[Tuple[Chunk, float]]:
+        """
+        Sync, then search while holding the lock, so a concurrent sync (or the
+        watch thread) cannot grow, tombstone or compact the index mid-read.
+        """
+        self.sync()
+        with self._lock:
+            return self.index.search(query, k)
+
+    def _sync_locked(self, snapshot: RecordSnapshot, full: bool) -> None:
+        start = time.perf_counter()
+        changed: List[ChunkKey] = []
+        new_chunks: List[Chunk] = []
+        seen = set()
+
+        for source, records, chunker in self._sources(snapshot):
+            for patient_id in records:
+                key = (source, patient_id)
+                seen.add(key)
+                token = record_token(records, patient_id)
+                if self._objects.get(key) is token:
+                    self.records_skipped += 1
+                    continue
+                record = records[patient_id]
+                digest = record_hash(record)
+                self._objects[key] = token
+                if self._hashes.get(key) == digest:
+                    self.records_skipped += 1
+                    self.records_rehashed += 1
+                    continue
+                self._hashes[key] = digest
+                changed.append(key)
+                new_chunks.extend(chunker(patient_id, record))
+
+        removed = [key for key in self._hashes if key not in seen]
+        for key in removed:
+            self._hashes.pop(key, None)
+            self._objects.pop(key, None)
+
+        if full:
+            self.index.build(new_chunks)
+        else:
+            self.index.remove(changed + removed)
+            self.index.add(new_chunks)
+
+        self.records_indexed += len(changed)
+        self.indexed_version = snapshot.version
+        self.syncs += 1
+        self.last_sync_s = time.perf_counter() - start
+        if not full and snapshot.source_mtime:
+            self.last_freshness_lag_s = max(0.0, time.time() - snapshot.source_mtime)
+
+    def freshness_lag_s(self) -> float:
+        """
+        How far behind the index currently is: 0 when it reflects the latest
+        data on disk, otherwise seconds since the newest unindexed change.
+        """
+        snapshot = self.store.snapshot()
+        if snapshot.version == self.indexed_version or not snapshot.source_mtime:
+            return 0.0
+        return max(0.0, time.time() - snapshot.source_mtime)
+
+    def watch(self, interval_s: float) -> threading.Thread:
+        """Poll the store every interval_s seconds in a daemon thread and sync changes."""
+        def loop():
+            while True:
+                try:
+                    self.sync()
+                except Exception:
+                    logger.warning("RAG index sync failed", exc_info=True)
+                time.sleep(interval_s)
+
+        thread = threading.Thread(target=loop, name="rag-indexer", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "indexed_version": self.indexed_version,
+            "chunks": len(self.index),
+            "syncs": self.syncs,
+            "records_indexed": self.records_indexed,
+            "records_skipped": self.records_skipped,
+            "records_rehashed": self.records_rehashed,
+            "last_sync_s": round(self.last_sync_s, 4),
+            "last_freshness_lag_s": round(self.last_freshness_lag_s, 3),
+            "freshness_lag_s": round(self.freshness_lag_s(), 3),
+        }
+
+
+# ----------------
+# Backends
+
+
+class RetrievalBackend:
+    """Interface for search_records_RAG backends."""
+
+    name = "base"
+
+    def search(self, query: str, k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
+        """
+        Returns:
+            List of {"content", "score", "metadata"} results, best first.
+        """
+        raise NotImplementedError
+
+    def index_version(self) -> Any:
+        """
+        Changes whenever search results may change; None when the backend
+        cannot tell (cached results then only expire by age).
+        """
+        return None
+
+
+class OpenAIVectorStoreBackend(RetrievalBackend):
+    """Hosted OpenAI vector store populated by testing_rag.py."""
+
+    name = "openai"
+
+    def __init__(self, vector_store_id: Optional[str] = None):
+        self.vector_store_id = vector_store_id or os.getenv("VECTOR_STORE_ID")
+        if not self.vector_store_id:
+            self.vector_store_id = "vs_68f972091abc8191ac6168a7566427a1" # generated in testing_rag.py!
+        self.client = get_sync_client()
+
+    def search(self, query: str, k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
+        results = self.client.vector_stores.search(
+            vector_store_id=self.vector_store_id,
+            query=query,
+            max_num_results=k,
+        )
+
+        # Convert the SyncPage object to a JSON-serializable format
+        search_results = []
+        for result in results.data:
+            search_results.append({
+                # SDK content parts -> plain dicts so the result is valid JSON
+                "content": [part.model_dump() if hasattr(part, "model_dump") else part for part in result.content],
+                "score": getattr(result, 'score', None),
+                "metadata": getattr(result, 'metadata', {}),
+            })
+        return search_results
+
+    def index_version(self) -> Any:
+        # The hosted store is only re-populated by testing_rag.py, which creates a new store id
+        return self.vector_store_id
+
+
+class LocalRecordIndexBackend(RetrievalBackend):
+    """
+    In-process index over the configured record storage. Each search first
+    syncs new or changed records (including fresh AI_scribes intakes) into the
+    index; with RAG_INDEX_WATCH_INTERVAL_S > 0 a background thread also syncs
+    them eagerly.
+    """
+
+    name = "local"
+
+    def __init__(self, store=None, embedder_factory=HashingEmbedder):
+        self.indexer = IncrementalIndexer(store, embedder_factory)
+        if RAG_INDEX_WATCH_INTERVAL_S > 0:
+            self.indexer.watch(RAG_INDEX_WATCH_INTERVAL_S)
+
+    def search(self, query: str, k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
+        return [
+            {
+                "content": [{"type": "text", "text": chunk.text}],
+                "score": round(score, 4),
+                "metadata": chunk.metadata,
+            }
+            for chunk, score in self.indexer.search(query, k)
+        ]
+
+    def index_version(self) -> Any:
+        # The next search syncs the index to this snapshot
+        return self.indexer.store.snapshot().version
+
+
+_backend: Optional[RetrievalBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_retrieval_backend() -> RetrievalBackend:
+    """Return the process-wide backend selected by RAG_BACKEND, creating it on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if RAG_BACKEND == "local":
+                    _backend = LocalRecordIndexBackend()
+                else:
+                    _backend = OpenAIVectorStoreBackend()
+    return _backend
+
+
+def rag_index_stats() -> Dict[str, Any]:
+    """
+    The local index's IncrementalIndexer.stats() (including freshness_lag_s),
+    or {} when RAG_BACKEND is not "local" or no search has created it yet.
+    """
+    backend = _backend
+    if isinstance(backend, LocalRecordIndexBackend):
+        return backend.indexer.stats()
+    return {}
@@ -0,0 +1,42 @@
+import json
+from typing import Any, Dict
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+
+# C-accelerated string escaper behind json.dumps(str); same bytes, without the dumps() overhead
+_encode_string = json.encoder.encode_basestring_ascii
+
+
+def _default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> str:
+    """
+    Compact JSON for tool outputs and other model-facing payloads.
+
+    Uses orjson when installed, otherwise stdlib json with the same compact
+    separators and UTF-8 output. SDK (pydantic) objects are serialized via
+    model_dump() instead of failing.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def text_frame(delta: str) -> str:
+    """`0:` frame of the data stream protocol; byte-identical to f'0:{json.dumps(delta)}\\n'."""
+    return "0:" + _encode_string(delta) + "\n"
+
+
+def finish_frame(payload: Dict[str, Any]) -> str:
+    """`e:` frame; keeps json.dumps' default spacing so clients and cached frames see the same bytes."""
+    return "e:" + json.dumps(payload) + "\n"
+
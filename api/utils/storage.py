@@ -0,0 +1,486 @@
+import abc
+import contextlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+from typing import Any, Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .compact_record import CompactRecordMapping
+from .intake_journal import IntakeJournal, get_intake_journal
+from .record_store import (
+    PATIENT_RECORDS_PATH,
+    PatientRecord,
+    PatientRecordStore,
+    RecordSnapshot,
+    build_directory,
+    build_mrns,
+    build_names,
+    get_record_store,
+)
+
+load_dotenv()
+
+# "json" (patient_records.json + intake journal), "sqlite" or "postgres"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH") or os.path.join(os.path.dirname(PATIENT_RECORDS_PATH), "patient_records.sqlite3")
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+STORAGE_POOL_MIN = int(os.getenv("STORAGE_POOL_MIN", "1"))
+STORAGE_POOL_MAX = int(os.getenv("STORAGE_POOL_MAX", "16"))
+
+
+_write_listeners: List[Callable[[List[str]], None]] = []
+
+
+def add_write_listener(listener: Callable[[List[str]], None]) -> None:
+    """Call listener(patient_ids) after every record or intake write in this process."""
+    _write_listeners.append(listener)
+
+
+def _notify_write(patient_ids: List[str]) -> None:
+    for listener in _write_listeners:
+        listener(patient_ids)
+
+
+def _mrn(record: PatientRecord) -> Optional[str]:
+    mrn = (record.get("patient") or {}).get("mrn")
+    return str(mrn).strip() if mrn else None
+
+
+def _name(record: PatientRecord) -> str:
+    return (record.get("patient") or {}).get("name", "")
+
+
+class RecordStorage(abc.ABC):
+    """
+    Where encounter records and AI intake records live.
+
+    Lookups go by patient_id or MRN; intake inserts are durable once the call
+    returns. data_version() changes whenever stored data changes, so callers can
+    key caches on it; write listeners hear about each write in this process,
+    with the patients it touched. A backend that leaves out an abstract method
+    fails when it is instantiated.
+    """
+
+    name = "base"
+
+    @abc.abstractmethod
+    def get_record(self, patient_id: str) -> Optional[PatientRecord]:
+        """The encounter record for a patient_id, or None."""
+
+    def get_record_json(self, patient_id: str) -> Optional[str]:
+        """The record serialized exactly as json.dumps(get_record(patient_id)), or None."""
+        record = self.get_record(patient_id)
+        return None if record is None else json.dumps(record)
+
+    @abc.abstractmethod
+    def get_record_by_mrn(self, mrn: str) -> Optional[Tuple[str, PatientRecord]]:
+        """Return (patient_id, record) for an MRN, or None."""
+
+    @abc.abstractmethod
+    def patient_names(self) -> List[Dict[str, str]]:
+        """[{"patient_id", "name"}] for every encounter record."""
+
+    @abc.abstractmethod
+    def patient_directory(self) -> List[Tuple[str, str, str, str]]:
+        """(patient_id, name, mrn, dob) for every encounter record; empty strings where unknown."""
+
+    @abc.abstractmethod
+    def get_intake(self, patient_id: str) -> Optional[PatientRecord]:
+        """Latest AI intake record for a patient, or None."""
+
+    def insert_intake(self, patient_id: str, record: PatientRecord) -> None:
+        self.insert_intakes([(patient_id, record)])
+
+    @abc.abstractmethod
+    def insert_intakes(self, intakes: Iterable[Tuple[str, PatientRecord]]) -> int:
+        """Insert several intake records; SQL backends do it in one transaction."""
+
+    @abc.abstractmethod
+    def data_version(self) -> int:
+        """Changes whenever stored encounters or intakes change."""
+
+    def records_version(self) -> int:
+        """Like data_version, but only for encounter records: intake writes don't change it."""
+        return self.data_version()
+
+    @abc.abstractmethod
+    def snapshot(self) -> RecordSnapshot:
+        """
+        Every encounter and (latest) intake record, for building in-memory
+        indexes such as query_patients and the local RAG index. version is
+        data_version() and records_version is records_version(). Records that
+        did not change are the same objects as in the previous snapshot;
+        treat them as read-only.
+        """
+
+    def close(self) -> None:
+        pass
+
+
+class JsonFileStorage(RecordStorage):
+    """patient_records.json via the PatientRecordStore, intakes via the IntakeJournal."""
+
+    name = "json"
+
+    def __init__(self, store: Optional[PatientRecordStore] = None, journal: Optional[IntakeJournal] = None):
+        self.store = store or get_record_store()
+        self.journal = journal
+
+    def get_record(self, patient_id: str) -> Optional[PatientRecord]:
+        return self.store.patient_scribes().get(patient_id)
+
+    def get_record_json(self, patient_id: str) -> Optional[str]:
+        patient_scribes = self.store.patient_scribes()
+        if isinstance(patient_scribes, CompactRecordMapping):
+            return patient_scribes.json(patient_id)
+        return super().get_record_json(patient_id)
+
+    def get_record_by_mrn(self, mrn: str) -> Optional[Tuple[str, PatientRecord]]:
+        snapshot = self.store.snapshot()
+        patient_id = snapshot.mrns.get(str(mrn).strip())
+        if patient_id is None:
+            return None
+        return patient_id, snapshot.patient_scribes[patient_id]
+
+    def patient_names(self) -> List[Dict[str, str]]:
+        # Names are precomputed once per file load; copy so callers can't mutate the cache
+        return list(self.store.snapshot().names)
+
+    def patient_directory(self) -> List[Tuple[str, str, str, str]]:
+        return build_directory(self.store.snapshot().patient_scribes)
+
+    def get_intake(self, patient_id: str) -> Optional[PatientRecord]:
+        return self.store.ai_scribes().get(patient_id)
+
+    def insert_intakes(self, intakes: Iterable[Tuple[str, PatientRecord]]) -> int:
+        # Each journal line is appended atomically; a batch is not all-or-nothing
+        journal = self.journal or get_intake_journal()
+        written: List[str] = []
+        try:
+            for patient_id, record in intakes:
+                journal.append(patient_id, record)
+                written.append(patient_id)
+        finally:
+            if written:
+                _notify_write(written)
+        return len(written)
+
+    def data_version(self) -> int:
+        return self.store.snapshot().version
+
+    def records_version(self) -> int:
+        return self.store.snapshot().records_version
+
+    def snapshot(self) -> RecordSnapshot:
+        return self.store.snapshot()
+
+    def close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+
+
+class _SQLStorage(RecordStorage):
+    """
+    Shared SQL for SQLite and PostgreSQL. Statements use "?" placeholders and
+    are rewritten for drivers that use "%s".
+
+    Encounters are one row per patient_id with the MRN and name pulled out into
+    indexed columns; intakes are append-only, and the latest row per patient
+    wins. An empty database is seeded from patient_records.json on first open.
+    """
+
+    paramstyle = "?"
+    json_column = "TEXT"
+    id_column = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    dob_expression = "json_extract(record, '$.patient.dob')"
+    # Intake ids become visible in increasing order, so snapshot() only reads rows past the last id it saw
+    ordered_ids = True
+
+    def __init__(self):
+        self._snapshot_lock = threading.Lock()
+        self._snapshot: Optional[RecordSnapshot] = None
+        self._last_intake_id = 0
+
+    def _sql(self, statement: str) -> str:
+        return statement if self.paramstyle == "?" else statement.replace("?", self.paramstyle)
+
+    @abc.abstractmethod
+    def _connection(self) -> ContextManager[Any]:
+        """Context manager that borrows a pooled connection and gives it back afterwards."""
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[Any]:
+        """Yield a cursor inside one transaction: commit on success, roll back on error."""
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def _query(self, statement: str, params: Tuple = ()) -> List[Tuple]:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._sql(statement), params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+                # Don't leave a read transaction open on a pooled connection
+                conn.rollback()
+
+    @staticmethod
+    def _decode(value: Any) -> PatientRecord:
+        return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+    def _create_schema(self) -> None:
+        with self._transaction() as cur:
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS encounters ("
+                " patient_id TEXT PRIMARY KEY, mrn TEXT, name TEXT NOT NULL,"
+                f" record {self.json_column} NOT NULL)"
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS encounters_mrn ON encounters (mrn)")
+            cur.execute(
+                f"CREATE TABLE IF NOT EXISTS intakes (id {self.id_column},"
+                f" patient_id TEXT NOT NULL, record {self.json_column} NOT NULL)"
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS intakes_patient ON intakes (patient_id, id)")
+            cur.execute("CREATE TABLE IF NOT EXISTS storage_meta (key TEXT PRIMARY KEY, value BIGINT NOT NULL)")
+            cur.execute(self._sql(
+                "INSERT INTO storage_meta (key, value) VALUES (?, 0) ON CONFLICT (key) DO NOTHING"
+            ), ("version",))
+
+    def seed_if_empty(self, path: str = PATIENT_RECORDS_PATH) -> int:
+        if self._query("SELECT 1 FROM encounters LIMIT 1") or not os.path.exists(path):
+            return 0
+        with open(path, "r") as f:
+            data = json.load(f)
+        count = self.import_records(data.get("patient_scribes") or {})
+        self.insert_intakes((data.get("AI_scribes") or {}).items())
+        return count
+
+    def import_records(self, patient_scribes: Dict[str, PatientRecord]) -> int:
+        """Upsert encounter records in one transaction."""
+        rows = [
+            (patient_id, _mrn(record), _name(record), json.dumps(record))
+            for patient_id, record in patient_scribes.items()
+        ]
+        with self._transaction() as cur:
+            cur.executemany(self._sql(
+                "INSERT INTO encounters (patient_id, mrn, name, record) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (patient_id) DO UPDATE SET mrn = excluded.mrn, name = excluded.name, record = excluded.record"
+            ), rows)
+            cur.execute(self._sql("UPDATE storage_meta SET value = value + 1 WHERE key = ?"), ("version",))
+        _notify_write([row[0] for row in rows])
+        return len(rows)
+
+    def get_record(self, patient_id: str) -> Optional[PatientRecord]:
+        rows = self._query("SELECT record FROM encounters WHERE patient_id = ?", (patient_id,))
+        return self._decode(rows[0][0]) if rows else None
+
+    def get_record_json(self, patient_id: str) -> Optional[str]:
+        if self.json_column != "TEXT":
+            return super().get_record_json(patient_id)
+        # The column holds json.dumps(record) as written by import_records
+        rows = self._query("SELECT record FROM encounters WHERE patient_id = ?", (patient_id,))
+        return rows[0][0] if rows else None
+
+    def get_record_by_mrn(self, mrn: str) -> Optional[Tuple[str, PatientRecord]]:
+        rows = self._query("SELECT patient_id, record FROM encounters WHERE mrn = ? LIMIT 1", (str(mrn).strip(),))
+        return (rows[0][0], self._decode(rows[0][1])) if rows else None
+
+    def patient_names(self) -> List[Dict[str, str]]:
+        rows = self._query("SELECT patient_id, name FROM encounters ORDER BY patient_id")
+        return [{"patient_id": patient_id, "name": name} for patient_id, name in rows]
+
+    def patient_directory(self) -> List[Tuple[str, str, str, str]]:
+        rows = self._query(f"SELECT patient_id, name, mrn, {self.dob_expression} FROM encounters ORDER BY patient_id")
+        return [(patient_id, name or "", mrn or "", str(dob or "")) for patient_id, name, mrn, dob in rows]
+
+    def get_intake(self, patient_id: str) -> Optional[PatientRecord]:
+        rows = self._query(
+            "SELECT record FROM intakes WHERE patient_id = ? ORDER BY id DESC LIMIT 1", (patient_id,)
+        )
+        return self._decode(rows[0][0]) if rows else None
+
+    def insert_intakes(self, intakes: Iterable[Tuple[str, PatientRecord]]) -> int:
+        rows = [(patient_id, json.dumps(record)) for patient_id, record in intakes]
+        if not rows:
+            return 0
+        with self._transaction() as cur:
+            cur.executemany(self._sql("INSERT INTO intakes (patient_id, record) VALUES (?, ?)"), rows)
+        _notify_write([row[0] for row in rows])
+        return len(rows)
+
+    def data_version(self) -> int:
+        # Both counters only grow, so their sum changes whenever either does
+        rows = self._query(
+            "SELECT (SELECT value FROM storage_meta WHERE key = ?) + (SELECT COALESCE(MAX(id), 0) FROM intakes)",
+            ("version",),
+        )
+        return int(rows[0][0])
+
+    def records_version(self) -> int:
+        rows = self._query("SELECT value FROM storage_meta WHERE key = ?", ("version",))
+        return int(rows[0][0])
+
+    def snapshot(self) -> RecordSnapshot:
+        """
+        All rows decoded into memory, cached until data_version() moves.
+        Encounters are re-read only when records_version() changed; new
+        intakes are read incrementally by id.
+        """
+        data_version = self.data_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == data_version:
+            return snapshot
+        with self._snapshot_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == data_version:
+                return snapshot
+            # Versions are read before the rows, so the rows are at least as new as the labels
+            records_version = self.records_version()
+            patient_scribes = snapshot.patient_scribes if snapshot is not None else {}
+            if snapshot is None or snapshot.records_version != records_version:
+                rows = self._query("SELECT patient_id, record FROM encounters ORDER BY patient_id")
+                patient_scribes = {patient_id: self._decode(record) for patient_id, record in rows}
+
+            after = self._last_intake_id if snapshot is not None and self.ordered_ids else 0
+            rows = self._query("SELECT id, patient_id, record FROM intakes WHERE id > ? ORDER BY id", (after,))
+            ai_scribes = dict(snapshot.ai_scribes) if after else {}
+            for intake_id, patient_id, record in rows:
+                ai_scribes[patient_id] = self._decode(record)
+                self._last_intake_id = max(self._last_intake_id, intake_id)
+
+            self._snapshot = RecordSnapshot(
+                patient_scribes=patient_scribes,
+                ai_scribes=ai_scribes,
+                names=build_names(patient_scribes),
+                mrns=build_mrns(patient_scribes),
+                version=data_version,
+                records_version=records_version,
+            )
+            return self._snapshot
+
+
+class SQLiteStorage(_SQLStorage):
+    """
+    SQLite file in WAL mode (readers never block the writer) behind a small
+    connection pool shared by the tool threads.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH, pool_size: int = STORAGE_POOL_MAX, seed_path: Optional[str] = PATIENT_RECORDS_PATH):
+        super().__init__()
+        self.path = path
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._pool_size = pool_size
+        self._pool_lock = threading.Lock()
+        self._create_schema()
+        if seed_path:
+            self.seed_if_empty(seed_path)
+
+    def _new_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._all.append(conn)
+        return conn
+
+    @contextlib.contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                conn = self._new_connection() if len(self._all) < self._pool_size else None
+            if conn is None:
+                conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+            self._pool = queue.LifoQueue()
+
+
+class PostgresStorage(_SQLStorage):
+    """PostgreSQL via a psycopg2 ThreadedConnectionPool; records are stored as JSONB."""
+
+    name = "postgres"
+    paramstyle = "%s"
+    json_column = "JSONB"
+    id_column = "BIGSERIAL PRIMARY KEY"
+    dob_expression = "record->'patient'->>'dob'"
+    # Concurrent BIGSERIAL inserts can commit out of id order; re-read every intake instead
+    ordered_ids = False
+
+    def __init__(
+        self,
+        dsn: str = DATABASE_URL,
+        min_connections: int = STORAGE_POOL_MIN,
+        max_connections: int = STORAGE_POOL_MAX,
+        seed_path: Optional[str] = PATIENT_RECORDS_PATH,
+    ):
+        import psycopg2.pool
+
+        if not dsn:
+            raise ValueError("STORAGE_BACKEND=postgres requires DATABASE_URL")
+        super().__init__()
+        self._pool = psycopg2.pool.ThreadedConnectionPool(min_connections, max_connections, dsn)
+        # getconn() raises PoolError instead of waiting when every connection is out
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._create_schema()
+        if seed_path:
+            self.seed_if_empty(seed_path)
+
+    @contextlib.contextmanager
+    def _connection(self):
+        # Like the SQLite pool, wait for a free connection when all are in use
+        self._slots.acquire()
+        try:
+            conn = self._pool.getconn()
+            try:
+                yield conn
+            finally:
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+
+_storage: Optional[RecordStorage] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> RecordStorage:
+    """Return the process-wide storage selected by STORAGE_BACKEND, creating it on first use."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if STORAGE_BACKEND == "sqlite":
+                    _storage = SQLiteStorage()
+                elif STORAGE_BACKEND in ("postgres", "postgresql"):
+                    _storage = PostgresStorage()
+                else:
+                    _storage = JsonFileStorage()
+    return _storage
@@ -0,0 +1,201 @@
+import asyncio
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+from .metrics import registry
+
+# Hold writes back until this long after the previous one (0 writes frames as they arrive, unmerged)
+STREAM_COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", "16"))
+# ...or until this many bytes are waiting
+STREAM_COALESCE_BYTES = int(os.getenv("STREAM_COALESCE_BYTES", "512"))
+# Stop reading the model stream while this much is waiting on a slow client
+STREAM_MAX_BUFFER_BYTES = int(os.getenv("STREAM_MAX_BUFFER_BYTES", str(64 * 1024)))
+
+STREAM_FRAMES = registry.counter("chat_stream_frames_total", "Frames produced by the orchestrators.", ("endpoint",))
+STREAM_WRITES = registry.counter("chat_stream_writes_total", "Chunks handed to the server (one send each).", ("endpoint",))
+STREAM_BYTES = registry.counter("chat_stream_bytes_total", "Bytes written to clients.", ("endpoint",))
+STREAM_DISCONNECTS = registry.counter("chat_stream_disconnects_total", "Streams closed by the client before the last frame.", ("endpoint",))
+
+_TEXT_HEAD = '0:"'
+_TEXT_TAIL = '"\n'
+
+# Pump tasks being cancelled after a disconnect; referenced until they finish
+_closing: Set[asyncio.Task] = set()
+
+
+def merge_text_frames(frames: List[str]) -> List[str]:
+    """
+    Join runs of adjacent `0:` frames into one frame.
+
+    A text frame is 0:"<escaped>"\\n and escapes never span the quotes, so
+    0:"ab"\\n + 0:"cd"\\n becomes 0:"abcd"\\n without decoding either one.
+    """
+    merged: List[str] = []
+    for frame in frames:
+        if (
+            merged
+            and frame.startswith(_TEXT_HEAD)
+            and frame.endswith(_TEXT_TAIL)
+            and merged[-1].startswith(_TEXT_HEAD)
+            and merged[-1].endswith(_TEXT_TAIL)
+        ):
+            merged[-1] = merged[-1][:-2] + frame[3:]
+        else:
+            merged.append(frame)
+    return merged
+
+
+class StreamWriter:
+    """
+    Async iterable between an orchestrator's frame generator and StreamingResponse.
+
+    A pump task reads frames from upstream into a buffer; iteration yields the
+    buffer as one chunk (adjacent text frames merged) at most every
+    coalesce_ms, or sooner once coalesce_bytes are waiting or upstream ends.
+    The first chunk, and the first after a pause such as a tool call, go out
+    at once.
+
+    Each yield returns only when the server has written the chunk, so a slow
+    client gets fewer, larger writes. Once max_buffer_bytes are waiting the
+    pump stops reading upstream until the client catches up. If the response
+    is cancelled or closed (client disconnect), the pump task is cancelled,
+    which closes the orchestrator generator and with it the model stream.
+
+    Pass the ASGI `receive` callable to also watch for http.disconnect
+    directly. Servers don't always cancel the response on disconnect (ASGI
+    2.4 only reports it on the next failed send), and while the model is
+    thinking or tools run there is nothing to send.
+    """
+
+    def __init__(
+        self,
+        frames: AsyncIterator[str],
+        endpoint: str = "chat",
+        coalesce_ms: float = STREAM_COALESCE_MS,
+        coalesce_bytes: int = STREAM_COALESCE_BYTES,
+        max_buffer_bytes: int = STREAM_MAX_BUFFER_BYTES,
+        receive: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None,
+    ):
+        self._frames = frames
+        self._receive = receive
+        self.endpoint = endpoint
+        self.coalesce_s = coalesce_ms / 1000
+        self.coalesce_bytes = coalesce_bytes
+        self.max_buffer_bytes = max_buffer_bytes
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self.frames_in = 0
+        self.frames_out = 0
+        self.writes = 0
+        self.bytes_out = 0
+        self.disconnected = False
+
+    async def _pump(self) -> None:
+        try:
+            async for frame in self._frames:
+                self._pending.append(frame)
+                self._pending_bytes += len(frame)
+                self.frames_in += 1
+                self._readable.set()
+                while self._pending_bytes >= self.max_buffer_bytes:
+                    self._writable.clear()
+                    await self._writable.wait()
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            self._error = e
+        finally:
+            # Cancelled while parked on the buffer: upstream is suspended at a yield
+            aclose = getattr(self._frames, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            self._done = True
+            self._readable.set()
+
+    async def _watch(self) -> None:
+        while True:
+            message = await self._receive()
+            if message.get("type") == "http.disconnect":
+                break
+        self.disconnected = True
+        self._stop_pump()
+        # Wake the response loop so it ends without waiting for upstream
+        self._done = True
+        self._readable.set()
+
+    def _stop_pump(self) -> None:
+        if not self._task.done():
+            # Don't await here: a cancelled response scope would cancel the wait too
+            self._task.cancel()
+            _closing.add(self._task)
+            self._task.add_done_callback(_closing.discard)
+
+    def _take(self) -> str:
+        frames = self._pending
+        if len(frames) > 1 and self.coalesce_s > 0:
+            frames = merge_text_frames(frames)
+        chunk = frames[0] if len(frames) == 1 else "".join(frames)
+        self.frames_out += len(frames)
+        self._pending = []
+        self._pending_bytes = 0
+        self._writable.set()
+        return chunk
+
+    async def _wait_readable(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._readable.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        self._task = loop.create_task(self._pump())
+        if self._receive is not None:
+            self._watcher = loop.create_task(self._watch())
+        last_write = float("-inf")
+        try:
+            while not self.disconnected:
+                if not self._pending:
+                    if self._done:
+                        break
+                    self._readable.clear()
+                    await self._readable.wait()
+                    continue
+                deadline = last_write + self.coalesce_s
+                while not self._done and self._pending_bytes < self.coalesce_bytes:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    self._readable.clear()
+                    if not await self._wait_readable(remaining):
+                        break
+                chunk = self._take()
+                self.writes += 1
+                self.bytes_out += len(chunk.encode("utf-8")) if not chunk.isascii() else len(chunk)
+                yield chunk
+                last_write = loop.time()
+            if self._error is not None and not self.disconnected:
+                raise self._error
+        except (GeneratorExit, asyncio.CancelledError):
+            self.disconnected = True
+            raise
+        finally:
+            if self._watcher is not None:
+                self._watcher.cancel()
+            self._stop_pump()
+            self._record()
+
+    def _record(self) -> None:
+        endpoint = self.endpoint
+        STREAM_FRAMES.labels(endpoint).inc(self.frames_in)
+        STREAM_WRITES.labels(endpoint).inc(self.writes)
+        STREAM_BYTES.labels(endpoint).inc(self.bytes_out)
+        if self.disconnected:
+            STREAM_DISCONNECTS.labels(endpoint).inc()
@@ -0,0 +1,16 @@
+import json
+from typing import Any
+
+# Rough average for English text and JSON with the GPT-4 family tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(value: Any) -> int:
+    """
+    Cheap prompt-token estimate (~4 characters per token) for strings or
+    JSON-serializable values. Good enough for budgets and before/after
+    comparisons; not an exact tokenizer count.
+    """
+    if not isinstance(value, str):
+        value = json.dumps(value, default=str)
+    return (len(value) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .metrics import registry
+from .patient_resolver import get_patient_resolver
+from .storage import add_write_listener, get_storage
+
+# Memoized tool results kept per conversation (0 disables memoization)
+TOOL_MEMO_MAX_ENTRIES = int(os.getenv("TOOL_MEMO_MAX_ENTRIES", "64"))
+TOOL_MEMO_TTL_S = float(os.getenv("TOOL_MEMO_TTL_S", "300"))
+# Conversations with a memo, least recently used dropped first
+TOOL_MEMO_MAX_SESSIONS = int(os.getenv("TOOL_MEMO_MAX_SESSIONS", "1024"))
+
+# Read-only tools whose result depends on one patient, named by this argument
+PATIENT_TOOLS = {"get_patient_info": "patient_id", "search_transcript": "patient_id"}
+# Read-only tools whose result may depend on any patient
+ROSTER_TOOLS = {"get_patient_names", "resolve_patient", "query_patients", "search_records_RAG"}
+
+MEMO_LOOKUPS = registry.counter(
+    "chat_tool_memo_total", "Tool memo lookups by tool and result (hit, miss, stale).", ("tool", "result")
+)
+
+
+class WriteGenerations:
+    """
+    Write counters: one per patient and one for all patients. A memo entry
+    remembers the counter it depends on as it was before the tool ran, so
+    any write that lands during or after the call makes the entry stale.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.all = 0
+        self.patients: Dict[str, int] = {}
+
+    def on_write(self, patient_ids: List[str]) -> None:
+        with self._lock:
+            self.all += 1
+            for patient_id in patient_ids:
+                self.patients[patient_id] = self.patients.get(patient_id, 0) + 1
+
+    def current(self, patient_id: Optional[str]) -> int:
+        """Counter for one patient, or for all patients when patient_id is None."""
+        return self.all if patient_id is None else self.patients.get(patient_id, 0)
+
+
+write_generations = WriteGenerations()
+add_write_listener(write_generations.on_write)
+
+
+@dataclass
+class MemoEntry:
+    output: str
+    created_at: float
+    # records_version() for one-patient entries, data_version() for roster-wide ones
+    data_version: Any
+    # None: depends on the whole roster
+    patient_id: Optional[str]
+    generation: int
+
+
+def memo_key(function_name: str, arguments: str) -> Optional[Tuple[str, str]]:
+    """(tool, canonical JSON args), or None for tools and arguments that are never memoized."""
+    if function_name not in PATIENT_TOOLS and function_name not in ROSTER_TOOLS:
+        return None
+    try:
+        args = json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        return None
+    return function_name, json.dumps(args, sort_keys=True, separators=(",", ":"))
+
+
+def patient_scope(function_name: str, arguments: str) -> Optional[str]:
+    """The one patient a tool call reads, or None when it may read any (rosters, searches, names to resolve)."""
+    argument = PATIENT_TOOLS.get(function_name)
+    if argument is None:
+        return None
+    patient_id = json.loads(arguments or "{}").get(argument)
+    # A name or MRN is resolved against the roster, so it depends on every write
+    return patient_id if patient_id in get_patient_resolver().by_id else None
+
+
+class ToolMemo:
+    """
+    One conversation's tool results, LRU with a TTL.
+
+    An entry is served only while no write in this process has touched its
+    patient (or, for roster-wide tools, any patient) since the call started,
+    and the storage version it was computed at is still current: the
+    encounter records version for one-patient tools, data_version (which
+    intakes bump too) for the rest. The versions catch writes made by other
+    processes.
+    """
+
+    def __init__(self, max_entries: int = TOOL_MEMO_MAX_ENTRIES, ttl_s: float = TOOL_MEMO_TTL_S,
+                 generations: WriteGenerations = write_generations):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.generations = generations
+        self._entries: "OrderedDict[Tuple[str, str], MemoEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(patient_id: Optional[str]) -> Any:
+        storage = get_storage()
+        return storage.data_version() if patient_id is None else storage.records_version()
+
+    def _lookup(self, key: Tuple[str, str]) -> Tuple[Optional[MemoEntry], bool]:
+        """(entry, valid); an invalid entry is dropped."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        version = self._version(entry.patient_id)
+        with self._lock:
+            valid = (
+                time.monotonic() - entry.created_at <= self.ttl_s
+                and entry.data_version == version
+                and entry.generation == self.generations.current(entry.patient_id)
+            )
+            if valid:
+                self._entries.move_to_end(key)
+            elif self._entries.get(key) is entry:
+                del self._entries[key]
+        return entry, valid
+
+    def call(self, execute: Callable[[str, str], str], function_name: str, arguments: str) -> str:
+        """execute(function_name, arguments), answered from the memo when a valid entry exists."""
+        key = memo_key(function_name, arguments)
+        if key is None:
+            return execute(function_name, arguments)
+
+        entry, valid = self._lookup(key)
+        if valid:
+            tool_memo_stats.record(function_name, "hit")
+            return entry.output
+        tool_memo_stats.record(function_name, "miss" if entry is None else "stale")
+
+        # Read the version and write counter before running the tool: a write during the call invalidates the result
+        patient_id = patient_scope(function_name, arguments)
+        version = self._version(patient_id)
+        generation = self.generations.current(patient_id)
+        output = execute(function_name, arguments)
+        with self._lock:
+            self._entries[key] = MemoEntry(output, time.monotonic(), version, patient_id, generation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                tool_memo_stats.evictions += 1
+        return output
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ToolMemoStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def record(self, function_name: str, result: str) -> None:
+        MEMO_LOOKUPS.labels(function_name, result).inc()
+        with self._lock:
+            if result == "hit":
+                self.hits += 1
+            elif result == "miss":
+                self.misses += 1
+            else:
+                self.stale += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.stale
+        return {
+            "sessions": len(_sessions),
+            "entries": sum(len(memo) for memo in list(_sessions.values())),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+tool_memo_stats = ToolMemoStats()
+_sessions: "OrderedDict[str, ToolMemo]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def get_session_memo(session_id: Optional[str]) -> Optional[ToolMemo]:
+    """The memo for a conversation, or None without a session id or with memoization off."""
+    if not session_id or TOOL_MEMO_MAX_ENTRIES <= 0 or TOOL_MEMO_TTL_S <= 0:
+        return None
+    with _sessions_lock:
+        memo = _sessions.get(session_id)
+        if memo is None:
+            memo = _sessions[session_id] = ToolMemo()
+            while len(_sessions) > TOOL_MEMO_MAX_SESSIONS:
+                _sessions.popitem(last=False)
+        _sessions.move_to_end(session_id)
+        return memo
+
+
+def memoized(execute: Callable[[str, str], str], session_id: Optional[str]) -> Callable[[str, str], str]:
+    """execute wrapped with the session's memo (execute itself when there is none)."""
+    memo = get_session_memo(session_id)
+    if memo is None:
+        return execute
+    return lambda function_name, arguments: memo.call(execute, function_name, arguments)
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import observe_tool
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Per-tool wall-clock limit; the model gets an error result instead of waiting forever
+TOOL_TIMEOUT_S = float(os.getenv("TOOL_TIMEOUT_S", "20"))
+# Upper bound on tool functions running at once across all requests in this worker
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "16"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+    return _executor
+
+
+async def run_function_calls(
+    calls: List[Any],
+    execute: Callable[[str, str], str],
+    timeout: float = TOOL_TIMEOUT_S,
+) -> List[Dict[str, Any]]:
+    """
+    Run all function calls from one model turn concurrently.
+
+    Args:
+        calls: function_call output items (anything with name, arguments and call_id)
+        execute: Synchronous dispatcher, e.g. execute_function_call(name, arguments) -> JSON string
+        timeout: Seconds each call may take before it is reported as timed out
+
+    Returns:
+        function_call_output input items, in the same order as `calls`.
+
+    A tool that raises is reported to the model as an error result, like a
+    timeout. A timed-out tool keeps running in its worker thread (threads can't be killed);
+    only its result is dropped. The same goes for calls already running when the
+    caller is cancelled; calls still waiting for a worker are dropped unstarted.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+
+    async def run_one(item) -> Dict[str, Any]:
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            output = await asyncio.wait_for(
+                loop.run_in_executor(executor, execute, item.name, item.arguments),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            status = "timeout"
+            output = dumps({"error": f"Tool '{item.name}' timed out after {timeout:g}s"})
+        except asyncio.CancelledError:
+            # The request was cancelled; a call still queued for a worker never starts
+            status = "cancelled"
+            raise
+        except Exception as e:
+            # One failing tool must not take its siblings' results or the stream down with it
+            logger.warning("Tool %s failed", item.name, exc_info=True)
+            status = "error"
+            output = dumps({"error": f"Tool '{item.name}' failed: {e}"})
+        finally:
+            observe_tool(item.name, time.perf_counter() - start, status)
+        return {
+            "type": "function_call_output",
+            "call_id": item.call_id,
+            "output": output,
+        }
+
+    # gather() preserves argument order, so outputs line up with the model's call_ids
+    return list(await asyncio.gather(*(run_one(item) for item in calls)))
@@ -0,0 +1,92 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+from .retrieval import tokenize
+
+# How many per-patient transcript indexes to keep built
+TRANSCRIPT_INDEX_CACHE_SIZE = int(os.getenv("TRANSCRIPT_INDEX_CACHE_SIZE", "256"))
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by did do does for from had has have he her his how i if in is it its "
+    "me my of on or she so than that the their them then there they this to was we were what when "
+    "where which who why will with you your".split()
+)
+
+
+class TranscriptIndex:
+    """Inverted index (token -> turn positions) over one encounter transcript."""
+
+    def __init__(self, transcript: List[Dict[str, Any]]):
+        self.transcript = transcript
+        self.postings: Dict[str, List[int]] = {}
+        for position, turn in enumerate(transcript):
+            for token in set(tokenize(turn.get("text", ""))):
+                if token not in STOPWORDS:
+                    self.postings.setdefault(token, []).append(position)
+
+    def search(self, query: str, window: int = 2, max_matches: int = 10) -> Dict[str, Any]:
+        """
+        Find the turns that best match `query` and return them with `window`
+        turns of context on each side. Overlapping ranges are merged.
+
+        Returns:
+            {"matches": int, "segments": [{"start", "end", "turns": [...]}]}; matching
+            turns carry "match": true.
+        """
+        terms = {t for t in tokenize(query) if t not in STOPWORDS}
+        n_turns = max(len(self.transcript), 1)
+        scores: Dict[int, float] = {}
+        for term in terms:
+            positions = self.postings.get(term, [])
+            if not positions:
+                continue
+            idf = math.log(1 + n_turns / len(positions))
+            for position in positions:
+                scores[position] = scores.get(position, 0.0) + idf
+
+        ranked = sorted(scores, key=lambda p: (-scores[p], p))[:max_matches]
+        matched = set(ranked)
+
+        ranges: List[Tuple[int, int]] = []
+        for position in sorted(matched):
+            lo, hi = max(0, position - window), min(len(self.transcript) - 1, position + window)
+            if ranges and lo <= ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], hi))
+            else:
+                ranges.append((lo, hi))
+
+        segments = []
+        for lo, hi in ranges:
+            turns = []
+            for position in range(lo, hi + 1):
+                turn = dict(self.transcript[position])
+                if position in matched:
+                    turn["match"] = True
+                turns.append(turn)
+            segments.append({"start": turns[0].get("t"), "end": turns[-1].get("t"), "turns": turns})
+
+        return {"matches": len(matched), "segments": segments}
+
+
+_indexes: "OrderedDict[Tuple[int, str], TranscriptIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_transcript_index(records_version: int, patient_id: str, transcript: List[Dict[str, Any]]) -> TranscriptIndex:
+    """LRU of built indexes keyed by (encounter records version, patient_id)."""
+    key = (records_version, patient_id)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = TranscriptIndex(transcript)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > TRANSCRIPT_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
@@ -1,12 +1,7 @@
-import json
-import os
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 
-PATIENT_RECORDS_PATH = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-    "patient_records.json"
-)
+from .storage import get_storage
 
 def write_patient_intake(
     name: str,
@@ -23,8 +18,10 @@ def write_patient_intake(
     allergies: Optional[List[str]] = None
 ) -> Dict[str, Any]:
     """
-    Write a new patient intake record to the patient_records.json file.
-    This creates an entry under the 'AI_scribes' key.
+    Write a new patient intake record.
+    The record goes to the configured storage backend: with the default JSON
+    backend it is appended to the intake journal and shows up under the
+    'AI_scribes' key of patient_records.json once the journal is compacted.
     
     Args:
         name: Patient's full name
@@ -44,14 +41,6 @@ def write_patient_intake(
         Dict with status and patient_id of the created record
     """
     try:
-        # Load existing records
-        with open(PATIENT_RECORDS_PATH, 'r') as f:
-            data = json.load(f)
-        
-        # Ensure AI_scribes key exists
-        if "AI_scribes" not in data:
-            data["AI_scribes"] = {}
-        
         # Create patient ID from name (lowercase, replace spaces with underscores)
         patient_id = name.lower().replace(" ", "_").replace(".", "")
         
@@ -78,12 +67,8 @@ def write_patient_intake(
             "status": "pending_review"
         }
         
-        # Add to AI_scribes
-        data["AI_scribes"][patient_id] = intake_record
-        
-        # Write back to file
-        with open(PATIENT_RECORDS_PATH, 'w') as f:
-            json.dump(data, f, indent=2)
+        # Journal append or one-row transactional insert, depending on STORAGE_BACKEND
+        get_storage().insert_intake(patient_id, intake_record)
         
         return {
             "status": "success",
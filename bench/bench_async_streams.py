@@ -0,0 +1,58 @@
+"""
+Load test: how many concurrent SSE chats one uvicorn worker sustains with the
+old sync orchestrator (threadpool-bound) vs. the async one.
+
+Both apps run against bench.fake_openai with a fixed TTFT and per-delta delay,
+so an ideal server finishes C concurrent chats in roughly one chat's latency.
+Peak concurrent upstream streams (as seen by the fake server) is the
+"concurrent streams per worker" figure.
+
+Run from the repo root:
+    python -m bench.bench_async_streams [--concurrency 50 200]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from bench.servers import fake_openai, fake_stats, uvicorn_server
+
+APPS = {"sync (before)": "bench.legacy_chat:app", "async (after)": "api.index:app"}
+BODY = {"messages": [{"role": "user", "content": "list patients"}]}
+
+
+async def one_chat(client: httpx.AsyncClient, url: str) -> float:
+    start = time.perf_counter()
+    async with client.stream("POST", f"{url}/api/chat", json=BODY) as response:
+        async for _ in response.aiter_raw():
+            pass
+    return time.perf_counter() - start
+
+
+async def drive(url: str, concurrency: int):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(one_chat(client, url) for _ in range(concurrency)))
+        return time.perf_counter() - start, sorted(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    args = parser.parse_args()
+
+    print(f"{'app':<14} {'chats':>6} {'wall s':>7} {'p50 s':>6} {'max s':>6} {'peak upstream streams':>22}")
+    for label, app in APPS.items():
+        for concurrency in args.concurrency:
+            with fake_openai(FAKE_TTFT_MS="300", FAKE_DELTA_MS="20", FAKE_DELTAS="50") as base_url:
+                with uvicorn_server(app, env={"OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "fake"}) as url:
+                    wall, latencies = asyncio.run(drive(url, concurrency))
+                peak = fake_stats(base_url)["max_active_streams"]
+            print(f"{label:<14} {concurrency:>6} {wall:>7.2f} {latencies[len(latencies) // 2]:>6.2f} "
+                  f"{latencies[-1]:>6.2f} {peak:>22}")
+
+
+if __name__ == "__main__":
+    main()
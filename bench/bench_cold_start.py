@@ -0,0 +1,76 @@
+"""
+Cold start of the API entry point: import time of api.index, time until a
+fresh uvicorn worker accepts connections, and the first /api/chat request
+that worker serves (TTFT and total), against bench.fake_openai.
+
+The first request names a patient, so it exercises the name index, the
+record store and prefetch before one streamed model round (the fake model
+only asks for a tool when no tool output is present). --ttft-ms sets how
+long the model takes to start answering; the SDK import (OPENAI_PREWARM)
+runs in the background meanwhile.
+
+Run from the repo root:
+    python -m bench.bench_cold_start [--trials 5] [--ttft-ms 400]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from bench.servers import REPO_ROOT, fake_openai, uvicorn_process
+
+IMPORT = "import time; t = time.perf_counter(); import api.index; print(time.perf_counter() - t)"
+QUESTION = "Summarize Jordan Carter's plan"
+TOOL_CALL = 'get_patient_info:{"patient_id": "jordan_carter", "view": "meds"}'
+
+
+def import_seconds(env: Dict[str, str]) -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT], cwd=REPO_ROOT, env={**os.environ, **env},
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.split()[-1])
+
+
+def first_request(base: str, env: Dict[str, str]) -> Dict[str, float]:
+    env = {"OPENAI_BASE_URL": base, "OPENAI_API_KEY": "fake", "RESPONSE_CACHE_MAX_ENTRIES": "0", **env}
+    spawned = time.perf_counter()
+    with uvicorn_process("api.index:app", env=env) as (url, _):
+        ready = time.perf_counter() - spawned
+        start = time.perf_counter()
+        ttft = None
+        with httpx.stream("POST", f"{url}/api/chat", json={"messages": [{"role": "user", "content": QUESTION}]},
+                          timeout=60) as r:
+            for line in r.iter_lines():
+                if ttft is None and line.startswith("0:"):
+                    ttft = time.perf_counter() - start
+        total = time.perf_counter() - start
+    return {"ready": ready, "ttft": ttft, "total": total}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--ttft-ms", default="400")
+    parser.add_argument("--env", nargs="*", default=[], help="extra KEY=VALUE settings for the app")
+    args = parser.parse_args()
+    env = dict(kv.split("=", 1) for kv in args.env)
+
+    imports = [import_seconds(env) for _ in range(args.trials)]
+    print(f"import api.index: median {statistics.median(imports) * 1000:.0f} ms (min {min(imports) * 1000:.0f})")
+
+    script = {"FAKE_TTFT_MS": args.ttft_ms, "FAKE_DELTA_MS": "5", "FAKE_DELTAS": "20", "FAKE_TOOL_CALLS": TOOL_CALL}
+    with fake_openai(**script) as base:
+        runs: List[Dict[str, float]] = [first_request(base, env) for _ in range(args.trials)]
+    for key, label in (("ready", "worker accepting connections"), ("ttft", "first request TTFT"),
+                       ("total", "first request total")):
+        values = [run[key] for run in runs]
+        print(f"{label:<30} median {statistics.median(values) * 1000:6.0f} ms (min {min(values) * 1000:.0f})")
+    print(f"(model: {args.ttft_ms} ms to first event in one round)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Memory and serialization cost of encounter records: plain decoded dicts vs.
+CompactRecordMapping (slotted/NamedTuple fields, tuple transcripts, cached JSON).
+
+Reports traced Python heap per 10k records, the cost of a full-record tool
+result (json.dumps of the dict vs. the cached blob), and the cost of rebuilding
+a dict from the compact form. Fails if any rebuilt record does not serialize
+byte-for-byte like the original.
+
+Run from the repo root:
+    python -m bench.bench_compact_records [--records 10000]
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from api.utils.compact_record import CompactRecordMapping
+from bench.synthetic import iter_records
+
+CALLS = 2000
+
+
+def heap_mb(build):
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current / (1024 * 1024)
+
+
+def per_call_us(fn, keys):
+    start = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return (time.perf_counter() - start) / len(keys) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=10_000)
+    args = parser.parse_args()
+
+    text = json.dumps(dict(iter_records(args.records)))
+    plain, plain_mb = heap_mb(lambda: json.loads(text))
+    compact, compact_mb = heap_mb(lambda: CompactRecordMapping(json.loads(text)))
+
+    mismatches = [key for key in plain if json.dumps(compact[key]) != json.dumps(plain[key])]
+    assert not mismatches, f"{len(mismatches)} records changed, e.g. {mismatches[0]}"
+
+    rng = random.Random(0)
+    hot = [rng.choice(list(plain)) for _ in range(CALLS)]
+    # Distinct records that fit in the JSON LRU (COMPACT_JSON_CACHE_SIZE)
+    cold = rng.sample(list(plain), min(500, len(plain)))
+    dumps_us = per_call_us(lambda k: json.dumps(plain[k]), hot)
+    first_blob_us = per_call_us(compact.json, cold)
+    cached_blob_us = per_call_us(compact.json, cold)
+    rebuild_us = per_call_us(lambda k: compact[k], hot)
+    start = time.perf_counter()
+    CompactRecordMapping(plain)
+    pack_s = time.perf_counter() - start
+
+    scale = 10_000 / args.records
+    print(f"{args.records} records, {len(text) / 1e6:.0f} MB of JSON, all rebuilt records byte-identical")
+    print(f"heap per 10k records:   dicts {plain_mb * scale:7.1f} MB   compact {compact_mb * scale:7.1f} MB "
+          f"({(1 - compact_mb / plain_mb) * 100:.0f}% less)")
+    print(f"full-record tool result: json.dumps {dumps_us:7.1f} us   cached blob {cached_blob_us:5.2f} us   "
+          f"first blob (rebuild + dumps) {first_blob_us:7.1f} us")
+    print(f"rebuild dict from compact: {rebuild_us:.1f} us/record; packing {args.records} records: {pack_s:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
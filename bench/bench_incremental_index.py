@@ -0,0 +1,78 @@
+"""
+Full RAG index rebuild vs. incremental sync after 1, 100 and 10k new intakes.
+
+A synthetic patient_records.json is loaded through the real PatientRecordStore
+(compact or plain records, per RECORDS_COMPACT) and indexed once; then new
+AI_scribes intakes are appended to the intake journal and
+IncrementalIndexer.sync() re-embeds only those. Rebuild time is
+IncrementalIndexer.rebuild() on the same data.
+
+Run from the repo root:
+    python -m bench.bench_incremental_index [--base 10000]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from api.utils.intake_journal import IntakeJournal
+from api.utils.record_store import PatientRecordStore
+from api.utils.retrieval import IncrementalIndexer
+from bench.synthetic import write_dataset
+
+
+def make_intakes(start: int, count: int):
+    return {
+        f"intake_{i}": {
+            "patient_info": {"name": f"Intake Patient {i}", "age": 30 + i % 50, "sex": "F"},
+            "chief_complaint": "Persistent cough and fever",
+            "symptoms": ["Cough", "Fever"],
+            "conversation_summary": f"Synthetic intake number {i}",
+            "ai_assessment": "Schedule appointment",
+        }
+        for i in range(start, start + count)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_dataset(os.path.join(tmp, "patient_records.json"), args.base)
+        journal_path = os.path.join(tmp, "patient_intakes.jsonl")
+        # No compaction: the data file (and so every encounter record) stays as loaded
+        journal = IntakeJournal(journal_path, snapshot_path=path, compact_every=0)
+        store = PatientRecordStore(path, journal_path)
+        indexer = IncrementalIndexer(store)
+        start = time.perf_counter()
+        indexer.sync()
+        print(f"initial build of {args.base} records: {time.perf_counter() - start:.2f}s, {len(indexer.index)} chunks")
+
+        print(f"{'new intakes':>11} {'incremental s':>14} {'rehashed':>9} {'full rebuild s':>15} {'speedup':>8}")
+        added = 0
+        for count in (1, 100, 10_000):
+            for patient_id, record in make_intakes(added, count).items():
+                journal.append(patient_id, record)
+            journal.flush()
+            added += count
+
+            rehashed = indexer.records_rehashed
+            start = time.perf_counter()
+            indexer.sync()
+            incremental = time.perf_counter() - start
+            # Unchanged records the identity skip missed, so they were serialized and hashed again
+            rehashed = indexer.records_rehashed - rehashed
+
+            start = time.perf_counter()
+            indexer.rebuild()
+            full = time.perf_counter() - start
+            print(f"{count:>11} {incremental:>14.3f} {rehashed:>9} {full:>15.2f} {full / incremental:>7.0f}x")
+
+        journal.close()
+        print(indexer.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Intake write throughput and lost-write check: the old read-modify-write of the
+whole patient_records.json vs. the append-only IntakeJournal.
+
+N threads each write M intakes with distinct patient IDs; afterwards every ID
+must be readable through PatientRecordStore.ai_scribes().
+
+Run from the repo root:
+    python -m bench.bench_intake_journal
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+from api.utils.intake_journal import IntakeJournal
+from api.utils.record_store import PatientRecordStore
+from bench.synthetic import write_dataset
+
+THREADS = 8
+PER_THREAD = 50
+
+
+def intake(patient_id: str) -> dict:
+    return {
+        "timestamp": "2025-10-21T21:57:47",
+        "patient_info": {"name": patient_id, "age": 40, "sex": "F"},
+        "chief_complaint": "Headache",
+        "status": "pending_review",
+    }
+
+
+def legacy_write(path: str, patient_id: str) -> None:
+    with open(path, "r") as f:
+        data = json.load(f)
+    data.setdefault("AI_scribes", {})[patient_id] = intake(patient_id)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def run_threads(write) -> float:
+    def worker(t: int):
+        for i in range(PER_THREAD):
+            write(f"bench_{t}_{i}")
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    start = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return time.perf_counter() - start
+
+
+def count_written(ai_scribes: dict) -> int:
+    return sum(1 for k in ai_scribes if k.startswith("bench_"))
+
+
+def main():
+    total = THREADS * PER_THREAD
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_records in (5, 500):
+            # Legacy full-file rewrite (errors from reading half-written files count as lost)
+            legacy_path = write_dataset(os.path.join(tmp, f"legacy_{n_records}.json"), n_records)
+
+            def safe_legacy(pid):
+                try:
+                    legacy_write(legacy_path, pid)
+                except (json.JSONDecodeError, OSError):
+                    pass
+
+            legacy_s = run_threads(safe_legacy)
+            legacy_store = PatientRecordStore(legacy_path, journal_path=None)
+            legacy_kept = count_written(legacy_store.ai_scribes())
+
+            # Append-only journal (compaction enabled so it runs mid-benchmark)
+            snap_path = write_dataset(os.path.join(tmp, f"journal_{n_records}.json"), n_records)
+            journal_path = os.path.join(tmp, f"journal_{n_records}.jsonl")
+            journal = IntakeJournal(journal_path, snap_path, compact_every=total // 3)
+            journal_s = run_threads(lambda pid: journal.append(pid, intake(pid)))
+            journal.close()
+            journal_kept = count_written(PatientRecordStore(snap_path, journal_path).ai_scribes())
+
+            print(f"{n_records} existing records, {THREADS} threads x {PER_THREAD} intakes")
+            print(f"  rewrite: {total / legacy_s:>9.0f} writes/s, kept {legacy_kept}/{total}")
+            print(f"  journal: {total / journal_s:>9.0f} writes/s, kept {journal_kept}/{total}  {journal.stats()}")
+            assert journal_kept == total, "journal lost intakes"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold start and resident memory of PatientRecordStore: full json.load vs. the
+lazy offset index (first scan, and with the saved .offsets index).
+
+For each file size a fresh interpreter loads the store, answers
+get_patient_names() and one get_patient_info(), and reports time to that first
+answer, current RSS and peak RSS. The eager mode is skipped above --max-eager-mb
+because json.load of a multi-GB file needs several times its size in RAM.
+
+Run from the repo root:
+    python -m bench.bench_lazy_records [--sizes-mb 10 100 1000] [--max-eager-mb 300]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench.servers import REPO_ROOT
+from bench.synthetic import file_size_mb, write_dataset_of_size
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+from api.utils.get_patient_info import get_patient_names, get_patient_info
+page = get_patient_names()
+record = get_patient_info(page["patients"][len(page["patients"]) // 2]["patient_id"], view="summary")
+elapsed = time.perf_counter() - start
+assert "error" not in record, record
+status = dict(line.split(":", 1) for line in open("/proc/self/status"))
+kb = lambda key: int(status[key].split()[0]) / 1024
+print(json.dumps({"patients": page["total"], "cold_start_s": elapsed, "rss_mb": kb("VmRSS"), "peak_rss_mb": kb("VmHWM")}))
+"""
+
+
+def run_child(records_path: str, lazy: bool) -> dict:
+    env = {
+        **os.environ,
+        "PATIENT_RECORDS_PATH": records_path,
+        "INTAKE_JOURNAL_PATH": records_path + ".intakes.jsonl",
+        "RECORDS_LAZY_LOAD": "1" if lazy else "0",
+        "RAG_BACKEND": "local",
+    }
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--max-eager-mb", type=float, default=300)
+    args = parser.parse_args()
+
+    baseline = run_child(os.path.join(REPO_ROOT, "patient_records.json"), lazy=False)
+    print(f"interpreter + app imports with the 5-record seed file: rss={baseline['rss_mb']:.0f} MB\n")
+    print(f"{'file':>8} {'records':>8} {'mode':<14} {'cold start s':>12} {'rss MB':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.sizes_mb:
+            path = os.path.join(tmp, f"records_{size_mb:g}mb.json")
+            write_dataset_of_size(path, size_mb)
+            actual_mb = file_size_mb(path)
+
+            runs = []
+            if actual_mb <= args.max_eager_mb:
+                runs.append(("json.load", False))
+            runs += [("lazy, scan", True), ("lazy, cached", True)]
+            for mode, lazy in runs:
+                result = run_child(path, lazy)
+                if "error" in result:
+                    print(f"{actual_mb:>6.0f}MB {'':>8} {mode:<14} {result['error']}")
+                    continue
+                print(f"{actual_mb:>6.0f}MB {result['patients']:>8} {mode:<14} {result['cold_start_s']:>12.2f} "
+                      f"{result['rss_mb']:>8.0f} {result['peak_rss_mb']:>8.0f}")
+            if actual_mb > args.max_eager_mb:
+                print(f"{actual_mb:>6.0f}MB {'':>8} {'json.load':<14} skipped (> --max-eager-mb)")
+            os.remove(path)
+            if os.path.exists(path + ".offsets"):
+                os.remove(path + ".offsets")
+
+
+if __name__ == "__main__":
+    main()
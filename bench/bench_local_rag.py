@@ -0,0 +1,59 @@
+"""
+Recall and latency of the local RAG index (HashingEmbedder + LocalVectorIndex)
+on synthetic corpora.
+
+Each synthetic patient has a unique name ("Priya Rossi 1234"). A query asks for
+one patient's plan or assessment by name, and recall@k counts how often that
+patient shows up in the top k. Hash collisions are the main thing that hurts it.
+To keep 100k records within a few GB, transcripts are cut to one chunk per record.
+
+Run from the repo root:
+    python -m bench.bench_local_rag [--sizes 1000 10000 100000] [--dim 512]
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from api.utils.retrieval import HashingEmbedder, LocalVectorIndex, RAG_TOP_K, chunk_patient_record
+from bench.synthetic import iter_records
+
+QUERIES_PER_SIZE = 200
+SECTIONS = ["plan medication changes", "assessment diagnosis", "history of present illness"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=512)
+    args = parser.parse_args()
+
+    print(f"{'records':>8} {'chunks':>8} {'build s':>8} {'matrix MB':>10} {'recall@k':>9} {'p50 ms':>7} {'p95 ms':>7}")
+    for n in args.sizes:
+        chunks, names = [], []
+        for patient_id, record in iter_records(n, transcript_turns=6):
+            chunks.extend(chunk_patient_record(patient_id, record))
+            names.append((patient_id, record["patient"]["name"]))
+
+        start = time.perf_counter()
+        index = LocalVectorIndex(HashingEmbedder(args.dim))
+        index.build(chunks)
+        build_s = time.perf_counter() - start
+        del chunks
+
+        rng = random.Random(1)
+        hits, latencies = 0, []
+        for patient_id, name in rng.sample(names, min(QUERIES_PER_SIZE, len(names))):
+            query = f"{name} {rng.choice(SECTIONS)}"
+            start = time.perf_counter()
+            results = index.search(query, RAG_TOP_K)
+            latencies.append((time.perf_counter() - start) * 1e3)
+            hits += any(chunk.metadata["patient_id"] == patient_id for chunk, _ in results)
+
+        print(f"{n:>8} {len(index.chunks):>8} {build_s:>8.1f} {index.matrix.nbytes / 2**20:>10.0f} "
+              f"{hits / len(latencies):>9.2f} {np.percentile(latencies, 50):>7.2f} {np.percentile(latencies, 95):>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
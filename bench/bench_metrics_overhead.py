@@ -0,0 +1,96 @@
+"""
+Overhead of the request metrics in api/utils/metrics.py.
+
+Measures:
+  - ns per Histogram.observe / Counter.inc,
+  - a full request trace (3 model calls, 2 tools, 200 streamed frames through
+    RequestTrace.stream) against the same frames with no tracing,
+  - registry.render() time once every series exists.
+The per-request overhead is then compared with a fast 300 ms answer.
+
+Run from the repo root:
+    python -m bench.bench_metrics_overhead
+"""
+import asyncio
+import time
+
+from api.utils.metrics import REQUESTS, TOOL_SECONDS, RequestTrace, observe_tool, registry
+
+N_OBSERVE = 200_000
+N_REQUESTS = 2_000
+FRAMES_PER_REQUEST = 200
+REFERENCE_REQUEST_S = 0.3
+
+
+class Usage:
+    input_tokens = 1200
+    output_tokens = 150
+
+
+async def frames():
+    for i in range(FRAMES_PER_REQUEST):
+        yield f'0:"tok{i} "\n'
+    yield 'e:{"finishReason": "stop"}\n'
+
+
+async def plain_request():
+    async for _ in frames():
+        pass
+
+
+async def traced_request():
+    trace = RequestTrace("bench")
+    for _ in range(3):
+        trace.model_call(0.1)
+        trace.add_usage(Usage)
+    observe_tool("bench_tool", 0.002)
+    observe_tool("bench_tool", 0.003)
+    async for _ in trace.stream(frames()):
+        pass
+
+
+async def time_requests(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(N_REQUESTS):
+        await fn()
+    return (time.perf_counter() - start) / N_REQUESTS
+
+
+def main():
+    child = TOOL_SECONDS.labels("bench_observe")
+    start = time.perf_counter()
+    for i in range(N_OBSERVE):
+        child.observe(i * 1e-6)
+    observe_ns = (time.perf_counter() - start) / N_OBSERVE * 1e9
+
+    counter = REQUESTS.labels("bench", "ok")
+    start = time.perf_counter()
+    for _ in range(N_OBSERVE):
+        counter.inc()
+    inc_ns = (time.perf_counter() - start) / N_OBSERVE * 1e9
+
+    start = time.perf_counter()
+    for i in range(N_OBSERVE):
+        TOOL_SECONDS.labels("bench_observe").observe(i * 1e-6)
+    labelled_ns = (time.perf_counter() - start) / N_OBSERVE * 1e9
+
+    plain_s = asyncio.run(time_requests(plain_request))
+    traced_s = asyncio.run(time_requests(traced_request))
+    overhead_us = (traced_s - plain_s) * 1e6
+
+    start = time.perf_counter()
+    text = registry.render()
+    render_ms = (time.perf_counter() - start) * 1e3
+
+    print(f"Histogram.observe            {observe_ns:8.0f} ns")
+    print(f"labels().observe             {labelled_ns:8.0f} ns")
+    print(f"Counter.inc                  {inc_ns:8.0f} ns")
+    print(f"request, untraced            {plain_s * 1e6:8.1f} us  ({FRAMES_PER_REQUEST} frames)")
+    print(f"request, traced              {traced_s * 1e6:8.1f} us")
+    print(f"tracing overhead per request {overhead_us:8.1f} us  "
+          f"({overhead_us / (REFERENCE_REQUEST_S * 1e6) * 100:.3f}% of a {REFERENCE_REQUEST_S * 1e3:.0f} ms answer)")
+    print(f"registry.render()            {render_ms:8.2f} ms  ({len(text.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    main()
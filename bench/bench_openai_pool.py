@@ -0,0 +1,149 @@
+"""
+OpenAI client pooling: connection setup per request, before and after the
+shared client factory, against bench.fake_openai served over HTTPS.
+
+  1. back to back: a new client per request vs. one shared client
+     (TCP connects, TLS handshakes and mean request latency),
+  2. a conversation with think time: chat, patient chat and a RAG search per
+     turn, --think-s apart. Before: one client per module with the SDK's
+     default pool (5 s keep-alive); after: the shared async + sync clients
+     with the tuned pool (OPENAI_KEEPALIVE_EXPIRY_S, default 120 s),
+  3. pool saturation: 30 concurrent streams through a pool of 8 vs. the
+     default limit, as reported by the openai_pool metrics.
+
+Run from the repo root:
+    python -m bench.bench_openai_pool [--turns 4] [--think-s 6]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+import httpx
+from openai._constants import DEFAULT_CONNECTION_LIMITS
+
+from api.utils.openai_clients import CONNECT_SECONDS, PoolStats, http2_enabled, make_async_client, make_sync_client
+from bench.servers import fake_openai, self_signed_cert
+
+BACK_TO_BACK = 30
+CONCURRENT = 30
+
+
+async def stream_once(client) -> float:
+    start = time.perf_counter()
+    async with client.responses.stream(model="fake", input=[{"role": "user", "content": "hi"}]) as stream:
+        async for _ in stream:
+            pass
+    return time.perf_counter() - start
+
+
+def search_once(client) -> float:
+    start = time.perf_counter()
+    client.vector_stores.search(vector_store_id="vs_fake", query="hypertension", max_num_results=3)
+    return time.perf_counter() - start
+
+
+def setup_ms(pools: List[PoolStats]) -> float:
+    """Total TCP connect + TLS handshake time recorded for these pools, in ms."""
+    total = 0.0
+    for pool in pools:
+        for step in ("connect", "tls"):
+            total += CONNECT_SECONDS.labels(pool.pool, step).sum
+    return total * 1000
+
+
+def summary(label: str, pools: List[PoolStats], latencies: List[float], requests: int) -> None:
+    connects = sum(p.connections_opened for p in pools)
+    handshakes = sum(p.tls_handshakes for p in pools)
+    print(f"  {label:<34} {connects:>3} connects, {handshakes:>3} TLS handshakes for {requests} requests; "
+          f"setup {setup_ms(pools) / requests:5.2f} ms/request, mean latency {statistics.mean(latencies) * 1000:6.1f} ms")
+
+
+async def back_to_back(base_url: str) -> None:
+    print(f"\n1. {BACK_TO_BACK} streamed responses back to back")
+    fresh: List[PoolStats] = []
+    latencies = []
+    for i in range(BACK_TO_BACK):
+        stats = PoolStats(f"fresh{i}", DEFAULT_CONNECTION_LIMITS.max_connections)
+        fresh.append(stats)
+        client = make_async_client(stats, DEFAULT_CONNECTION_LIMITS, base_url=base_url, api_key="fake")
+        latencies.append(await stream_once(client))
+        await client.close()
+    summary("new client per request", fresh, latencies, BACK_TO_BACK)
+
+    shared = PoolStats("shared", 100)
+    client = make_async_client(shared, base_url=base_url, api_key="fake")
+    latencies = [await stream_once(client) for _ in range(BACK_TO_BACK)]
+    await client.close()
+    summary("shared client", [shared], latencies, BACK_TO_BACK)
+
+
+async def conversation(base_url: str, turns: int, think_s: float) -> None:
+    print(f"\n2. {turns} turns of chat + patient chat + RAG search, {think_s:g} s apart")
+    before = {name: PoolStats(f"before_{name}", DEFAULT_CONNECTION_LIMITS.max_connections) for name in ("chat", "patient", "rag")}
+    chat = make_async_client(before["chat"], DEFAULT_CONNECTION_LIMITS, base_url=base_url, api_key="fake")
+    patient = make_async_client(before["patient"], DEFAULT_CONNECTION_LIMITS, base_url=base_url, api_key="fake")
+    rag = make_sync_client(before["rag"], DEFAULT_CONNECTION_LIMITS, base_url=base_url, api_key="fake")
+    latencies = await run_turns(chat, patient, rag, turns, think_s)
+    summary("per-module clients, 5 s keep-alive", list(before.values()), latencies, 3 * turns)
+
+    after = {"async": PoolStats("after_async", 100), "sync": PoolStats("after_sync", 100)}
+    shared = make_async_client(after["async"], base_url=base_url, api_key="fake")
+    rag = make_sync_client(after["sync"], base_url=base_url, api_key="fake")
+    latencies = await run_turns(shared, shared, rag, turns, think_s)
+    summary("shared clients, tuned pool", list(after.values()), latencies, 3 * turns)
+
+
+async def run_turns(chat, patient, rag, turns: int, think_s: float) -> List[float]:
+    latencies = []
+    for turn in range(turns):
+        if turn:
+            await asyncio.sleep(think_s)
+        latencies.append(await stream_once(chat))
+        latencies.append(await stream_once(patient))
+        latencies.append(await asyncio.to_thread(search_once, rag))
+    await chat.close()
+    await patient.close()
+    rag.close()
+    return latencies
+
+
+async def saturation(base_url: str) -> None:
+    print(f"\n3. {CONCURRENT} concurrent streams")
+    for max_connections in (8, 100):
+        stats = PoolStats(f"sat{max_connections}", max_connections)
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        client = make_async_client(stats, limits, base_url=base_url, api_key="fake")
+        start = time.perf_counter()
+        await asyncio.gather(*(stream_once(client) for _ in range(CONCURRENT)))
+        wall = time.perf_counter() - start
+        await client.close()
+        s = stats.stats()
+        print(f"  max_connections={max_connections:<4} wall {wall * 1000:6.0f} ms, peak in flight {s[f'{stats.pool}_peak_in_flight']}, "
+              f"saturated requests {s[f'{stats.pool}_saturated_requests']}, connects {stats.connections_opened}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--think-s", type=float, default=6.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = self_signed_cert(tmp)
+        # httpx trusts SSL_CERT_FILE for clients created from here on
+        os.environ["SSL_CERT_FILE"] = cert
+        script = {"FAKE_TTFT_MS": "5", "FAKE_DELTA_MS": "2", "FAKE_DELTAS": "10", "FAKE_SEARCH_MS": "5"}
+        # Hosted APIs hold idle connections far longer than uvicorn's default 5 s
+        with fake_openai(tls=(cert, key), keep_alive_s=300, **script) as base_url:
+            print(f"fake OpenAI at {base_url}, HTTP/2 {'on' if http2_enabled() else 'off (h2 not installed)'}")
+            asyncio.run(back_to_back(base_url))
+            asyncio.run(conversation(base_url, args.turns, args.think_s))
+            asyncio.run(saturation(base_url))
+
+
+if __name__ == "__main__":
+    main()
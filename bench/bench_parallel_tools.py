@@ -0,0 +1,68 @@
+"""
+Wall time of one model turn's function calls: sequential (old loop) vs.
+run_function_calls, using stubbed tools that just sleep.
+
+Checks that the concurrent wall time is close to the slowest call rather than
+the sum, that outputs keep call_id order, that the per-tool timeout fires, and
+that a tool that raises becomes an error output without losing its siblings.
+
+Run from the repo root:
+    python -m bench.bench_parallel_tools
+"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from api.utils.tool_runner import run_function_calls
+
+DELAYS_S = [0.30, 0.10, 0.50, 0.20, 0.40]
+
+
+def slow_tool(name: str, arguments: str) -> str:
+    delay = json.loads(arguments)["delay"]
+    time.sleep(delay)
+    return json.dumps({"slept": delay})
+
+
+def flaky_tool(name: str, arguments: str) -> str:
+    if json.loads(arguments)["delay"] < 0:
+        raise TypeError("'<' not supported between instances of 'str' and 'int'")
+    return slow_tool(name, arguments)
+
+
+def make_calls(delays):
+    return [SimpleNamespace(name="slow_tool", arguments=json.dumps({"delay": d}), call_id=f"call_{i}")
+            for i, d in enumerate(delays)]
+
+
+def main():
+    calls = make_calls(DELAYS_S)
+
+    start = time.perf_counter()
+    for call in calls:
+        slow_tool(call.name, call.arguments)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    outputs = asyncio.run(run_function_calls(calls, slow_tool))
+    concurrent = time.perf_counter() - start
+
+    print(f"sum of delays {sum(DELAYS_S):.2f}s, slowest {max(DELAYS_S):.2f}s")
+    print(f"sequential {sequential:.2f}s, concurrent {concurrent:.2f}s")
+    assert [o["call_id"] for o in outputs] == [c.call_id for c in calls], "outputs out of call order"
+    assert concurrent < max(DELAYS_S) + 0.15, "tool calls did not overlap"
+
+    outputs = asyncio.run(run_function_calls(make_calls([0.05, 1.0]), slow_tool, timeout=0.2))
+    print(f"timeout: {[json.loads(o['output']) for o in outputs]}")
+    assert "error" in json.loads(outputs[1]["output"])
+
+    outputs = asyncio.run(run_function_calls(make_calls([0.05, -1, 0.1]), flaky_tool))
+    results = [json.loads(o["output"]) for o in outputs]
+    print(f"raising tool: {results}")
+    assert [o["call_id"] for o in outputs] == ["call_0", "call_1", "call_2"], "outputs out of call order"
+    assert "error" in results[1] and results[0] == {"slept": 0.05} and results[2] == {"slept": 0.1}
+
+
+if __name__ == "__main__":
+    main()
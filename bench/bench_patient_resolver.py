@@ -0,0 +1,122 @@
+"""
+Patient lookup at 100k patients: PatientResolver (trigram / MRN / DOB index)
+vs. scanning the roster, and the prompt tokens each way of finding a patient
+adds to the conversation.
+
+Latency: index build time, then p50 / p95 per query for exact names, typos,
+partial names, MRNs and name + date of birth, against a linear scan that
+scores every name with the same trigram similarity.
+
+Tokens (estimate_tokens): the old get_patient_names result (whole roster),
+one page of the paginated get_patient_names, and one resolve_patient result.
+
+Run from the repo root:
+    python -m bench.bench_patient_resolver [--patients 100000] [--queries 200]
+"""
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List, Tuple
+
+from api.utils.patient_resolver import PatientResolver, normalize_name, trigrams
+from api.utils.serialization import dumps
+from api.utils.tokens import estimate_tokens
+from bench.synthetic import FIRST_NAMES, LAST_NAMES
+
+SURNAME_SUFFIXES = ["", "son", "ova", "ini", "berg", "wood", "ley", "ford", "man", "ez", "ton", "ski", "ard", "ell",
+                    "ing", "ham", "well", "by", "stein", "field", "more", "dale", "worth", "ley-Smith", "o"]
+
+
+def make_directory(n: int, seed: int = 0) -> List[Tuple[str, str, str, str]]:
+    """(patient_id, name, mrn, dob) rows; common names repeat, as on a real roster."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)[0]}. {rng.choice(LAST_NAMES)}{rng.choice(SURNAME_SUFFIXES)}"
+        dob = f"{rng.randint(1930, 2006)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        rows.append((f"p{i:07d}", name, f"SYN-{i:07d}", dob))
+    return rows
+
+
+def typo(name: str, rng: random.Random) -> str:
+    """Drop one letter of the surname."""
+    first, rest = name.split(" ", 1)
+    surname = rest.split(" ")[-1]
+    i = rng.randrange(1, len(surname))
+    return f"{first} {surname[:i] + surname[i + 1:]}"
+
+
+def make_queries(directory, n: int, seed: int = 1):
+    rng = random.Random(seed)
+    picks = [directory[rng.randrange(len(directory))] for _ in range(n)]
+    return {
+        "exact name": [name for _, name, _, _ in picks],
+        "typo": [typo(name, rng) for _, name, _, _ in picks],
+        "surname only": [name.split(" ")[-1] for _, name, _, _ in picks],
+        "MRN": [mrn.lower().replace("-", "") for _, _, mrn, _ in picks],
+        "name + DOB": [f"{name.split(' ')[0]} {name.split(' ')[-1]} {dob}" for _, name, _, dob in picks],
+    }, picks
+
+
+def linear_scan(directory, gram_sets) -> Callable[[str], List[Tuple[float, str]]]:
+    def resolve(query: str) -> List[Tuple[float, str]]:
+        wanted = set(trigrams(normalize_name(query)))
+        scored = []
+        for (patient_id, _, _, _), grams in zip(directory, gram_sets):
+            shared = len(wanted & grams)
+            if shared:
+                scored.append((shared / (len(wanted) + len(grams) - shared), patient_id))
+        scored.sort(reverse=True)
+        return scored[:5]
+    return resolve
+
+
+def timings(fn, queries) -> Tuple[float, float]:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = make_directory(args.patients)
+    start = time.perf_counter()
+    resolver = PatientResolver(directory)
+    print(f"{args.patients} patients: index built in {time.perf_counter() - start:.2f} s, {len(resolver.postings)} trigrams")
+
+    queries, picks = make_queries(directory, args.queries)
+    gram_sets = [set(trigrams(normalize_name(name))) for _, name, _, _ in directory]
+    scan = linear_scan(directory, gram_sets)
+
+    print(f"\n{'query (ms)':<14}{'index p50':>11}{'p95':>9}{'scan p50':>11}{'p95':>9}{'in top 5':>10}")
+    for kind, batch in queries.items():
+        index_p50, index_p95 = timings(resolver.resolve, batch)
+        scan_row = ("-", "-") if kind == "MRN" else tuple(f"{v:.2f}" for v in timings(scan, batch[:20]))
+        hits = sum(pick[0] in {m["patient_id"] for m in matches}
+                   for matches, pick in zip(map(resolver.resolve, batch), picks))
+        print(f"{kind:<14}{index_p50:>11.3f}{index_p95:>9.3f}{scan_row[0]:>11}{scan_row[1]:>9}"
+              f"{hits / len(batch):>10.0%}")
+    print("(scan timed on 20 queries; names without a DOB are shared by several patients on a 100k roster,\n"
+          " so the intended one is not always among the top 5 - get_patient_info then returns candidates)")
+
+    roster = [{"patient_id": patient_id, "name": name} for patient_id, name, _, _ in directory]
+    page = {"patients": roster[:50], "total": len(roster), "offset": 0, "next_offset": 50}
+    resolved = {"query": queries["typo"][0], "matches": resolver.resolve(queries["typo"][0])}
+    print("\nprompt tokens added by one tool result")
+    for label, result in (("get_patient_names, whole roster", roster),
+                          ("get_patient_names, one page of 50", page),
+                          ("resolve_patient", resolved)):
+        print(f"  {label:<36}{estimate_tokens(dumps(result)):>12,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Speculative record prefetch: model rounds and TTFT for /api/chat with the
+pre-dispatch patient lookup off vs. on, against bench.fake_openai.
+
+The fake model asks for get_patient_info on the first round of any
+conversation that has no tool output yet, like the real model does for a
+question about a patient, and answers once it has one. With prefetch on, a
+message naming exactly one patient already carries that output, so it is
+answered in the first round. Messages that name nobody, two patients, or a
+misspelled name still take two rounds.
+
+Run from the repo root:
+    python -m bench.bench_prefetch [--repeat 3] [--ttft-ms 300]
+"""
+import argparse
+import re
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from bench.servers import fake_openai, fake_stats, uvicorn_server
+
+MESSAGES = [
+    ("named", "Summarize Jordan Carter's plan"),
+    ("named", "What medications was Emily Chen started on?"),
+    ("named", "Any allergies for MRN JC-045872?"),
+    ("named", "tell me about rebecca martinez"),
+    ("named", "How was Michael Lee's blood pressure at the visit?"),
+    ("named", "Draft a follow-up note for Jessica Brown."),
+    ("not named", "Which patients have type 2 diabetes?"),
+    ("not named", "Help me get started"),
+    ("two patients", "Compare Emily Chen and Michael Lee"),
+    ("misspelled", "summarize jordn carter"),
+]
+TOOL_CALL = 'get_patient_info:{"patient_id": "jordan_carter", "view": "summary"}'
+
+
+def ask(url: str, base: str, text: str) -> Tuple[float, int]:
+    """(client-side TTFT in s, model rounds) for one chat request."""
+    before = fake_stats(base)["requests"]
+    start = time.perf_counter()
+    ttft = None
+    with httpx.stream("POST", f"{url}/api/chat", json={"messages": [{"role": "user", "content": text}]}, timeout=60) as r:
+        for line in r.iter_lines():
+            if ttft is None and line.startswith("0:"):
+                ttft = time.perf_counter() - start
+    return ttft, fake_stats(base)["requests"] - before
+
+
+def prefetch_counts(url: str) -> Dict[str, float]:
+    text = httpx.get(f"{url}/api/metrics").text
+    return {m.group(1): float(m.group(2)) for m in
+            re.finditer(r'^chat_prefetch_total\{endpoint="chat",result="(\w+)"\} (\S+)$', text, re.M)}
+
+
+def run(base: str, enabled: bool, repeat: int) -> Dict[str, List[Tuple[float, int]]]:
+    env = {"OPENAI_BASE_URL": base, "OPENAI_API_KEY": "fake", "RESPONSE_CACHE_MAX_ENTRIES": "0",
+           "PREFETCH_ENABLED": "1" if enabled else "0"}
+    results: Dict[str, List[Tuple[float, int]]] = {}
+    with uvicorn_server("api.index:app", env=env) as url:
+        ask(url, base, "warm up")  # the first request in a fresh worker pays for lazy imports
+        for _ in range(repeat):
+            for kind, text in MESSAGES:
+                results.setdefault(kind, []).append(ask(url, base, text))
+        if enabled:
+            print(f"  prefetch outcomes: {prefetch_counts(url)}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ttft-ms", default="300")
+    args = parser.parse_args()
+
+    script = {"FAKE_TTFT_MS": args.ttft_ms, "FAKE_DELTA_MS": "5", "FAKE_DELTAS": "40", "FAKE_TOOL_CALLS": TOOL_CALL}
+    with fake_openai(**script) as base:
+        print(f"fake model: {args.ttft_ms} ms to first event, tool call on round 1 unless a tool output is present")
+        off = run(base, False, args.repeat)
+        on = run(base, True, args.repeat)
+
+    print(f"\n{'message':<14}{'requests':>9}{'one round, off':>16}{'on':>6}{'TTFT p50 off':>14}{'on':>8}")
+    for kind in off:
+        single_off = sum(rounds == 1 for _, rounds in off[kind])
+        single_on = sum(rounds == 1 for _, rounds in on[kind])
+        ttft_off = statistics.median(t for t, _ in off[kind]) * 1000
+        ttft_on = statistics.median(t for t, _ in on[kind]) * 1000
+        print(f"{kind:<14}{len(off[kind]):>9}{single_off:>16}{single_on:>6}{ttft_off:>12.0f}ms{ttft_on:>6.0f}ms")
+
+    total = sum(len(v) for v in on.values())
+    avoided = sum(rounds == 1 for v in on.values() for _, rounds in v) - sum(rounds == 1 for v in off.values() for _, rounds in v)
+    all_off = statistics.mean(t for v in off.values() for t, _ in v) * 1000
+    all_on = statistics.mean(t for v in on.values() for t, _ in v) * 1000
+    print(f"\nsecond model round avoided on {avoided} of {total} requests ({avoided / total:.0%}); "
+          f"mean TTFT {all_off:.0f} -> {all_on:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Prompt tokens added by one get_patient_info tool result: the full record vs.
+the projection a model would request for typical doctor questions.
+
+Tokens are estimated with api.utils.tokens.estimate_tokens (~4 chars/token).
+Each result is re-sent on every later round of the stream_text loop, so the
+savings add up once per remaining model call.
+
+Run from the repo root:
+    python -m bench.bench_projection_tokens
+"""
+import json
+
+from api.utils.projection import project_patient_record
+from api.utils.record_store import get_record_store
+from api.utils.tokens import estimate_tokens
+
+QUESTIONS = [
+    ("Give me an overview of {name}", {"view": "summary"}),
+    ("What medications was {name} started on?", {"view": "meds"}),
+    ("What did {name} say about symptoms in the first two minutes?",
+     {"view": "transcript_window", "transcript_start": "00:00", "transcript_end": "02:00"}),
+    ("What were {name}'s vitals?", {"fields": ["patient", "vitals"]}),
+    ("Summarize {name}'s plan", {"fields": ["patient", "plan"]}),
+    ("Everything except the transcript for {name}", {"exclude": ["transcript"]}),
+]
+
+
+def main():
+    patient_scribes = get_record_store().patient_scribes()
+    print(f"{'question':<62} {'full tok':>9} {'projected':>10} {'saved':>6}")
+    total_full = total_projected = 0
+    for template, args in QUESTIONS:
+        full = projected = 0
+        for record in patient_scribes.values():
+            full += estimate_tokens(json.dumps(record))
+            projected += estimate_tokens(json.dumps(project_patient_record(record, **args)))
+        n = len(patient_scribes)
+        total_full += full
+        total_projected += projected
+        print(f"{template.format(name='<patient>'):<62} {full // n:>9} {projected // n:>10} {1 - projected / full:>6.0%}")
+    print(f"{'average over all questions':<62} {'':>9} {'':>10} {1 - total_projected / total_full:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Structured patient filtering: PatientQueryIndex vs. a linear scan over every
+record, at 100k synthetic patients.
+
+Run from the repo root:
+    python -m bench.bench_query_patients [--records 100000]
+"""
+import argparse
+import time
+
+from api.utils.patient_query import PatientQueryIndex, medication_changes, normalize_sex
+from bench.synthetic import iter_records
+
+QUERIES = [
+    {"age": (60, 70), "sex": "F", "icd10": ["E11.9"]},
+    {"medication": "losartan", "medication_action": "start"},
+    {"sex": "M", "specialty": "Family Medicine", "age": (40, 50)},
+    {"icd10": ["F33.9"], "age": (18, 30)},
+]
+
+
+def linear_scan(patient_scribes, age=None, sex=None, icd10=None, medication=None,
+                medication_action="any", specialty=None):
+    matches = []
+    for patient_id, record in patient_scribes.items():
+        patient = record.get("patient") or {}
+        if age and not (age[0] <= patient.get("age", -1) <= age[1]):
+            continue
+        if sex and normalize_sex(patient.get("sex", "")) != normalize_sex(sex):
+            continue
+        codes = {a.get("icd10") for a in record.get("assessment") or []}
+        if icd10 and not all(code in codes for code in icd10):
+            continue
+        if medication and not any(d == medication and (medication_action == "any" or a == medication_action)
+                                  for a, d in medication_changes(record)):
+            continue
+        if specialty and (record.get("provider") or {}).get("specialty") != specialty:
+            continue
+        matches.append(patient_id)
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+
+    patient_scribes = dict(iter_records(args.records, transcript_turns=0))
+    start = time.perf_counter()
+    index = PatientQueryIndex(patient_scribes)
+    print(f"{args.records} records, index build {time.perf_counter() - start:.2f}s")
+
+    print(f"{'query':<70} {'matches':>8} {'scan ms':>9} {'index ms':>9}")
+    for query in QUERIES:
+        start = time.perf_counter()
+        scanned = linear_scan(patient_scribes, **query)
+        scan_ms = (time.perf_counter() - start) * 1e3
+
+        start = time.perf_counter()
+        result = index.query(**query, limit=len(patient_scribes))
+        index_ms = (time.perf_counter() - start) * 1e3
+
+        assert result["count"] == len(scanned), (query, result["count"], len(scanned))
+        print(f"{str(query):<70} {result['count']:>8} {scan_ms:>9.1f} {index_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
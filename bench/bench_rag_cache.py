@@ -0,0 +1,152 @@
+"""
+search_records_RAG query cache on a replayed synthetic query log: hit rate,
+p50/p95 search latency, and how many of the patients an uncached search
+would return a cached answer also has, with the cache off, exact
+(normalized key) and exact plus the near-duplicate tier.
+
+The log draws topics from a Zipf-like distribution and phrases each one in
+the ways doctors on a shift do ("patients with depression", "Patients with
+depression?", "find patients with  depression", "depression patients"), with
+a few misspellings and negations mixed in. An intake is appended to the
+journal every --write-every queries, which moves the index version and
+invalidates the cache.
+
+The searches run against the local index over a synthetic corpus;
+--hosted-ms adds a fixed round trip per uncached search to approximate the
+hosted vector store. The synthetic corpus clones a few seed records, so many
+chunks tie and rewording a query reshuffles which tied patients make the top
+k; patient overlap measures that reshuffle, not stale results.
+
+Run from the repo root:
+    python -m bench.bench_rag_cache [--records 2000] [--queries 1500] [--hosted-ms 0]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from api.utils.intake_journal import IntakeJournal
+from api.utils.rag_cache import RagQueryCache
+from api.utils.record_store import PatientRecordStore
+from api.utils.retrieval import RAG_TOP_K, LocalRecordIndexBackend, RetrievalBackend
+from bench.synthetic import write_dataset
+
+TOPICS = [
+    "depression", "type 2 diabetes", "hypertension", "asthma", "chest pain", "anxiety", "migraine",
+    "atrial fibrillation", "COPD", "chronic kidney disease", "hypothyroidism", "back pain", "insomnia",
+    "metformin", "lisinopril", "statin therapy", "shortness of breath", "obesity", "GERD", "osteoarthritis",
+]
+PHRASINGS = [
+    "patients with {}", "Patients with {}?", "find patients with  {}", "{} patients", "who has {}",
+    "Any patients with {} ?", "show me patients with {}", "list all patients with {}",
+]
+
+
+def misspell(rng: random.Random, topic: str) -> str:
+    i = rng.randrange(1, len(topic) - 1)
+    return topic[:i] + topic[i + 1:]
+
+
+def query_log(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(TOPICS))]
+    log = []
+    for _ in range(n):
+        topic = rng.choices(TOPICS, weights)[0]
+        roll = rng.random()
+        if roll < 0.05:
+            topic = misspell(rng, topic)
+        elif roll < 0.08:
+            topic = f"no {topic}"
+        log.append(rng.choice(PHRASINGS).format(topic))
+    return log
+
+
+class HostedLatency(RetrievalBackend):
+    """A backend that waits a fixed round trip before each search, like the hosted store."""
+
+    def __init__(self, backend: RetrievalBackend, seconds: float):
+        self.backend = backend
+        self.seconds = seconds
+        self.name = backend.name
+
+    def search(self, query: str, k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
+        time.sleep(self.seconds)
+        return self.backend.search(query, k)
+
+    def index_version(self) -> Any:
+        return self.backend.index_version()
+
+
+def patient_overlap(cached: List[Dict[str, Any]], fresh: List[Dict[str, Any]]) -> float:
+    """Share of the patients in an uncached search's results that the cached results also have."""
+    fresh_ids = {r["metadata"].get("patient_id") for r in fresh}
+    if not fresh_ids:
+        return 1.0
+    return len(fresh_ids & {r["metadata"].get("patient_id") for r in cached}) / len(fresh_ids)
+
+
+def replay(log: List[str], backend: RetrievalBackend, local: LocalRecordIndexBackend, journal: IntakeJournal,
+           cache: RagQueryCache, write_every: int) -> Dict[str, Any]:
+    latencies, overlaps = [], []
+    for i, query in enumerate(log):
+        if write_every and i and i % write_every == 0:
+            journal.append(f"intake_{i}", {"patient_info": {"name": f"Walk In {i}", "age": 40, "sex": "F"},
+                                           "chief_complaint": "follow-up", "symptoms": ["fatigue"]})
+            journal.flush()
+        before = cache.hits + cache.near_hits
+        start = time.perf_counter()
+        results = cache.search(query, backend=backend)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if cache.hits + cache.near_hits > before:
+            overlaps.append(patient_overlap(results, local.search(query)))
+    stats = cache.stats()
+    return {
+        "hit_rate": stats["hit_rate"],
+        "near_hits": stats["near_hits"],
+        "stale": stats["stale"],
+        "p50": np.percentile(latencies, 50),
+        "p95": np.percentile(latencies, 95),
+        "overlap": statistics.mean(overlaps) if overlaps else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=1500)
+    parser.add_argument("--write-every", type=int, default=250)
+    parser.add_argument("--similarity", type=float, default=0.85)
+    parser.add_argument("--hosted-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    log = query_log(args.queries)
+    configs = [
+        ("off", RagQueryCache(max_entries=0)),
+        ("exact", RagQueryCache(similarity=0)),
+        (f"exact + near >= {args.similarity}", RagQueryCache(similarity=args.similarity)),
+    ]
+    print(f"{args.records} records, {len(log)} queries ({len(set(log))} distinct strings), "
+          f"an intake every {args.write_every} queries, hosted round trip {args.hosted_ms:.0f} ms")
+    print(f"\n{'cache':<22}{'hit rate':>9}{'near':>6}{'stale':>6}{'p50 ms':>8}{'p95 ms':>8}{'patient overlap':>17}")
+    for label, cache in configs:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_dataset(os.path.join(tmp, "patient_records.json"), args.records)
+            journal_path = os.path.join(tmp, "intake_journal.jsonl")
+            journal = IntakeJournal(journal_path, snapshot_path=path, compact_every=0)
+            local = LocalRecordIndexBackend(PatientRecordStore(path, journal_path))
+            local.search("warm up")
+            backend = HostedLatency(local, args.hosted_ms / 1000) if args.hosted_ms else local
+            r = replay(log, backend, local, journal, cache, args.write_every)
+        overlap = "-" if r["overlap"] is None else f"{r['overlap']:.0%}"
+        print(f"{label:<22}{r['hit_rate']:>9.0%}{r['near_hits']:>6}{r['stale']:>6}"
+              f"{r['p50']:>8.2f}{r['p95']:>8.2f}{overlap:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Per-call latency of get_patient_info-style lookups: re-parsing patient_records.json
+on every call (the old _load_patient_records path) vs. the cached PatientRecordStore.
+
+Run from the repo root:
+    python -m bench.bench_record_store
+"""
+import json
+import os
+import tempfile
+import time
+
+from api.utils.record_store import PatientRecordStore
+from bench.synthetic import file_size_mb, write_dataset
+
+
+def legacy_lookup(path: str, patient_id: str):
+    with open(path, "r") as f:
+        return json.load(f).get("patient_scribes", {}).get(patient_id)
+
+
+def time_per_call(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'records':>8} {'file MB':>8} {'legacy ms/call':>15} {'store ms/call':>14} {'speedup':>9}")
+        for n in (5, 5_000, 50_000):
+            path = write_dataset(os.path.join(tmp, f"records_{n}.json"), n)
+            store = PatientRecordStore(path)
+            patient_id = next(iter(store.patient_scribes()))
+
+            legacy_calls = 200 if n <= 5 else 10 if n <= 5_000 else 3
+            legacy = time_per_call(lambda: legacy_lookup(path, patient_id), legacy_calls)
+            cached = time_per_call(lambda: store.patient_scribes().get(patient_id), 10_000)
+
+            print(f"{n:>8} {file_size_mb(path):>8.1f} {legacy * 1e3:>15.3f} {cached * 1e3:>14.4f} {legacy / cached:>8.0f}x")
+            print(f"         store stats: {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
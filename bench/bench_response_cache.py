@@ -0,0 +1,67 @@
+"""
+Response-cache hit rate and time-to-first-token saved on a replayed workload of
+doctor questions, against bench.fake_openai.
+
+Requests run one at a time so each can be classified as a hit (the fake server
+saw no new upstream request) or a miss.
+
+Run from the repo root:
+    python -m bench.bench_response_cache [--requests 60]
+"""
+import argparse
+import random
+import statistics
+import time
+
+import httpx
+
+from bench.servers import fake_openai, fake_stats, uvicorn_server
+
+COMMON_QUESTIONS = [
+    "list patients",
+    "List patients",
+    "help me get started",
+    "which patients have diabetes?",
+    "summarize Jordan Carter's plan",
+]
+
+
+def ttft(client: httpx.Client, url: str, question: str) -> float:
+    """Time to the first text frame; the stream is still read to the end so the answer gets cached."""
+    start = time.perf_counter()
+    first = None
+    body = {"messages": [{"role": "user", "content": question}]}
+    with client.stream("POST", f"{url}/api/chat", json=body) as response:
+        for line in response.iter_lines():
+            if first is None and line.startswith("0:"):
+                first = time.perf_counter() - start
+    return first if first is not None else time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=60)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    workload = [
+        rng.choice(COMMON_QUESTIONS) if rng.random() < 0.7 else f"unique question {i}"
+        for i in range(args.requests)
+    ]
+
+    hits, misses = [], []
+    with fake_openai(FAKE_TTFT_MS="400", FAKE_DELTA_MS="5", FAKE_DELTAS="30") as base_url:
+        with uvicorn_server("api.index:app", env={"OPENAI_BASE_URL": base_url, "OPENAI_API_KEY": "fake"}) as url:
+            with httpx.Client(timeout=60) as client:
+                for question in workload:
+                    before = fake_stats(base_url)["requests"]
+                    latency = ttft(client, url, question)
+                    (misses if fake_stats(base_url)["requests"] > before else hits).append(latency)
+
+    print(f"requests {len(workload)}, hits {len(hits)}, misses {len(misses)}, hit rate {len(hits) / len(workload):.0%}")
+    print(f"TTFT miss p50 {statistics.median(misses) * 1e3:.0f} ms, hit p50 {statistics.median(hits) * 1e3:.1f} ms")
+    print(f"TTFT saved in total: {sum(misses) / len(misses) * len(hits) - sum(hits):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
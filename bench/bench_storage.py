@@ -0,0 +1,153 @@
+"""
+Storage backends: correctness checks plus lookup / insert throughput.
+
+Builds a synthetic patient_records.json with N encounters and loads it into each
+backend: JSON file + intake journal, SQLite, and PostgreSQL when DATABASE_URL
+is set. For each backend it first checks behaviour and fails on the first
+mismatch:
+  - get_record / get_record_by_mrn return the source record, unknown keys return None,
+  - patient_names covers every encounter,
+  - insert_intake is readable through get_intake and bumps data_version,
+  - (SQL) a batch insert that fails on its last row leaves no rows behind.
+It then measures lookups/s by patient_id and MRN from 1 and 8 threads, plus
+single-row and batched intake inserts/s.
+
+Run from the repo root:
+    python -m bench.bench_storage [--records 20000]
+    DATABASE_URL=postgresql://... python -m bench.bench_storage
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from api.utils.intake_journal import IntakeJournal
+from api.utils.record_store import PatientRecordStore
+from api.utils.storage import DATABASE_URL, JsonFileStorage, PostgresStorage, RecordStorage, SQLiteStorage
+from bench.synthetic import file_size_mb, write_dataset
+
+LOOKUPS = 20_000
+INSERTS = 500
+BATCH = 100
+
+
+def intake(patient_id: str) -> dict:
+    return {
+        "timestamp": "2025-10-21T21:57:47",
+        "patient_info": {"name": patient_id, "age": 40, "sex": "F"},
+        "chief_complaint": "Headache",
+        "symptoms": ["headache"],
+        "status": "pending_review",
+    }
+
+
+def check(storage: RecordStorage, source: Dict[str, dict]) -> None:
+    rng = random.Random(1)
+    for patient_id in rng.sample(list(source), 50):
+        record = source[patient_id]
+        assert storage.get_record(patient_id) == record, f"{storage.name}: get_record({patient_id})"
+        found = storage.get_record_by_mrn(record["patient"]["mrn"])
+        assert found is not None and found[1]["patient"]["mrn"] == record["patient"]["mrn"], f"{storage.name}: mrn lookup"
+    assert storage.get_record("no_such_patient") is None
+    assert storage.get_record_by_mrn("MRN-DOES-NOT-EXIST") is None
+    names = storage.patient_names()
+    assert {n["patient_id"] for n in names} == set(source), f"{storage.name}: patient_names"
+
+    before = storage.data_version()
+    storage.insert_intake("check_patient", intake("check_patient"))
+    assert storage.get_intake("check_patient") == intake("check_patient"), f"{storage.name}: get_intake"
+    assert storage.data_version() != before, f"{storage.name}: data_version did not change"
+
+    if not isinstance(storage, JsonFileStorage):
+        version = storage.data_version()
+        batch = [(f"rollback_{i}", intake(f"rollback_{i}")) for i in range(5)] + [(None, intake("bad"))]
+        try:
+            storage.insert_intakes(batch)
+        except Exception:
+            pass
+        else:
+            raise AssertionError(f"{storage.name}: NULL patient_id was accepted")
+        assert storage.get_intake("rollback_0") is None, f"{storage.name}: partial batch was committed"
+        assert storage.data_version() == version, f"{storage.name}: data_version moved after rollback"
+
+
+def rate(fn: Callable[[int], None], n: int, threads: int = 1) -> float:
+    per_thread = n // threads
+
+    def work(offset: int):
+        for i in range(per_thread):
+            fn(offset + i)
+
+    workers = [threading.Thread(target=work, args=(t * per_thread,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def measure(storage: RecordStorage, source: Dict[str, dict]) -> Dict[str, float]:
+    rng = random.Random(2)
+    ids = [rng.choice(list(source)) for _ in range(LOOKUPS)]
+    mrns = [source[pid]["patient"]["mrn"] for pid in ids]
+    tag = f"{storage.name}_{time.time_ns()}"
+    return {
+        "id lookups/s": rate(lambda i: storage.get_record(ids[i]), LOOKUPS),
+        "id lookups/s x8": rate(lambda i: storage.get_record(ids[i]), LOOKUPS, threads=8),
+        "mrn lookups/s": rate(lambda i: storage.get_record_by_mrn(mrns[i]), LOOKUPS),
+        "inserts/s": rate(lambda i: storage.insert_intake(f"{tag}_{i}", intake("x")), INSERTS),
+        "inserts/s x8": rate(lambda i: storage.insert_intake(f"{tag}_t{i}", intake("x")), INSERTS, threads=8),
+        "batched inserts/s": rate(
+            lambda i: storage.insert_intakes((f"{tag}_b{i}_{j}", intake("x")) for j in range(BATCH)), INSERTS // BATCH
+        ) * BATCH,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        records_path = write_dataset(os.path.join(tmp, "patient_records.json"), args.records)
+        with open(records_path) as f:
+            source = json.load(f)["patient_scribes"]
+        print(f"{len(source)} encounters, {file_size_mb(records_path):.0f} MB JSON")
+
+        journal_path = os.path.join(tmp, "patient_intakes.jsonl")
+        factories = {
+            "json": lambda: JsonFileStorage(
+                PatientRecordStore(records_path, journal_path),
+                IntakeJournal(journal_path, records_path, compact_every=0),
+            ),
+            "sqlite": lambda: SQLiteStorage(os.path.join(tmp, "records.sqlite3"), seed_path=records_path),
+        }
+        if DATABASE_URL:
+            factories["postgres"] = lambda: PostgresStorage(DATABASE_URL, seed_path=records_path)
+        else:
+            print("DATABASE_URL not set: skipping PostgreSQL")
+
+        results: Dict[str, Dict[str, float]] = {}
+        for name, factory in factories.items():
+            start = time.perf_counter()
+            storage = factory()
+            storage.get_record(next(iter(source)))
+            open_s = time.perf_counter() - start
+            check(storage, source)
+            results[name] = {"open/seed s": open_s, **measure(storage, source)}
+            storage.close()
+            print(f"{name}: checks passed")
+
+    metrics: List[str] = list(next(iter(results.values())))
+    print(f"\n{'':<20}" + "".join(f"{name:>12}" for name in results))
+    for metric in metrics:
+        print(f"{metric:<20}" + "".join(f"{results[name][metric]:>12,.1f}" for name in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Data stream protocol framing: compatibility check and frames/s microbenchmark.
+
+Compatibility (fails on the first mismatch):
+  - text_frame / finish_frame produce exactly f'0:{json.dumps(x)}\\n' and
+    f'e:{json.dumps(x)}\\n' for a corpus of awkward deltas (quotes, backslashes,
+    control characters, non-ASCII, emoji, empty),
+  - merge_text_frames output decodes to the same text, frame by frame valid JSON,
+  - /api/chat against bench.fake_openai with the stream writer's coalescing off
+    returns the exact bytes the old per-delta code produced; with it on, the
+    same text and the same e: frame in fewer 0: frames.
+
+Speed: frames/s for the old f-string + json.dumps vs. text_frame, and tool
+output encoding (json.dumps vs. serialization.dumps) on a full record.
+
+Run from the repo root:
+    python -m bench.bench_stream_frames
+"""
+import json
+import time
+
+import httpx
+
+from api.utils import serialization
+from api.utils.record_store import get_record_store
+from api.utils.serialization import dumps, finish_frame, text_frame
+from api.utils.stream_writer import merge_text_frames
+from bench.servers import fake_openai, uvicorn_server
+
+CORPUS = [
+    "hello", " world", "", "\"quoted\"", "back\\slash", "line\nbreak\ttab\r", "\x00\x1f\x7f",
+    "café", "naïve – dash", "患者", "emoji 🩺💊", "  ", "</script>", "{\"json\": [1, 2]}",
+]
+FAKE_DELTAS = 60
+
+
+def check_frames():
+    for delta in CORPUS:
+        assert text_frame(delta) == f'0:{json.dumps(delta)}\n', repr(delta)
+    for payload in ({"finishReason": "stop", "usage": {"promptTokens": 1, "completionTokens": None}, "isContinued": False},
+                    {"finishReason": "error", "message": "bad \"thing\" – ünïcode"}):
+        assert finish_frame(payload) == f'e:{json.dumps(payload)}\n'
+
+    frames = merge_text_frames([text_frame(d) for d in CORPUS * 5])
+    for frame in frames:
+        assert frame.startswith("0:") and frame.endswith("\n") and frame.count("\n") == 1
+    assert "".join(json.loads(f[2:]) for f in frames) == "".join(CORPUS * 5)
+    print(f"framing: {len(CORPUS)} awkward deltas byte-identical; merged {len(CORPUS) * 5} deltas -> {len(frames)} valid frames")
+
+
+def chat_body(coalesce_ms: str) -> str:
+    with fake_openai(FAKE_TTFT_MS="20", FAKE_DELTA_MS="2", FAKE_DELTAS=str(FAKE_DELTAS)) as base:
+        env = {"OPENAI_BASE_URL": base, "OPENAI_API_KEY": "fake", "STREAM_COALESCE_MS": coalesce_ms,
+               "RESPONSE_CACHE_MAX_ENTRIES": "0"}
+        if coalesce_ms == "0":
+            env.update(STREAM_COALESCE_BYTES="0")
+        with uvicorn_server("api.index:app", env=env) as url:
+            r = httpx.post(f"{url}/api/chat", json={"messages": [{"role": "user", "content": "hi"}]}, timeout=60)
+            r.raise_for_status()
+            return r.text
+
+
+def check_endpoint():
+    tail = {"finishReason": "stop", "usage": {"promptTokens": 100, "completionTokens": FAKE_DELTAS}, "isContinued": False}
+    expected = "".join(f'0:{json.dumps(f"tok{i} ")}\n' for i in range(FAKE_DELTAS)) + f'e:{json.dumps(tail)}\n'
+
+    unbatched = chat_body("0")
+    assert unbatched == expected, "per-delta stream differs from the old protocol bytes"
+
+    batched = chat_body("16")
+    lines = batched.splitlines(keepends=True)
+    text_lines = [l for l in lines if l.startswith("0:")]
+    assert lines[-1] == f'e:{json.dumps(tail)}\n'
+    assert "".join(json.loads(l[2:]) for l in text_lines) == "".join(f"tok{i} " for i in range(FAKE_DELTAS))
+    print(f"/api/chat: coalescing off byte-identical to the old stream; coalescing 16 ms: "
+          f"{FAKE_DELTAS} deltas -> {len(text_lines)} frames, same text and e: frame")
+
+
+def per_second(fn, items, repeat=20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return repeat * len(items) / (time.perf_counter() - start)
+
+
+def bench():
+    deltas = [f"tok{i} " for i in range(1000)] + CORPUS
+    old = per_second(lambda d: f'0:{json.dumps(d)}\n', deltas)
+    new = per_second(text_frame, deltas)
+    print(f"\nframe encoding: json.dumps f-string {old / 1e6:.2f} M frames/s, text_frame {new / 1e6:.2f} M frames/s ({new / old:.1f}x)")
+
+    record = get_record_store().patient_scribes()["jordan_carter"]
+    old_tool = per_second(json.dumps, [record], repeat=2000)
+    new_tool = per_second(dumps, [record], repeat=2000)
+    backend = "orjson" if serialization.orjson is not None else "stdlib json"
+    print(f"tool output (full record): json.dumps {1e6 / old_tool:.1f} us, dumps [{backend}] {1e6 / new_tool:.1f} us")
+
+
+def main():
+    check_frames()
+    check_endpoint()
+    bench()
+
+
+if __name__ == "__main__":
+    main()
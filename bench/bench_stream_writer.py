@@ -0,0 +1,222 @@
+"""
+StreamWriter: behaviour checks with slow and disconnecting clients, plus
+frames / bytes / upstream tokens saved against bench.fake_openai.
+
+In-process checks (fail on the first mismatch):
+  - merge_text_frames joins adjacent 0: frames to the same text,
+  - a fast client gets every frame, the first one at once, in fewer writes,
+  - a delta buffered just before upstream pauses is written within the
+    coalescing window, not when upstream resumes,
+  - a slow client gets fewer, larger writes, and upstream is held once
+    max_buffer_bytes are waiting,
+  - a client that goes away (generator closed or task cancelled) closes the
+    upstream generator promptly.
+
+End to end (/api/chat through uvicorn, fake OpenAI streaming tokens):
+  - frames produced vs. writes and bytes sent, writer off (per frame) vs. on,
+    for a normal and a slow reader, from /api/metrics,
+  - a client that disconnects after a few frames: how many of the scripted
+    upstream tokens were still generated, and how fast upstream was closed.
+
+Run from the repo root:
+    python -m bench.bench_stream_writer
+"""
+import asyncio
+import json
+import re
+import time
+from typing import Dict, List
+
+import httpx
+
+from api.utils.serialization import text_frame
+from api.utils.stream_writer import StreamWriter, merge_text_frames
+from bench.servers import fake_openai, fake_stats, uvicorn_server
+
+E2E_DELTAS = 300
+E2E_DELTA_MS = 2
+DISCONNECT_DELTAS = 1000
+DISCONNECT_DELTA_MS = 10
+
+
+async def frames_every(n: int, interval_s: float, state: Dict[str, float], pause_after: int = -1, pause_s: float = 0.0):
+    state["produced"] = 0
+    try:
+        for i in range(n):
+            state["produced"] = i + 1
+            yield text_frame(f"tok{i} ")
+            if i == pause_after:
+                await asyncio.sleep(pause_s)
+            elif interval_s:
+                await asyncio.sleep(interval_s)
+        yield 'e:{"finishReason": "stop"}\n'
+    finally:
+        state["closed_at"] = time.perf_counter()
+
+
+def text_of(chunks: List[str]) -> str:
+    lines = "".join(chunks).splitlines(keepends=True)
+    return "".join(json.loads(l[2:]) for l in lines if l.startswith("0:"))
+
+
+def expected_text(n: int) -> str:
+    return "".join(f"tok{i} " for i in range(n))
+
+
+async def check_fast_client():
+    state: Dict[str, float] = {}
+    writer = StreamWriter(frames_every(200, 0.001, state), endpoint="bench")
+    start = time.perf_counter()
+    chunks, first_at = [], None
+    async for chunk in writer:
+        first_at = first_at or time.perf_counter() - start
+        chunks.append(chunk)
+    assert text_of(chunks) == expected_text(200)
+    assert chunks[-1].endswith('e:{"finishReason": "stop"}\n')
+    assert first_at < 0.005, f"first frame held back {first_at * 1000:.1f} ms"
+    assert writer.writes < writer.frames_in / 4, (writer.writes, writer.frames_in)
+    print(f"fast client: {writer.frames_in} frames -> {writer.writes} writes, first after {first_at * 1000:.2f} ms")
+
+
+async def check_flush_on_pause():
+    state: Dict[str, float] = {}
+    writer = StreamWriter(frames_every(3, 0.0005, state, pause_after=1, pause_s=0.3), endpoint="bench", coalesce_ms=16)
+    start = time.perf_counter()
+    arrivals = []
+    async for chunk in writer:
+        arrivals.append((time.perf_counter() - start, chunk))
+    # tok0 at once; tok1 arrives ~0.5 ms later and must go out on the timer, long before tok2 (~300 ms)
+    assert arrivals[1][1] == text_frame("tok1 ") and arrivals[1][0] < 0.1, arrivals
+    print(f"pause: buffered delta written after {arrivals[1][0] * 1000:.1f} ms while upstream paused 300 ms")
+
+
+async def check_slow_client():
+    state: Dict[str, float] = {}
+    writer = StreamWriter(frames_every(400, 0, state), endpoint="bench", max_buffer_bytes=1024)
+    chunks, held = [], []
+    async for chunk in writer:
+        chunks.append(chunk)
+        await asyncio.sleep(0.05)  # the send to a slow client
+        held.append(writer._pending_bytes)
+    assert text_of(chunks) == expected_text(400)
+    # Upstream reaches the limit while the client is busy, and runs at most one frame past it
+    assert 1024 <= max(held) < 1024 + 32, max(held)
+    sizes = sorted(len(c) for c in chunks)
+    print(f"slow client: {writer.frames_in} frames -> {writer.writes} writes "
+          f"(median {sizes[len(sizes) // 2]} B), buffer peaked at {max(held)} B (limit 1024)")
+
+
+async def upstream_closed(state: Dict[str, float], timeout_s: float = 1.0) -> None:
+    deadline = time.perf_counter() + timeout_s
+    while "closed_at" not in state and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+
+
+async def check_disconnect():
+    # The server closes the response generator
+    state: Dict[str, float] = {}
+    writer = StreamWriter(frames_every(1000, 0.002, state), endpoint="bench")
+    body = writer.__aiter__()
+    for _ in range(3):
+        await body.__anext__()
+    closed_at = time.perf_counter()
+    await body.aclose()
+    await upstream_closed(state)
+    assert "closed_at" in state and writer.disconnected
+    close_ms = (state["closed_at"] - closed_at) * 1000
+    assert state["produced"] < 100, state
+
+    # The server cancels the task sending the response (Starlette on http.disconnect)
+    state2: Dict[str, float] = {}
+    writer2 = StreamWriter(frames_every(1000, 0.002, state2), endpoint="bench")
+
+    async def send_all():
+        async for _ in writer2:
+            pass
+
+    task = asyncio.ensure_future(send_all())
+    await asyncio.sleep(0.02)
+    cancelled_at = time.perf_counter()
+    task.cancel()
+    await upstream_closed(state2)
+    assert "closed_at" in state2 and writer2.disconnected
+    cancel_ms = (state2["closed_at"] - cancelled_at) * 1000
+    print(f"disconnect: upstream closed {close_ms:.1f} ms after aclose(), {cancel_ms:.1f} ms after cancel; "
+          f"{state['produced']:.0f} and {state2['produced']:.0f} of 1000 frames produced")
+
+
+def metric(text: str, name: str) -> float:
+    match = re.search(rf'^{name}{{endpoint="chat"}} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def run_chat(url: str, read_delay_s: float) -> str:
+    body = []
+    with httpx.stream("POST", f"{url}/api/chat", json={"messages": [{"role": "user", "content": f"hi {time.time_ns()}"}]},
+                      timeout=60) as r:
+        for chunk in r.iter_text():
+            body.append(chunk)
+            if read_delay_s:
+                time.sleep(read_delay_s)
+    return "".join(body)
+
+
+def end_to_end():
+    print(f"\n/api/chat, {E2E_DELTAS} upstream deltas every {E2E_DELTA_MS} ms")
+    print(f"{'':<40}{'frames':>8}{'writes':>8}{'bytes':>8}")
+    with fake_openai(FAKE_TTFT_MS="20", FAKE_DELTA_MS=str(E2E_DELTA_MS), FAKE_DELTAS=str(E2E_DELTAS)) as base:
+        for label, env in (
+            ("per frame", {"STREAM_COALESCE_MS": "0", "STREAM_COALESCE_BYTES": "0"}),
+            ("coalesced (16 ms / 512 B)", {}),
+        ):
+            env = {"OPENAI_BASE_URL": base, "OPENAI_API_KEY": "fake", "RESPONSE_CACHE_MAX_ENTRIES": "0", **env}
+            with uvicorn_server("api.index:app", env=env) as url:
+                run_chat(url, 0.0)  # first request pays for the SDK's lazy imports
+                for reader, delay in (("fast reader", 0.0), ("slow reader", 0.03)):
+                    before = httpx.get(f"{url}/api/metrics").text
+                    text = run_chat(url, delay)
+                    assert text_of([text]) == expected_text(E2E_DELTAS), f"{label}/{reader}: text differs"
+                    after = httpx.get(f"{url}/api/metrics").text
+                    counts = [metric(after, m) - metric(before, m) for m in
+                              ("chat_stream_frames_total", "chat_stream_writes_total", "chat_stream_bytes_total")]
+                    print(f"{label + ', ' + reader:<40}" + "".join(f"{c:>8.0f}" for c in counts))
+
+    with fake_openai(FAKE_TTFT_MS="20", FAKE_DELTA_MS=str(DISCONNECT_DELTA_MS), FAKE_DELTAS=str(DISCONNECT_DELTAS)) as base:
+        env = {"OPENAI_BASE_URL": base, "OPENAI_API_KEY": "fake", "RESPONSE_CACHE_MAX_ENTRIES": "0"}
+        with uvicorn_server("api.index:app", env=env) as url:
+            with httpx.stream("POST", f"{url}/api/chat", json={"messages": [{"role": "user", "content": "bye"}]},
+                              timeout=60) as r:
+                lines = 0
+                for _ in r.iter_lines():
+                    lines += 1
+                    if lines == 5:
+                        break
+            left_at = time.perf_counter()
+            while fake_stats(base)["active_streams"] and time.perf_counter() - left_at < 5:
+                time.sleep(0.01)
+            closed_s = time.perf_counter() - left_at
+            stats = fake_stats(base)
+            assert stats["active_streams"] == 0, "upstream stream still open 5 s after the client left"
+            disconnects = metric(httpx.get(f"{url}/api/metrics").text, "chat_stream_disconnects_total")
+    sent = stats["deltas_sent"]
+    print(f"\ndisconnect after 5 lines: upstream closed within {closed_s * 1000:.0f} ms; "
+          f"{sent} of {DISCONNECT_DELTAS} tokens generated ({DISCONNECT_DELTAS - sent} saved); "
+          f"disconnects recorded: {disconnects:.0f}")
+
+
+async def in_process():
+    assert text_of(merge_text_frames([text_frame(d) for d in ("a\"", "\\b", "ü", "")])) == "a\"\\bü"
+    assert merge_text_frames([text_frame("a"), "e:{}\n", text_frame("b")]) == [text_frame("a"), "e:{}\n", text_frame("b")]
+    await check_fast_client()
+    await check_flush_on_pause()
+    await check_slow_client()
+    await check_disconnect()
+
+
+def main():
+    asyncio.run(in_process())
+    end_to_end()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+search_transcript vs. pulling the full record on synthetic 1-hour encounters.
+
+Each synthetic transcript repeats the real turns with advancing time marks
+until it covers an hour (~1 turn every 5 s), so it is roughly 700 turns. We
+measure index build time, per-query latency with a warm index, and the JSON
+payload the model would receive.
+
+Run from the repo root:
+    python -m bench.bench_transcript_search
+"""
+import copy
+import json
+import statistics
+import time
+
+from api.utils.record_store import get_record_store
+from api.utils.tokens import estimate_tokens
+from api.utils.transcript_search import TranscriptIndex
+
+HOUR_S = 3600
+TURN_EVERY_S = 5
+QUERIES = ["heartburn at night", "lisinopril cough", "chest pain", "sleep", "follow up in two weeks"]
+
+
+def one_hour_record(record):
+    record = copy.deepcopy(record)
+    base = record.get("transcript") or []
+    turns = []
+    for i in range(HOUR_S // TURN_EVERY_S):
+        t = i * TURN_EVERY_S
+        turns.append({**base[i % len(base)], "t": f"{t // 60:02d}:{t % 60:02d}"})
+    record["transcript"] = turns
+    return record
+
+
+def main():
+    print(f"{'patient':<18} {'turns':>6} {'build ms':>9} {'search ms':>10} {'full KB':>8} {'result KB':>10} {'full tok':>9} {'result tok':>11}")
+    for patient_id, record in get_record_store().patient_scribes().items():
+        record = one_hour_record(record)
+        full_payload = json.dumps(record)
+
+        start = time.perf_counter()
+        index = TranscriptIndex(record["transcript"])
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        latencies, sizes = [], []
+        for query in QUERIES:
+            start = time.perf_counter()
+            result = index.search(query, window=2, max_matches=10)
+            latencies.append((time.perf_counter() - start) * 1e3)
+            sizes.append(len(json.dumps(result)))
+
+        size = statistics.mean(sizes)
+        print(f"{patient_id:<18} {len(record['transcript']):>6} {build_ms:>9.1f} {statistics.median(latencies):>10.3f} "
+              f"{len(full_payload) / 1024:>8.0f} {size / 1024:>10.1f} {estimate_tokens(full_payload):>9} {int(size / 4):>11}")
+
+
+if __name__ == "__main__":
+    main()
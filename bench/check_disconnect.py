@@ -0,0 +1,115 @@
+"""
+Client disconnect: the model stream and pending tool calls must stop.
+
+Runs /api/chat against bench.fake_openai and hangs up at three points:
+  - waiting for the first token (the model takes 5 s to start),
+  - mid-answer (1000 tokens at 10 ms),
+  - while tool calls run (two vector store searches of 3 s, one tool worker).
+
+Fails unless, for each case, the upstream response stream is closed within
+CLOSE_BOUND_S of the client leaving, no further model round is started,
+and chat_cancelled_total records the step that was cut short. In the tool
+case the search still waiting for a worker must never reach the server.
+
+Run from the repo root:
+    python -m bench.check_disconnect
+"""
+import re
+import time
+from typing import Dict
+
+import httpx
+
+from bench.servers import fake_openai, fake_stats, uvicorn_server
+
+CLOSE_BOUND_S = 1.0
+SEARCH = 'search_records_RAG:{"query": "hypertension follow-up"}'
+
+
+def metrics(url: str) -> str:
+    return httpx.get(f"{url}/api/metrics").text
+
+
+def metric(text: str, name: str, labels: str) -> float:
+    match = re.search(rf"^{name}{{{re.escape(labels)}}} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def hang_up(url: str, base: str, after_lines: int = 0, once: str = "", after_s: float = 0.0) -> float:
+    """
+    POST /api/chat and close the connection after reading `after_lines` lines,
+    or `after_s` after fake_stats()[once] first becomes non-zero (so the step
+    being interrupted is really in flight). Returns when the client left.
+    """
+    with httpx.stream("POST", f"{url}/api/chat", json={"messages": [{"role": "user", "content": f"hi {time.time_ns()}"}]},
+                      timeout=60) as r:
+        if after_lines:
+            for i, _ in enumerate(r.iter_lines(), 1):
+                if i == after_lines:
+                    break
+        else:
+            while not fake_stats(base)[once]:
+                time.sleep(0.005)
+            time.sleep(after_s)
+    return time.perf_counter()
+
+
+def wait_upstream_closed(base: str, left_at: float) -> float:
+    while fake_stats(base)["active_streams"] and time.perf_counter() - left_at < 5:
+        time.sleep(0.005)
+    assert fake_stats(base)["active_streams"] == 0, "upstream stream still open 5 s after the client left"
+    return time.perf_counter() - left_at
+
+
+def counters(base: str, url: str, stage: str) -> Dict[str, float]:
+    stats = fake_stats(base)
+    text = metrics(url)
+    return {
+        "requests": stats["requests"],
+        "deltas_sent": stats["deltas_sent"],
+        "searches": stats["searches"],
+        "cancelled": metric(text, "chat_cancelled_total", f'endpoint="chat",stage="{stage}"'),
+        "tools_cancelled": metric(text, "chat_tool_calls_total", 'tool="search_records_RAG",status="cancelled"'),
+    }
+
+
+def case(name: str, fake_env: Dict[str, str], app_env: Dict[str, str], stage: str, **hang) -> None:
+    settle_s = float(fake_env.get("FAKE_SEARCH_MS", "0")) / 1000 + 0.5
+    with fake_openai(**fake_env) as base:
+        # No caches: a warm-up answer reused by the measured request would skip the step being interrupted
+        env = {"OPENAI_BASE_URL": base, "OPENAI_API_KEY": "fake", "VECTOR_STORE_ID": "vs_fake",
+               "RESPONSE_CACHE_MAX_ENTRIES": "0", "RAG_CACHE_MAX_ENTRIES": "0", **app_env}
+        with uvicorn_server("api.index:app", env=env) as url:
+            # The first request in a fresh worker is slowed by lazy imports; measure the second
+            wait_upstream_closed(base, hang_up(url, base, **hang))
+            time.sleep(settle_s)
+            before = counters(base, url, stage)
+
+            left_at = hang_up(url, base, **hang)
+            closed_s = wait_upstream_closed(base, left_at)
+            # Give a wrongly continuing loop time to start its next round or tool call
+            time.sleep(settle_s)
+            after = counters(base, url, stage)
+    delta = {key: after[key] - before[key] for key in after}
+
+    assert closed_s < CLOSE_BOUND_S, f"{name}: upstream closed after {closed_s:.2f} s"
+    assert delta["requests"] == 1, f"{name}: {delta['requests']} model rounds started"
+    assert delta["cancelled"] == 1, f"{name}: chat_cancelled_total{{stage={stage}}} went up by {delta['cancelled']}"
+    detail = f"{delta['deltas_sent']:.0f} tokens generated"
+    if stage == "tools":
+        assert delta["searches"] == 1, f"{name}: queued search reached the server ({delta['searches']} searches)"
+        assert delta["tools_cancelled"] == 2, f"{name}: {delta['tools_cancelled']} tool calls recorded as cancelled"
+        detail = "1 of 2 searches started, both recorded as cancelled"
+    print(f"{name:<24} upstream closed {closed_s * 1000:6.0f} ms after hang-up; {detail}")
+
+
+def main():
+    case("waiting for first token", {"FAKE_TTFT_MS": "5000"}, {}, "model", once="active_streams", after_s=0.3)
+    case("mid-answer", {"FAKE_TTFT_MS": "20", "FAKE_DELTA_MS": "10", "FAKE_DELTAS": "1000"}, {}, "model", after_lines=5)
+    case("during tool calls", {"FAKE_TTFT_MS": "20", "FAKE_SEARCH_MS": "3000", "FAKE_TOOL_CALLS": f"{SEARCH};{SEARCH}"},
+         {"TOOL_MAX_WORKERS": "1"}, "tools", once="searches", after_s=0.3)
+    print(f"all cases: upstream closed within {CLOSE_BOUND_S:g} s, no further model rounds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Budget check for compact_history on synthetic 100-turn clinician sessions.
+
+Each session alternates user questions and long assistant answers, with a
+record lookup every few turns, and in the current turn carries several rounds
+of tool calls including repeated full record fetches. For a range of budgets
+it asserts that:
+  - an input within budget comes back unchanged,
+  - the compacted input fits the budget (whenever the latest user message alone fits),
+  - the latest user message is kept verbatim,
+  - every function_call_output still has its function_call,
+  - items kept as they were stay in their original relative order,
+  - the latest round's tool outputs are untouched.
+Exits non-zero on the first violation and prints tokens saved.
+
+Run from the repo root:
+    python -m bench.check_history_compaction
+"""
+import json
+import random
+
+from api.utils.history import compact_history
+from api.utils.record_store import get_record_store
+from api.utils.tokens import estimate_tokens
+
+
+def make_session(turns: int, seed: int):
+    rng = random.Random(seed)
+    records = get_record_store().patient_scribes()
+    patient_ids = list(records)
+    items = []
+    for i in range(turns):
+        patient_id = rng.choice(patient_ids)
+        items.append({"role": "user", "content": f"Question {i}: tell me about {patient_id} " + "details " * rng.randint(5, 40)})
+        if i % 10 == 0:
+            call_id = f"call_turn{i}"
+            arguments = json.dumps({"patient_id": patient_id, "view": "summary"})
+            items.append({"type": "function_call", "call_id": call_id, "name": "get_patient_info", "arguments": arguments})
+            items.append({"type": "function_call_output", "call_id": call_id, "output": f"summary of {patient_id} " * 20})
+        items.append({"role": "assistant", "content": f"Answer {i}: " + "clinical summary text " * rng.randint(20, 200)})
+    items.append({"role": "user", "content": "Compare Jordan Carter and Emily Chen's medication plans."})
+
+    # Current turn: three model rounds of tool calls, re-fetching the same record
+    for round_no in range(3):
+        for patient_id in ("jordan_carter", "emily_chen"):
+            call_id = f"call_{round_no}_{patient_id}"
+            arguments = json.dumps({"patient_id": patient_id})
+            items.append({"type": "function_call", "call_id": call_id, "name": "get_patient_info", "arguments": arguments})
+            items.append({"type": "function_call_output", "call_id": call_id, "output": json.dumps(records[patient_id])})
+    return items
+
+
+def check(items, budget):
+    compacted, stats = compact_history(items, budget_tokens=budget, keep_turns=6)
+    last_user = [i for i in items if i.get("role") == "user"][-1]
+    floor = estimate_tokens(last_user)
+    if stats.tokens_before <= budget:
+        assert compacted == items and all(a is b for a, b in zip(compacted, items)), "input within budget was rewritten"
+
+    positions = {id(item): i for i, item in enumerate(items)}
+    kept = [positions[id(item)] for item in compacted if id(item) in positions]
+    assert kept == sorted(kept), "kept items were reordered"
+    if stats.messages_summarized:
+        # The summary takes the place of the first message it folds in
+        first_message = next(i for i, item in enumerate(items) if "role" in item)
+        at = next(i for i, item in enumerate(compacted) if item.get("role") == "developer")
+        assert all(p < first_message for p in kept[:at]) and all(p > first_message for p in kept[at:]), "summary moved"
+
+    assert stats.tokens_after == sum(estimate_tokens(i) for i in compacted)
+    assert stats.tokens_after <= budget or stats.tokens_after <= floor, (budget, stats)
+    assert last_user in compacted, "latest user message was changed"
+    call_ids = {i["call_id"] for i in compacted if i.get("type") == "function_call"}
+    assert all(i["call_id"] in call_ids for i in compacted if i.get("type") == "function_call_output")
+    assert items[-1] in compacted or stats.tokens_after <= budget
+    return stats
+
+
+def main():
+    print(f"{'budget':>7} {'before':>8} {'after':>7} {'saved':>6} {'dedup':>6} {'refs':>5} {'summarized':>11} {'truncated':>10}")
+    for seed in range(5):
+        items = make_session(100, seed)
+        for budget in (1_000_000, 64000, 24000, 8000, 2000):
+            stats = check(items, budget)
+            if seed == 0:
+                print(f"{budget:>7} {stats.tokens_before:>8} {stats.tokens_after:>7} {stats.tokens_saved:>6} "
+                      f"{stats.outputs_deduplicated:>6} {stats.outputs_referenced:>5} {stats.messages_summarized:>11} "
+                      f"{stats.messages_truncated:>10}")
+    print("all budgets respected")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Import-time budget for the serverless entry point: fails when
+`import api.index` takes longer than the budget, or when it pulls in the
+OpenAI SDK (which is imported on first client use or by the background
+warm-up, never on the import path).
+
+Uses `python -X importtime` with the warm-up off and keeps the fastest of
+--runs runs, so a slow CI neighbour does not fail the check.
+
+Run from the repo root:
+    python -m bench.check_import_budget [--budget-ms 900] [--runs 3] [--top 10]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from bench.servers import REPO_ROOT
+
+# Cumulative import time of api.index allowed, in ms
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "900"))
+# Packages that must stay off the import path
+FORBIDDEN = ("openai",)
+
+
+def import_times() -> Dict[str, Tuple[int, int]]:
+    """{module: (self us, cumulative us)} for one `import api.index`."""
+    env = {**os.environ, "OPENAI_PREWARM": "0"}
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import api.index"], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stderr
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="top-level packages to list by cumulative time")
+    args = parser.parse_args()
+
+    runs: List[Dict[str, Tuple[int, int]]] = [import_times() for _ in range(args.runs)]
+    best = min(runs, key=lambda times: times["api.index"][1])
+    total_ms = best["api.index"][1] / 1000
+
+    packages: Dict[str, int] = {}
+    for name, (_, cumulative) in best.items():
+        top = name.split(".")[0]
+        if name == top:
+            packages[top] = max(packages.get(top, 0), cumulative)
+    for name, cumulative in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {name:<24}{cumulative / 1000:8.1f} ms")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import api.index took {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    for name in sorted(best):
+        if name.split(".")[0] in FORBIDDEN:
+            failures.append(f"{name} is imported by api.index")
+            break
+    if failures:
+        print("\n".join(["FAIL"] + failures))
+        sys.exit(1)
+    print(f"ok: import api.index {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms), best of {args.runs}")
+
+
+if __name__ == "__main__":
+    main()
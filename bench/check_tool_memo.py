@@ -0,0 +1,180 @@
+"""
+Tool memo correctness: a memoized tool result is never served after a write
+that could change it.
+
+For the json and sqlite backends (each on a temporary copy of
+patient_records.json, in a child interpreter) it checks that:
+  - a repeated call is a hit and returns the same output,
+  - an intake written for a patient invalidates that patient's entries and
+    every roster-wide entry, but not other patients' entries,
+  - a write that lands while the tool is running is not cached,
+  - a record changed behind the process's back (file rewritten / another
+    writer bumping the version) is picked up through data_version,
+  - TTL and LRU bounds hold,
+and then replays a random mix of reads and writes, comparing every memoized
+answer with a fresh execute_function_call. Prints the hit rate.
+
+Run from the repo root:
+    python -m bench.check_tool_memo
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.servers import REPO_ROOT
+
+READS = [
+    ("get_patient_info", {"patient_id": "jordan_carter", "view": "summary"}),
+    ("get_patient_info", {"patient_id": "emily_chen", "view": "meds"}),
+    ("get_patient_info", {"patient_id": "Michael Lee", "view": "summary"}),
+    ("search_transcript", {"patient_id": "rebecca_martinez", "query": "pain"}),
+    ("get_patient_names", {}),
+    ("resolve_patient", {"name_or_mrn": "jordn carter"}),
+    ("query_patients", {"sex": "F"}),
+]
+
+
+def child(backend: str) -> None:
+    from api.orchestrator import execute_function_call
+    from api.utils.storage import get_storage
+    from api.utils.tool_memo import ToolMemo, tool_memo_stats
+    from api.utils.write_patient_record import write_patient_intake
+
+    storage = get_storage()
+    memo = ToolMemo(max_entries=64, ttl_s=300)
+
+    def call(name, args, execute=execute_function_call):
+        return memo.call(execute, name, json.dumps(args))
+
+    def counts():
+        return tool_memo_stats.hits, tool_memo_stats.misses + tool_memo_stats.stale
+
+    def intake(name):
+        result = write_patient_intake(name=name, age=50, sex="M", chief_complaint="check", symptoms=["cough"])
+        assert result["status"] == "success", result
+
+    def rewrite_record(patient_id, complaint):
+        """Change a record the way another process would: no write listener in this process hears it."""
+        record = storage.get_record(patient_id)
+        record.setdefault("history", {})["hpi"] = complaint
+        if backend == "sqlite":
+            # A second storage object has its own connection; the version bump is what this process sees
+            from api.utils.storage import SQLiteStorage, _write_listeners
+            listeners = list(_write_listeners)
+            _write_listeners.clear()
+            try:
+                SQLiteStorage(path=os.environ["SQLITE_PATH"], seed_path=None).import_records({patient_id: record})
+            finally:
+                _write_listeners.extend(listeners)
+        else:
+            path = os.environ["PATIENT_RECORDS_PATH"]
+            with open(path) as f:
+                data = json.load(f)
+            data["patient_scribes"][patient_id] = record
+            with open(path, "w") as f:
+                json.dump(data, f)
+            # Make sure the stat signature moves even within one mtime tick
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+
+    jordan = ("get_patient_info", {"patient_id": "jordan_carter", "view": "summary"})
+    emily = ("get_patient_info", {"patient_id": "emily_chen", "view": "summary"})
+    roster = ("query_patients", {"sex": "M"})
+
+    # Repeats are hits
+    first = call(*jordan)
+    hits, _ = counts()
+    assert call(*jordan) == first and counts()[0] == hits + 1, "repeat was not a hit"
+
+    # An intake for Jordan invalidates Jordan's entries and roster-wide ones, not Emily's
+    call(*emily)
+    call(*roster)
+    intake("Jordan Carter")
+    hits, misses = counts()
+    call(*jordan)
+    call(*roster)
+    assert counts() == (hits, misses + 2), "entry served after a write to its patient"
+    call(*emily)
+    assert counts()[0] == hits + 1, "an unrelated patient's entry was dropped"
+
+    # A write while the tool runs: the result computed from older data is not kept
+    def execute_then_write(name, arguments):
+        output = execute_function_call(name, arguments)
+        intake("Emily Chen")
+        return output
+
+    call("get_patient_info", {"patient_id": "emily_chen", "view": "meds"}, execute_then_write)
+    hits, misses = counts()
+    call("get_patient_info", {"patient_id": "emily_chen", "view": "meds"})
+    assert counts() == (hits, misses + 1), "result computed during a write was served"
+
+    # A change made by another writer shows up through data_version
+    call(*jordan)
+    rewrite_record("jordan_carter", "changed elsewhere")
+    assert "changed elsewhere" in call(*jordan), "stale record served after an external write"
+
+    # TTL and LRU bounds
+    short = ToolMemo(max_entries=2, ttl_s=0.05)
+    short.call(execute_function_call, *jordan[:1], json.dumps(jordan[1]))
+    time.sleep(0.06)
+    hits, _ = counts()
+    short.call(execute_function_call, *jordan[:1], json.dumps(jordan[1]))
+    assert counts()[0] == hits, "expired entry served"
+    for name, args in READS[:3]:
+        short.call(execute_function_call, name, json.dumps(args))
+    assert len(short) == 2, len(short)
+
+    # Random reads and writes: every answer must equal a fresh call
+    rng = random.Random(0)
+    start_hits, start_misses = counts()
+    reads = writes = 0
+    for step in range(400):
+        roll = rng.random()
+        if roll < 0.1:
+            intake(rng.choice(["Jordan Carter", "Emily Chen", "Michael Lee", "New Patient"]))
+            writes += 1
+        elif roll < 0.13:
+            rewrite_record(rng.choice(["jordan_carter", "emily_chen", "rebecca_martinez"]), f"revision {step}")
+            writes += 1
+        else:
+            name, args = rng.choice(READS)
+            arguments = json.dumps(args)
+            assert memo.call(execute_function_call, name, arguments) == execute_function_call(name, arguments), \
+                f"stale {name}{args} at step {step}"
+            reads += 1
+    hits, misses = counts()
+    hit_rate = (hits - start_hits) / max(1, hits - start_hits + misses - start_misses)
+    print(f"{backend:<7} all checks passed; random replay: {reads} reads, {writes} writes, "
+          f"hit rate {hit_rate:.0%}, no stale answers")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend")
+    args = parser.parse_args()
+    if args.backend:
+        child(args.backend)
+        return
+
+    for backend in ("json", "sqlite"):
+        with tempfile.TemporaryDirectory() as tmp:
+            records = shutil.copy(os.path.join(REPO_ROOT, "patient_records.json"), tmp)
+            env = {
+                **os.environ,
+                "STORAGE_BACKEND": backend,
+                "PATIENT_RECORDS_PATH": records,
+                "INTAKE_JOURNAL_PATH": os.path.join(tmp, "intake_journal.jsonl"),
+                "SQLITE_PATH": os.path.join(tmp, "records.sqlite3"),
+                "RAG_BACKEND": "local",
+            }
+            subprocess.run([sys.executable, "-m", "bench.check_tool_memo", "--backend", backend],
+                           cwd=REPO_ROOT, env=env, check=True)
+
+
+if __name__ == "__main__":
+    main()
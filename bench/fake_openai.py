@@ -0,0 +1,181 @@
+"""
+Local stand-in for the OpenAI Responses API, for benchmarks and load tests.
+
+POST /v1/responses streams a scripted answer as SSE events in the same shape
+the real API uses, so the openai SDK's `responses.stream()` helper (and its
+get_final_response()) work unchanged against it. POST
+/v1/vector_stores/{id}/search answers search_records_RAG with canned chunks.
+
+Scripting (env vars, read at startup):
+    FAKE_TTFT_MS         delay before the first output event (default 200)
+    FAKE_DELTA_MS        delay between text deltas (default 10)
+    FAKE_DELTAS          number of text deltas per answer (default 40)
+    FAKE_TOOL_CALLS      semicolon-separated "name:json_args" calls to emit on the first
+                         round of a conversation (default none)
+    FAKE_SEARCH_MS       latency of a vector store search (default 150)
+    FAKE_SEARCH_RESULTS  results per vector store search (default 10)
+
+Run standalone:
+    python -m bench.fake_openai --port 8765
+and point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TTFT_MS = float(os.getenv("FAKE_TTFT_MS", "200"))
+DELTA_MS = float(os.getenv("FAKE_DELTA_MS", "10"))
+DELTAS = int(os.getenv("FAKE_DELTAS", "40"))
+TOOL_CALLS = [c for c in os.getenv("FAKE_TOOL_CALLS", "").split(";") if c]
+SEARCH_MS = float(os.getenv("FAKE_SEARCH_MS", "150"))
+SEARCH_RESULTS = int(os.getenv("FAKE_SEARCH_RESULTS", "10"))
+
+app = FastAPI()
+stats = {"requests": 0, "active_streams": 0, "max_active_streams": 0, "deltas_sent": 0, "disconnects": 0, "searches": 0}
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _response(response_id: str, model: str, status: str, output: List[dict]) -> dict:
+    return {
+        "id": response_id,
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": status,
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": 100,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": DELTAS,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": 100 + DELTAS,
+        },
+    }
+
+
+def _parse_tool_calls(specs: List[str]) -> List[dict]:
+    calls = []
+    for spec in specs:
+        name, _, args = spec.partition(":")
+        calls.append({
+            "type": "function_call",
+            "id": f"fc_{uuid.uuid4().hex[:12]}",
+            "call_id": f"call_{uuid.uuid4().hex[:12]}",
+            "name": name,
+            "arguments": args or "{}",
+            "status": "completed",
+        })
+    return calls
+
+
+async def _stream(body: Dict[str, Any], request: Request):
+    model = body.get("model", "fake-model")
+    response_id = f"resp_{uuid.uuid4().hex[:12]}"
+    inputs = body.get("input") or []
+    already_called = any(isinstance(i, dict) and i.get("type") == "function_call_output" for i in inputs)
+    seq = 0
+
+    def event(**fields):
+        nonlocal seq
+        seq += 1
+        return _sse({**fields, "sequence_number": seq})
+
+    stats["active_streams"] += 1
+    stats["max_active_streams"] = max(stats["max_active_streams"], stats["active_streams"])
+    try:
+        yield event(type="response.created", response=_response(response_id, model, "in_progress", []))
+        await asyncio.sleep(TTFT_MS / 1000)
+
+        if TOOL_CALLS and not already_called:
+            output = _parse_tool_calls(TOOL_CALLS)
+            for index, call in enumerate(output):
+                yield event(type="response.output_item.added", output_index=index,
+                            item={**call, "arguments": "", "status": "in_progress"})
+                yield event(type="response.function_call_arguments.delta", output_index=index,
+                            item_id=call["id"], delta=call["arguments"])
+                yield event(type="response.output_item.done", output_index=index, item=call)
+        else:
+            item_id = f"msg_{uuid.uuid4().hex[:12]}"
+            yield event(type="response.output_item.added", output_index=0, item={
+                "type": "message", "id": item_id, "role": "assistant", "status": "in_progress", "content": []})
+            yield event(type="response.content_part.added", output_index=0, item_id=item_id, content_index=0,
+                        part={"type": "output_text", "text": "", "annotations": []})
+            text = ""
+            for i in range(DELTAS):
+                if await request.is_disconnected():
+                    stats["disconnects"] += 1
+                    return
+                delta = f"tok{i} "
+                text += delta
+                stats["deltas_sent"] += 1
+                yield event(type="response.output_text.delta", output_index=0, item_id=item_id,
+                            content_index=0, delta=delta, logprobs=[])
+                await asyncio.sleep(DELTA_MS / 1000)
+            message = {"type": "message", "id": item_id, "role": "assistant", "status": "completed",
+                       "content": [{"type": "output_text", "text": text, "annotations": []}]}
+            yield event(type="response.output_text.done", output_index=0, item_id=item_id,
+                        content_index=0, text=text, logprobs=[])
+            yield event(type="response.output_item.done", output_index=0, item=message)
+            output = [message]
+
+        yield event(type="response.completed", response=_response(response_id, model, "completed", output))
+    finally:
+        stats["active_streams"] -= 1
+
+
+@app.post("/v1/responses")
+async def responses(request: Request):
+    stats["requests"] += 1
+    body = await request.json()
+    return StreamingResponse(_stream(body, request), media_type="text/event-stream")
+
+
+@app.post("/v1/vector_stores/{vector_store_id}/search")
+async def vector_store_search(vector_store_id: str, request: Request):
+    stats["searches"] += 1
+    body = await request.json()
+    await asyncio.sleep(SEARCH_MS / 1000)
+    n = min(SEARCH_RESULTS, int(body.get("max_num_results") or SEARCH_RESULTS))
+    return {
+        "object": "vector_store.search_results.page",
+        "search_query": [body.get("query", "")],
+        "data": [
+            {
+                "file_id": f"file_{i}",
+                "filename": "patient_records.json",
+                "score": round(1.0 - i / (n + 1), 4),
+                "attributes": {},
+                "content": [{"type": "text", "text": f"chunk {i} for {body.get('query', '')!r}: " + "lorem ipsum " * 40}],
+            }
+            for i in range(n)
+        ],
+        "has_more": False,
+        "next_page": None,
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,47 @@
+"""
+The pre-async /api/chat handler: a synchronous generator on the blocking OpenAI
+client, which Starlette iterates on its threadpool. Kept only as the "before"
+side of bench.bench_async_streams.
+"""
+import json
+from typing import List
+
+from fastapi import FastAPI, Query
+from fastapi.responses import StreamingResponse
+from openai import OpenAI
+
+from api.index import Request, sanitize_for_responses
+from api.orchestrator import SYSTEM_PROMPT, execute_function_call, tools
+
+client = OpenAI()
+app = FastAPI()
+
+
+def stream_text_sync(messages: List[dict]):
+    input_list = messages.copy()
+    for _ in range(5):
+        has_function_calls = False
+        with client.responses.stream(
+            model="gpt-4.1-mini", instructions=SYSTEM_PROMPT, input=input_list, tools=tools,
+        ) as stream:
+            for event in stream:
+                if getattr(event, "type", None) == "response.output_text.delta":
+                    yield f'0:{json.dumps(event.delta)}\n'
+            final_response = stream.get_final_response()
+            input_list += final_response.output
+            for item in final_response.output:
+                if item.type == "function_call":
+                    has_function_calls = True
+                    input_list.append({
+                        "type": "function_call_output",
+                        "call_id": item.call_id,
+                        "output": execute_function_call(item.name, item.arguments),
+                    })
+        if not has_function_calls:
+            break
+    yield f'e:{json.dumps({"finishReason": "stop"})}\n'
+
+
+@app.post("/api/chat")
+async def handle_chat_data(request: Request, protocol: str = Query("data")):
+    return StreamingResponse(stream_text_sync(sanitize_for_responses(request.messages)))
@@ -0,0 +1,208 @@
+"""
+Load test for /api/chat and /api/patient-chat against a local fake OpenAI.
+
+For each endpoint the app runs in its own uvicorn worker, pointed at its own
+bench.fake_openai (scripted latency, deltas and tool calls) and at a scratch
+copy of patient_records.json, so intake writes never touch the real data and
+no network access is needed. Each concurrency level sends --requests chats
+from that many concurrent clients (closed loop) and reports:
+
+    p50/p95/p99 time to first text delta (TTFT), p50/p95/p99 total latency,
+    throughput (requests/s), errors, and the app worker's RSS / peak RSS.
+
+Every request has a unique message by default so the response cache does not
+hide the orchestrator loop; pass --repeat to measure cache hits instead.
+The load generator, the fake upstream and the app share the machine's CPUs, so
+compare runs on the same host rather than reading the numbers as absolute.
+
+Run from the repo root:
+    python -m bench.load_test
+    python -m bench.load_test --endpoint chat --concurrency 1 20 100 --requests 400 --ttft-ms 300
+    python -m bench.load_test --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from api.utils.record_store import PATIENT_RECORDS_PATH
+from bench.servers import fake_openai, fake_stats, process_memory_mb, uvicorn_process
+
+ENDPOINTS = {
+    "chat": {
+        "path": "/api/chat",
+        "message": "Summarize Jordan Carter's plan and any similar patients",
+        "tool_calls": ";".join([
+            "get_patient_names:{}",
+            'get_patient_info:{"patient_id": "jordan_carter", "view": "summary"}',
+            'search_records_RAG:{"query": "hypertension follow-up"}',
+        ]),
+    },
+    "patient-chat": {
+        "path": "/api/patient-chat",
+        "message": "I've had a cough for a week and want to book a visit",
+        "tool_calls": "write_patient_intake:" + json.dumps({
+            "name": "Load Test", "age": 40, "sex": "F", "chief_complaint": "cough",
+            "symptoms": ["cough"], "reason_for_visit": "appointment",
+        }),
+    },
+}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+async def one_chat(client: httpx.AsyncClient, url: str, message: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    ttft = None
+    error = None
+    try:
+        async with client.stream("POST", url, json={"messages": [{"role": "user", "content": message}]}) as response:
+            if response.status_code != 200:
+                error = f"HTTP {response.status_code}"
+            async for line in response.aiter_lines():
+                if ttft is None and line.startswith("0:"):
+                    ttft = time.perf_counter() - start
+                elif line.startswith('e:{"finishReason": "error"'):
+                    error = line
+    except httpx.HTTPError as e:
+        error = repr(e)
+    return {"ttft": ttft, "latency": time.perf_counter() - start, "error": error}
+
+
+async def drive(url: str, message: str, concurrency: int, total: int, repeat: bool) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results: List[Dict[str, Any]] = []
+    counter = iter(range(total))
+    run_id = uuid.uuid4().hex[:8]
+
+    async def worker(client: httpx.AsyncClient):
+        for i in counter:
+            text = message if repeat else f"{message} (run {run_id}, request {i})"
+            results.append(await one_chat(client, url, text))
+
+    async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    ttfts = [r["ttft"] for r in results if r["ttft"] is not None]
+    latencies = [r["latency"] for r in results]
+    errors = [r["error"] for r in results if r["error"]]
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput_rps": len(results) / wall,
+        **{f"ttft_p{p}_ms": _ms(percentile(ttfts, p)) for p in (50, 95, 99)},
+        **{f"latency_p{p}_ms": _ms(percentile(latencies, p)) for p in (50, 95, 99)},
+        "latency_mean_ms": _ms(statistics.mean(latencies)) if latencies else None,
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def run_endpoint(name: str, args, scratch_dir: str) -> List[Dict[str, Any]]:
+    spec = ENDPOINTS[name]
+    records_path = os.path.join(scratch_dir, f"{name}_patient_records.json")
+    shutil.copyfile(args.records or PATIENT_RECORDS_PATH, records_path)
+    fake_env = {
+        "FAKE_TTFT_MS": str(args.ttft_ms),
+        "FAKE_DELTA_MS": str(args.delta_ms),
+        "FAKE_DELTAS": str(args.deltas),
+        "FAKE_SEARCH_MS": str(args.search_ms),
+        "FAKE_TOOL_CALLS": "" if args.no_tools else spec["tool_calls"],
+    }
+    rows = []
+    with fake_openai(**fake_env) as openai_base_url:
+        app_env = {
+            "OPENAI_BASE_URL": openai_base_url,
+            "OPENAI_API_KEY": "fake",
+            "VECTOR_STORE_ID": "vs_fake",
+            "PATIENT_RECORDS_PATH": records_path,
+            "INTAKE_JOURNAL_PATH": os.path.join(scratch_dir, f"{name}_patient_intakes.jsonl"),
+        }
+        with uvicorn_process("api.index:app", env=app_env) as (base_url, proc):
+            url = base_url + spec["path"]
+            # Warm up imports, the record store and the connection pool
+            asyncio.run(drive(url, spec["message"], 1, 2, args.repeat))
+            for concurrency in args.concurrency:
+                row = asyncio.run(drive(url, spec["message"], concurrency, max(args.requests, concurrency), args.repeat))
+                row.update(endpoint=name, **process_memory_mb(proc.pid))
+                rows.append(row)
+        row_stats = fake_stats(openai_base_url)
+        for row in rows:
+            row["upstream_max_active_streams"] = row_stats["max_active_streams"]
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    columns = [
+        ("endpoint", "endpoint", 13), ("conc", "concurrency", 5), ("reqs", "requests", 5), ("err", "errors", 4),
+        ("req/s", "throughput_rps", 7), ("ttft50", "ttft_p50_ms", 7), ("ttft95", "ttft_p95_ms", 7),
+        ("ttft99", "ttft_p99_ms", 7), ("lat50", "latency_p50_ms", 7), ("lat95", "latency_p95_ms", 7),
+        ("lat99", "latency_p99_ms", 7), ("rssMB", "rss_mb", 6), ("peakMB", "peak_rss_mb", 6),
+    ]
+
+    def cell(value, width):
+        if value is None:
+            value = "-"
+        elif isinstance(value, float):
+            value = f"{value:.1f}" if value < 1000 else f"{value:.0f}"
+        return f"{value:>{width}}"
+
+    print(" ".join(f"{title:>{width}}" for title, _, width in columns))
+    for row in rows:
+        print(" ".join(cell(row.get(key), width) for _, key, width in columns))
+    for row in rows:
+        if row["first_error"]:
+            print(f"[{row['endpoint']} c={row['concurrency']}] first error: {row['first_error'][:200]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["chat", "patient-chat", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--ttft-ms", type=float, default=200)
+    parser.add_argument("--delta-ms", type=float, default=10)
+    parser.add_argument("--deltas", type=int, default=40)
+    parser.add_argument("--search-ms", type=float, default=150)
+    parser.add_argument("--no-tools", action="store_true", help="answer directly, without scripted tool calls")
+    parser.add_argument("--repeat", action="store_true", help="send the same message every time (response cache hits)")
+    parser.add_argument("--records", help="patient_records.json to copy into the scratch dir (default: the repo's)")
+    parser.add_argument("--json", help="also write the result rows to this file")
+    args = parser.parse_args()
+
+    endpoints = ["chat", "patient-chat"] if args.endpoint == "both" else [args.endpoint]
+    rows: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="deepscribe-load-") as scratch_dir:
+        for name in endpoints:
+            rows.extend(run_endpoint(name, args, scratch_dir))
+
+    print(f"fake upstream: ttft={args.ttft_ms:g}ms, {args.deltas} deltas x {args.delta_ms:g}ms, "
+          f"search={args.search_ms:g}ms, tools={'off' if args.no_tools else 'on'}")
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
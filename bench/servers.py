@@ -0,0 +1,100 @@
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def uvicorn_server(app: str, env: Optional[Dict[str, str]] = None, port: Optional[int] = None,
+                   tls: Optional[Tuple[str, str]] = None, keep_alive_s: Optional[float] = None) -> Iterator[str]:
+    """
+    Run `uvicorn <app>` with a single worker in a subprocess and yield its base URL.
+    With tls=(certfile, keyfile) it serves HTTPS; keep_alive_s overrides
+    uvicorn's 5 s idle connection timeout.
+    """
+    with uvicorn_process(app, env, port, tls, keep_alive_s) as (base_url, _):
+        yield base_url
+
+
+@contextlib.contextmanager
+def uvicorn_process(app: str, env: Optional[Dict[str, str]] = None, port: Optional[int] = None,
+                    tls: Optional[Tuple[str, str]] = None,
+                    keep_alive_s: Optional[float] = None) -> Iterator[Tuple[str, subprocess.Popen]]:
+    """Like uvicorn_server, but also yield the Popen so callers can sample its memory."""
+    port = port or free_port()
+    args = [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+            "--workers", "1", "--log-level", "warning", "--no-access-log"]
+    if tls:
+        args += ["--ssl-certfile", tls[0], "--ssl-keyfile", tls[1]]
+    if keep_alive_s is not None:
+        args += ["--timeout-keep-alive", str(int(keep_alive_s))]
+    proc = subprocess.Popen(args, cwd=REPO_ROOT, env={**os.environ, **(env or {})})
+    base_url = f"{'https' if tls else 'http'}://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f"{app} failed to start")
+                time.sleep(0.02)
+        yield base_url, proc
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+@contextlib.contextmanager
+def fake_openai(tls: Optional[Tuple[str, str]] = None, keep_alive_s: Optional[float] = None, **script: str) -> Iterator[str]:
+    """
+    Start bench.fake_openai with FAKE_* settings (e.g. FAKE_TTFT_MS="100") and
+    yield the OPENAI_BASE_URL to point the app at. tls=(certfile, keyfile)
+    serves it over HTTPS (see self_signed_cert).
+    """
+    with uvicorn_server("bench.fake_openai:app", env=script, tls=tls, keep_alive_s=keep_alive_s) as url:
+        yield f"{url}/v1"
+
+
+def fake_stats(openai_base_url: str) -> dict:
+    return httpx.get(openai_base_url.rsplit("/v1", 1)[0] + "/stats").json()
+
+
+def self_signed_cert(directory: str) -> Tuple[str, str]:
+    """Write a throwaway certificate for 127.0.0.1 with the openssl CLI; returns (certfile, keyfile)."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def process_memory_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current (VmRSS) and peak (VmHWM) resident memory of a process, from /proc (Linux only)."""
+    result: Dict[str, Optional[float]] = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    result["rss_mb"] = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    result["peak_rss_mb"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return result
@@ -0,0 +1,82 @@
+import copy
+import json
+import os
+import random
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from api.utils.record_store import PATIENT_RECORDS_PATH
+
+FIRST_NAMES = ["Jordan", "Emily", "Michael", "Rebecca", "Jessica", "David", "Maria", "Wei", "Aisha", "Carlos",
+               "Olivia", "Noah", "Priya", "Liam", "Fatima", "Ethan", "Sofia", "Hiroshi", "Grace", "Omar"]
+LAST_NAMES = ["Carter", "Chen", "Lee", "Martinez", "Brown", "Nguyen", "Patel", "Garcia", "Kim", "Johnson",
+              "Okafor", "Rossi", "Schmidt", "Haddad", "Silva", "Cohen", "Ivanova", "Tanaka", "Walsh", "Ali"]
+
+
+def load_seed_records() -> Dict[str, Any]:
+    with open(PATIENT_RECORDS_PATH, "r") as f:
+        return json.load(f)
+
+
+def iter_records(n_records: int, seed: int = 0, transcript_turns: Optional[int] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield n_records (patient_id, record) pairs cloned from the real patient_scribes
+    records with randomized names, MRNs, ages and sexes.
+
+    Args:
+        transcript_turns: If set, truncate each transcript to this many turns
+    """
+    rng = random.Random(seed)
+    templates = list(load_seed_records()["patient_scribes"].values())
+
+    for i in range(n_records):
+        record = copy.deepcopy(templates[i % len(templates)])
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        name = f"{first} {last} {i}"
+        patient = record.setdefault("patient", {})
+        patient["name"] = name
+        patient["mrn"] = f"SYN-{i:07d}"
+        patient["age"] = rng.randint(18, 95)
+        patient["sex"] = rng.choice(["M", "F"])
+        if transcript_turns is not None:
+            record["transcript"] = record.get("transcript", [])[:transcript_turns]
+        yield name.lower().replace(" ", "_"), record
+
+
+def make_dataset(n_records: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Build a patient_records.json-shaped dict with n_records patient_scribes entries.
+    """
+    base = load_seed_records()
+    return {
+        "AI_scribes": copy.deepcopy(base.get("AI_scribes", {})),
+        "patient_scribes": dict(iter_records(n_records, seed)),
+    }
+
+
+def write_dataset(path: str, n_records: int, seed: int = 0) -> str:
+    with open(path, "w") as f:
+        json.dump(make_dataset(n_records, seed), f)
+    return path
+
+
+def write_dataset_of_size(path: str, target_mb: float, seed: int = 0) -> int:
+    """
+    Stream a patient_records.json of roughly target_mb to disk without building
+    it in memory. Returns the number of patient_scribes records written.
+    """
+    target_bytes = target_mb * 1024 * 1024
+    base = load_seed_records()
+    count = 0
+    with open(path, "w") as f:
+        f.write('{"AI_scribes": ' + json.dumps(base.get("AI_scribes", {})) + ', "patient_scribes": {')
+        for patient_id, record in iter_records(10 ** 9, seed):
+            if count and f.tell() >= target_bytes:
+                break
+            f.write((", " if count else "") + json.dumps(patient_id) + ": " + json.dumps(record))
+            count += 1
+        f.write("}}")
+    return count
+
+
+def file_size_mb(path: str) -> float:
+    return os.path.getsize(path) / (1024 * 1024)